@@ -29,6 +29,7 @@ ActionStatus = Enum(
 )
 
 
+@messages.slots
 @dataclass
 class ActionMessage(messages.MessageBase):
     type: str = "Action"
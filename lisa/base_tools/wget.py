@@ -1,4 +1,5 @@
 import re
+from pathlib import PurePath, PurePosixPath
 from typing import TYPE_CHECKING, Optional, Tuple, Type
 from urllib.parse import urlparse
 
@@ -10,7 +11,8 @@ from lisa.tools.ls import Ls
 from lisa.tools.mkdir import Mkdir
 from lisa.tools.powershell import PowerShell
 from lisa.tools.rm import Rm
-from lisa.util import LisaException, is_valid_url
+from lisa.tools.upload_cache import UploadCache
+from lisa.util import LisaException, constants, is_valid_url
 
 if TYPE_CHECKING:
     from lisa.operating_system import Posix
@@ -54,6 +56,14 @@ class Wget(Tool):
         if overwrite and self.node.shell.exists(download_pure_path):
             self.node.shell.remove(download_pure_path, recursive=True)
             force_run = True
+
+        if constants.DOWNLOAD_CACHE_SIZE:
+            file_pure_path = self._get_file_path(url, download_pure_path, filename)
+            if file_pure_path and self.node.tools[UploadCache].upload_url(
+                url, file_pure_path, mode=0o755 if executable else None, sudo=sudo
+            ):
+                return self.node.get_str_path(file_pure_path)
+
         command = f"'{url}' --no-check-certificate"
         if filename:
             command = f"{command} -O {download_path}"
@@ -108,6 +118,17 @@ class Wget(Tool):
     def _windows_tool(cls) -> Optional[Type[Tool]]:
         return WindowsWget
 
+    def _get_file_path(
+        self, url: str, download_path: PurePath, filename: str
+    ) -> Optional[PurePath]:
+        # wget saves the file by the name in url, if the filename is not set.
+        if filename:
+            return download_path
+        name = PurePosixPath(urlparse(url).path).name
+        if not name:
+            return None
+        return download_path / name
+
     def _ensure_download_path(self, path: str, filename: str) -> Tuple[str, str]:
         # combine download file path
         # TODO: support current lisa folder in pathlib.
@@ -16,6 +16,7 @@ from dataclasses_json import dataclass_json
 from marshmallow import validate
 
 from lisa import notifier, schema, search_space
+from lisa.messages import slots
 from lisa.node import Node, Nodes
 from lisa.notifier import MessageBase
 from lisa.util import (
@@ -75,6 +76,7 @@ def _get_environment_id() -> int:
     return env_id
 
 
+@slots
 @dataclass
 class EnvironmentMessage(MessageBase):
     type: str = "Environment"
@@ -3,7 +3,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import pathlib
+import re
+import shlex
+import threading
+from functools import partial
 from hashlib import sha256
 from typing import (
     TYPE_CHECKING,
@@ -19,6 +24,7 @@ from typing import (
 )
 
 from lisa.util import InitializableMixin, LisaException, constants
+from lisa.util.facts import EVENT_PACKAGE
 from lisa.util.logger import get_logger
 from lisa.util.perf_timer import create_timer
 from lisa.util.process import ExecutableResult, Process
@@ -29,6 +35,9 @@ if TYPE_CHECKING:
 
 T = TypeVar("T")
 
+# commands, which can be probed in a script without quoting issues.
+_probe_command_pattern = re.compile(r"^[\w.+/-]+$")
+
 
 class Tool(InitializableMixin):
     """
@@ -79,9 +88,6 @@ class Tool(InitializableMixin):
         # specify the tool is in sudo or not. It may be set to True in
         # _check_exists
         self._use_sudo: bool = False
-        # cache the processes with same command line, so that it reduce time to
-        # rerun same commands.
-        self.__cached_results: Dict[str, Process] = {}
 
     def __call__(
         self,
@@ -185,38 +191,7 @@ class Tool(InitializableMixin):
         return None
 
     def command_exists(self, command: str) -> Tuple[bool, bool]:
-        exists = False
-        use_sudo = False
-        if self.node.is_posix:
-            where_command = "command -v"
-        else:
-            where_command = "where"
-        where_command = f"{where_command} {command}"
-        result = self.node.execute(where_command, shell=True, no_info_log=True)
-        if result.exit_code == 0:
-            exists = True
-            use_sudo = False
-        elif self.node.is_posix:
-            result = self.node.execute(
-                where_command,
-                shell=True,
-                no_info_log=True,
-                sudo=True,
-            )
-            if result.exit_code == 0:
-                self._log.debug(
-                    "executable exists in root paths, "
-                    "sudo always brings in following commands."
-                )
-                exists = True
-                use_sudo = True
-        else:
-            # for Windows, where is not enough to check if a full path exists,
-            # use dir to try again.
-            test_command = f"powershell test-path '{command}'"
-            result = self.node.execute(test_command, shell=True, no_info_log=True)
-            exists = result.stdout == "True"
-        return exists, use_sudo
+        return self.node.tools.command_exists(command)
 
     def install(self) -> bool:
         """
@@ -228,7 +203,11 @@ class Tool(InitializableMixin):
             self._log.info("installing dependencies")
             list(map(self.node.tools.get, self.dependencies))
 
-        return self._install()
+        is_installed = self._install()
+        # installation changes commands on the node, so the cached existence
+        # may be checked before it's done.
+        self.node.facts.notify(EVENT_PACKAGE)
+        return is_installed
 
     def run_async(
         self,
@@ -257,11 +236,15 @@ class Tool(InitializableMixin):
         # If the command exists in sbin, use the root permission, even the sudo
         # is not specified.
         sudo = sudo or self._use_sudo
-        command_key = f"{command}|{shell}|{sudo}|{cwd}"
-        process = self.__cached_results.get(command_key, None)
         if node is None:
             node = self.node
-        if force_run or not process:
+        # cache the processes with same command line in facts of the node, so
+        # that it reduce time to rerun same commands.
+        fact_key = f"{_get_tool_fact_prefix(self.name)}{command}|{shell}|{sudo}|{cwd}"
+        process: Optional[Process] = None
+        if not force_run:
+            process = node.facts.peek(fact_key)
+        if process is None:
             process = node.execute_async(
                 command,
                 shell=shell,
@@ -273,7 +256,7 @@ class Tool(InitializableMixin):
                 update_envs=update_envs,
                 encoding=encoding,
             )
-            self.__cached_results[command_key] = process
+            node.facts.set(fact_key, process)
         else:
             self._log.debug(f"loaded cached result for command: [{command}]")
         return process
@@ -315,6 +298,74 @@ class Tool(InitializableMixin):
             expected_exit_code_failure_message=expected_exit_code_failure_message,
         )
 
+    async def run_aio(
+        self,
+        parameters: str = "",
+        force_run: bool = False,
+        shell: bool = False,
+        sudo: bool = False,
+        no_error_log: bool = False,
+        no_info_log: bool = True,
+        no_debug_log: bool = False,
+        cwd: Optional[pathlib.PurePath] = None,
+        update_envs: Optional[Dict[str, str]] = None,
+        encoding: str = "",
+        timeout: int = 600,
+        expected_exit_code: Optional[int] = None,
+        expected_exit_code_failure_message: str = "",
+    ) -> ExecutableResult:
+        """
+        Run a process, and await the result on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        process = await loop.run_in_executor(
+            None,
+            partial(
+                self.run_async,
+                parameters=parameters,
+                force_run=force_run,
+                shell=shell,
+                sudo=sudo,
+                no_error_log=no_error_log,
+                no_info_log=no_info_log,
+                no_debug_log=no_debug_log,
+                cwd=cwd,
+                update_envs=update_envs,
+                encoding=encoding,
+            ),
+        )
+        return await process.wait_result_aio(
+            timeout=timeout,
+            expected_exit_code=expected_exit_code,
+            expected_exit_code_failure_message=expected_exit_code_failure_message,
+        )
+
+    def run_batch(
+        self,
+        parameters_list: List[str],
+        sudo: bool = False,
+        no_error_log: bool = False,
+        no_info_log: bool = True,
+        cwd: Optional[pathlib.PurePath] = None,
+        timeout: int = 600,
+    ) -> List[ExecutableResult]:
+        """
+        Run the tool with each of parameters in one round trip. The results are
+        not cached.
+        """
+        commands = [
+            f"{self.command} {parameters}" if parameters else self.command
+            for parameters in parameters_list
+        ]
+        return self.node.execute_batch(
+            commands,
+            sudo=sudo or self._use_sudo,
+            no_error_log=no_error_log,
+            no_info_log=no_info_log,
+            cwd=cwd,
+            timeout=timeout,
+        )
+
     def get_tool_path(self, use_global: bool = False) -> pathlib.PurePath:
         """
         compose a path, if the tool need to be installed
@@ -435,13 +486,18 @@ class CustomScript(Tool):
 
     def install(self) -> bool:
         if self.node.is_remote:
-            # copy to remote
+            from lisa.tools import UploadCache
+
+            # copy to remote. Files, which are uploaded before, are placed from
+            # the cache on node.
             node_script_path = self.get_tool_path()
-            for file in self._files:
-                remote_path = node_script_path.joinpath(file)
-                source_path = self._local_path.joinpath(file)
-                self.node.shell.copy(source_path, remote_path)
-                self.node.shell.chmod(remote_path, 0o755)
+            self.node.tools[UploadCache].upload(
+                [
+                    (self._local_path.joinpath(x), node_script_path.joinpath(x))
+                    for x in self._files
+                ],
+                mode=0o755,
+            )
             self._cwd = node_script_path
         else:
             self._cwd = self._local_path
@@ -518,6 +574,8 @@ class Tools:
     def __init__(self, node: Node) -> None:
         self._node = node
         self._cache: Dict[str, Tool] = {}
+        # the probe may use tools, when the node is initializing.
+        self._commands_lock = threading.RLock()
 
     def __getattr__(self, key: str) -> Tool:
         """
@@ -542,6 +600,8 @@ class Tools:
         tool = self._cache.get(tool_key, None)
         if tool:
             del self._cache[tool_key]
+            # the new tool may run same commands with different results.
+            self._node.facts.invalidate(_get_tool_fact_prefix(tool.name))
         return self.get(tool_type, *args, **kwargs)
 
     def get(
@@ -605,6 +665,119 @@ class Tools:
             self._cache[tool_key] = tool
         return cast(T, tool)
 
+    def command_exists(self, command: str) -> Tuple[bool, bool]:
+        """
+        Return whether the command exists, and whether it's found by sudo only,
+        like commands in sbin. On the first miss, commands of tools, which are
+        used on the node, are probed together by one script, so they don't
+        check themselves one by one again, after the node is dirty or
+        rebooted. The result is kept in facts of the node.
+        """
+        known_commands = list(
+            dict.fromkeys([command] + [x.command for x in list(self._cache.values())])
+        )
+        facts = self._node.facts
+        with self._commands_lock:
+            existence = facts.peek(_get_command_fact_key(command))
+            if existence is None:
+                self._probe_commands(
+                    [
+                        x
+                        for x in known_commands
+                        if facts.peek(_get_command_fact_key(x)) is None
+                    ]
+                )
+                existence = facts.peek(_get_command_fact_key(command))
+            if existence is None:
+                existence = self._check_command(command)
+                self._set_command_existence(command, existence)
+        return cast(Tuple[bool, bool], existence)
+
+    def _probe_commands(self, commands: List[str]) -> None:
+        node = self._node
+        if not node.is_posix:
+            return
+        commands = [x for x in commands if _probe_command_pattern.match(x)]
+        if not commands:
+            return
+        # if sudo needs password, missing commands are checked one by one,
+        # which can input the password.
+        is_sudo_probed = node.support_sudo and not getattr(
+            node.shell, "is_sudo_required_password", False
+        )
+        script = (
+            "m=''; for c in "
+            + " ".join(shlex.quote(x) for x in commands)
+            + '; do if command -v "$c" >/dev/null 2>&1; then echo "user $c"; '
+            'else m="$m $c"; fi; done'
+        )
+        if is_sudo_probed:
+            script += (
+                '; if [ -n "$m" ]; then sudo -n sh -c \'echo sudo; for c; do '
+                'command -v "$c" >/dev/null 2>&1 && echo "sudo $c"; done\' sh $m; '
+                "fi; true"
+            )
+        result = node.execute(script, shell=True, no_info_log=True)
+        found: Dict[str, bool] = {}
+        lines = result.stdout.splitlines()
+        for line in lines:
+            kind, _, command = line.strip().partition(" ")
+            if kind in ["user", "sudo"] and command in commands:
+                found[command] = kind == "sudo"
+        if is_sudo_probed and "sudo" in (x.strip() for x in lines):
+            is_missing_known = True
+        else:
+            # without sudo, the second check is the same as the first one.
+            is_missing_known = not node.support_sudo
+        for command in commands:
+            if command in found:
+                self._set_command_existence(command, (True, found[command]))
+            elif is_missing_known:
+                self._set_command_existence(command, (False, False))
+
+    def _set_command_existence(
+        self, command: str, existence: Tuple[bool, bool]
+    ) -> None:
+        # installed packages bring in commands.
+        self._node.facts.set(
+            _get_command_fact_key(command), existence, events=[EVENT_PACKAGE]
+        )
+
+    def _check_command(self, command: str) -> Tuple[bool, bool]:
+        node = self._node
+        exists = False
+        use_sudo = False
+        if node.is_posix:
+            where_command = "command -v"
+        else:
+            where_command = "where"
+        where_command = f"{where_command} {command}"
+        result = node.execute(where_command, shell=True, no_info_log=True)
+        if result.exit_code == 0:
+            exists = True
+            use_sudo = False
+        elif node.is_posix:
+            result = node.execute(
+                where_command,
+                shell=True,
+                no_info_log=True,
+                sudo=True,
+            )
+            if result.exit_code == 0:
+                node.log.debug(
+                    f"executable '{command}' exists in root paths, "
+                    "sudo always brings in following commands."
+                )
+                exists = True
+                use_sudo = True
+        else:
+            # for Windows, where is not enough to check if a full path exists,
+            # use dir to try again.
+            test_command = f"powershell test-path '{command}'"
+            result = node.execute(test_command, shell=True, no_info_log=True)
+            exists = result.stdout == "True"
+        return exists, use_sudo
+
     def _get_tool_key(self, tool_type: Union[type, CustomScriptBuilder, str]) -> str:
         if isinstance(tool_type, CustomScriptBuilder):
             tool_key = tool_type.name
@@ -614,3 +787,11 @@ class Tools:
             tool_key = tool_type.__name__.lower()
 
         return tool_key
+
+
+def _get_tool_fact_prefix(name: str) -> str:
+    return f"tool.{name}."
+
+
+def _get_command_fact_key(command: str) -> str:
+    return f"command.{command}"
@@ -508,14 +508,15 @@ class Infiniband(Feature):
         if isinstance(node.os, Redhat):
             node.os.install_packages("libstdc++.i686")
         if isinstance(node.os, Ubuntu):
-            for package in [
-                "lib32gcc-9-dev",
-                "python3-dev",
-                "lib32gcc-8-dev",
-                "python-dev",
-            ]:
-                if node.os.is_package_in_repo(package):
-                    node.os.install_packages(package)
+            with node.os.package_transaction():
+                for package in [
+                    "lib32gcc-9-dev",
+                    "python3-dev",
+                    "lib32gcc-8-dev",
+                    "python-dev",
+                ]:
+                    if node.os.is_package_in_repo(package):
+                        node.os.install_packages(package)
         # Install Open MPI
         wget = node.tools[Wget]
         script_path = wget.get(
@@ -19,6 +19,7 @@ from lisa.util import constants, get_datetime_path
 from lisa.util.logger import (
     Logger,
     create_file_handler,
+    enable_queued_file_log,
     get_logger,
     remove_handler,
     set_level,
@@ -116,6 +117,10 @@ def main() -> int:
 
         log_level = DEBUG if (args.debug) else INFO
         set_level(log_level)
+        if args.queued_log:
+            enable_queued_file_log()
+        constants.DOWNLOAD_CACHE_SIZE = args.download_cache_size * 1024 * 1024
+        constants.COMMAND_OUTPUT_MEMORY_LIMIT = args.output_memory_limit * 1024 * 1024
 
         file_handler = create_file_handler(
             Path(f"{constants.RUN_LOCAL_LOG_PATH}/lisa-{constants.RUN_ID}.log")
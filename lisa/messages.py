@@ -1,8 +1,11 @@
-from dataclasses import dataclass, field
+import copy
+import json
+from dataclasses import Field, dataclass, field, fields, is_dataclass
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, TypeVar
+from pathlib import PurePath
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type, TypeVar, cast
 
 from lisa import notifier
 from lisa.schema import NetworkDataPath
@@ -13,12 +16,76 @@ if TYPE_CHECKING:
     from lisa.testsuite import TestResult
 
 
+_SlotsType = TypeVar("_SlotsType")
+
+# cache of dataclass fields by message type. dataclasses.fields() builds a new
+# tuple on each call, and it's called for every copy and serialization.
+_fields_cache: Dict[type, Tuple["Field[Any]", ...]] = {}
+
+# values of these types are immutable, so they don't need to be deep copied.
+_immutable_types = (str, int, float, bool, Decimal, datetime, Enum, PurePath)
+
+
+def slots(cls: Type[_SlotsType]) -> Type[_SlotsType]:
+    """
+    Recreate a dataclass with __slots__, so instances don't carry a __dict__.
+    It works like dataclass(slots=True) of Python 3.10+, and supports earlier
+    Python versions. It must be applied on top of @dataclass.
+    """
+    cls_dict = dict(cls.__dict__)
+    inherited_slots = set()
+    for base in cls.__mro__[1:-1]:
+        inherited_slots.update(base.__dict__.get("__slots__", ()))
+    field_names = [x.name for x in fields(cls)]  # type: ignore
+    cls_dict["__slots__"] = tuple(x for x in field_names if x not in inherited_slots)
+    for field_name in field_names:
+        # defaults are kept by the generated __init__, and class attributes
+        # hide slot descriptors, including overridden defaults of base fields.
+        cls_dict.pop(field_name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    qualname = getattr(cls, "__qualname__", None)
+    metaclass: Type[type] = type(cls)
+    new_cls = cast(Type[_SlotsType], metaclass(cls.__name__, cls.__bases__, cls_dict))
+    if qualname is not None:
+        new_cls.__qualname__ = qualname
+    return new_cls
+
+
+def get_message_fields(message_type: type) -> Tuple["Field[Any]", ...]:
+    cached_fields = _fields_cache.get(message_type)
+    if cached_fields is None:
+        cached_fields = fields(message_type)
+        _fields_cache[message_type] = cached_fields
+    return cached_fields
+
+
+@slots
 @dataclass
 class MessageBase:
     type: str = "Base"
     time: datetime = datetime.min
     elapsed: float = 0
 
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "MessageBase":
+        # A message is deep copied for each notifier. Fields of immutable types
+        # are shared, it's much faster than the generic reduce path.
+        message_type = type(self)
+        result = message_type.__new__(message_type)
+        memo[id(self)] = result
+        for message_field in get_message_fields(message_type):
+            value = getattr(self, message_field.name)
+            if value is not None and not isinstance(value, _immutable_types):
+                value = copy.deepcopy(value, memo)
+            object.__setattr__(result, message_field.name, value)
+        # subclasses without slots may carry attributes out of fields.
+        extra_attributes = getattr(self, "__dict__", None)
+        if extra_attributes:
+            for name, value in extra_attributes.items():
+                if name not in result.__dict__:
+                    result.__dict__[name] = copy.deepcopy(value, memo)
+        return result
+
 
 TestRunStatus = Enum(
     "TestRunStatus",
@@ -51,6 +118,7 @@ TestStatus = Enum(
 )
 
 
+@slots
 @dataclass
 class TestRunMessage(MessageBase):
     type: str = "TestRun"
@@ -63,6 +131,7 @@ class TestRunMessage(MessageBase):
     message: str = ""
 
 
+@slots
 @dataclass
 class TestResultMessageBase(MessageBase):
     # id is used to identify the unique test result
@@ -79,6 +148,7 @@ class TestResultMessageBase(MessageBase):
         return _is_completed_status(self.status)
 
 
+@slots
 @dataclass
 class TestResultMessage(TestResultMessageBase):
     type: str = "TestResult"
@@ -88,6 +158,7 @@ class TestResultMessage(TestResultMessageBase):
     log_file: str = ""
 
 
+@slots
 @dataclass
 class SubTestMessage(TestResultMessageBase):
     hardware_platform: str = ""
@@ -105,6 +176,7 @@ class TransportProtocol(str, Enum):
     Udp = "UDP"
 
 
+@slots
 @dataclass
 class PerfMessage(MessageBase):
     type: str = "Performance"
@@ -149,6 +221,7 @@ DiskType = Enum(
 )
 
 
+@slots
 @dataclass
 class DiskPerformanceMessage(PerfMessage):
     disk_setup_type: DiskSetupType = DiskSetupType.raw
@@ -169,6 +242,7 @@ class DiskPerformanceMessage(PerfMessage):
     randwrite_lat_usec: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class NetworkLatencyPerformanceMessage(PerfMessage):
     max_latency_us: Decimal = Decimal(0)
@@ -180,6 +254,7 @@ class NetworkLatencyPerformanceMessage(PerfMessage):
     frequency: int = 0
 
 
+@slots
 @dataclass
 class NetworkPPSPerformanceMessage(PerfMessage):
     test_type: str = ""
@@ -197,6 +272,7 @@ class NetworkPPSPerformanceMessage(PerfMessage):
     fwd_pps_minimum: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class NetworkTCPPerformanceMessage(PerfMessage):
     connections_num: int = 0
@@ -220,6 +296,7 @@ class NetworkTCPPerformanceMessage(PerfMessage):
     congestion_windowsize_kb: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class NetworkUDPPerformanceMessage(PerfMessage):
     connections_num: int = 0
@@ -234,6 +311,7 @@ class NetworkUDPPerformanceMessage(PerfMessage):
     packet_size_kbytes: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class IPCLatency(PerfMessage):
     average_time_sec: Decimal = Decimal(0)
@@ -241,6 +319,7 @@ class IPCLatency(PerfMessage):
     max_time_sec: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class DescriptorPollThroughput(PerfMessage):
     average_ops: Decimal = Decimal(0)
@@ -248,6 +327,7 @@ class DescriptorPollThroughput(PerfMessage):
     max_ops: Decimal = Decimal(0)
 
 
+@slots
 @dataclass
 class ProvisionBootTimeMessage(MessageBase):
     type: str = "ProvisionBootTime"
@@ -263,6 +343,7 @@ class ProvisionBootTimeMessage(MessageBase):
     information: Dict[str, str] = field(default_factory=dict)
 
 
+@slots
 @dataclass
 class KernelBuildMessage(MessageBase):
     type: str = "KernelBuild"
@@ -272,6 +353,45 @@ class KernelBuildMessage(MessageBase):
     error_message: str = ""
 
 
+class MessageEncoder(json.JSONEncoder):
+    """
+    Encode messages to JSON. It uses the cached fields of messages, and
+    converts Decimal, datetime, Enum and path values, which are not supported
+    by the default encoder. Other values are converted to strings, so a message
+    is always written by notifiers.
+    """
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, MessageBase):
+            return message_to_dict(o)
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, datetime):
+            return o.isoformat()
+        if isinstance(o, Enum):
+            return o.name
+        if isinstance(o, PurePath):
+            return str(o)
+        if is_dataclass(o):
+            to_dict = getattr(o, "to_dict", None)
+            if to_dict:
+                return to_dict()
+            return {x.name: getattr(o, x.name) for x in get_message_fields(type(o))}
+        return str(o)
+
+
+def message_to_dict(message: MessageBase) -> Dict[str, Any]:
+    """
+    A shallow dict of the message fields. Field values are not converted, so it
+    is cheaper than dataclasses.asdict.
+    """
+    return {x.name: getattr(message, x.name) for x in get_message_fields(type(message))}
+
+
+def message_to_json(message: MessageBase) -> str:
+    return json.dumps(message, cls=MessageEncoder)
+
+
 def _is_completed_status(status: TestStatus) -> bool:
     return status in [
         TestStatus.FAILED,
@@ -189,19 +189,30 @@ class Nics(InitializableMixin):
         return [x.pci_slot for x in self.nics.values() if x.pci_slot]
 
     def _get_nics_driver(self) -> None:
-        for nic in [x.name for x in self.nics.values()]:
-            self.get_nic_driver(nic)
+        nic_names = [x.name for x in self.nics.values()]
+        results = self._node.execute_batch(
+            [self._get_nic_driver_command(x) for x in nic_names]
+        )
+        for nic_name, result in zip(nic_names, results):
+            result.assert_exit_code()
+            self._set_nic_driver(nic_name, result.stdout)
 
     # update the current nic driver in the NicInfo instance
     # grabs the driver short name and the driver sysfs path
     def get_nic_driver(self, nic_name: str) -> str:
         # get the current driver for the nic from the node
         # sysfs provides a link to the driver entry at device/driver
-        nic = self.get_nic(nic_name)
-        cmd = f"readlink -f /sys/class/net/{nic_name}/device/driver"
+        cmd = self._get_nic_driver_command(nic_name)
         # ex return value:
         # /sys/bus/vmbus/drivers/hv_netvsc
         found_link = self._node.execute(cmd, expected_exit_code=0).stdout
+        return self._set_nic_driver(nic_name, found_link)
+
+    def _get_nic_driver_command(self, nic_name: str) -> str:
+        return f"readlink -f /sys/class/net/{nic_name}/device/driver"
+
+    def _set_nic_driver(self, nic_name: str, found_link: str) -> str:
+        nic = self.get_nic(nic_name)
         assert_that(found_link).described_as(
             f"sysfs check for NIC device {nic_name} driver returned no output"
         ).is_not_equal_to("")
@@ -326,16 +337,12 @@ class Nics(InitializableMixin):
 
     def _get_nic_names(self) -> List[str]:
         # identify all of the nics on the device, excluding tunnels and loopbacks etc.
-        all_nics = self._node.execute(
-            "ls /sys/class/net/",
-            shell=True,
+        all_nics_result, virtual_nics_result = self._node.execute_batch(
+            ["ls /sys/class/net/", "ls /sys/devices/virtual/net"],
             sudo=True,
-        ).stdout.split()
-        virtual_nics = self._node.execute(
-            "ls /sys/devices/virtual/net",
-            shell=True,
-            sudo=True,
-        ).stdout.split()
+        )
+        all_nics = all_nics_result.stdout.split()
+        virtual_nics = virtual_nics_result.stdout.split()
 
         # remove virtual nics from the list
         non_virtual_nics = [x for x in all_nics if x not in virtual_nics]
@@ -346,15 +353,15 @@ class Nics(InitializableMixin):
         ).is_not_empty()
         return non_virtual_nics
 
-    def _get_nic_uuid(self, nic_name: str) -> str:
-        full_dev_path = self._node.execute(f"readlink /sys/class/net/{nic_name}/device")
-        uuid = os.path.basename(full_dev_path.stdout.strip())
-        self._node.log.debug(f"{nic_name} UUID:{uuid}")
-        return uuid
-
     def _get_nic_uuids(self) -> None:
-        for nic_name in self.nics.keys():
-            self.nics[nic_name].dev_uuid = self._get_nic_uuid(nic_name)
+        nic_names = list(self.nics.keys())
+        results = self._node.execute_batch(
+            [f"readlink /sys/class/net/{x}/device" for x in nic_names]
+        )
+        for nic_name, full_dev_path in zip(nic_names, results):
+            uuid = os.path.basename(full_dev_path.stdout.strip())
+            self._node.log.debug(f"{nic_name} UUID:{uuid}")
+            self.nics[nic_name].dev_uuid = uuid
 
     def _load_nics(self) -> None:
         # Identify which nics are slaved to master devices.
@@ -3,6 +3,8 @@
 
 from __future__ import annotations
 
+import asyncio
+from functools import partial
 from pathlib import Path, PurePath, PurePosixPath, PureWindowsPath
 from random import randint
 from typing import (
@@ -12,6 +14,7 @@ from typing import (
     Iterable,
     List,
     Optional,
+    Tuple,
     Type,
     TypeVar,
     Union,
@@ -22,7 +25,7 @@ from lisa import schema
 from lisa.executable import Tools
 from lisa.feature import Features
 from lisa.nic import Nics, NicsBSD
-from lisa.operating_system import BSD, OperatingSystem
+from lisa.operating_system import BSD, OperatingSystem, Posix
 from lisa.secret import add_secret
 from lisa.tools import Chmod, Df, Echo, Lsblk, Mkfs, Mount, Reboot, Uname, Wsl
 from lisa.tools.mkfs import FileSystem
@@ -41,9 +44,10 @@ from lisa.util import (
     subclasses,
 )
 from lisa.util.constants import PATH_REMOTE_ROOT
+from lisa.util.facts import EVENT_DIRTY, EVENT_NIC, EVENT_REBOOT, Facts
 from lisa.util.logger import Logger, create_file_handler, get_logger, remove_handler
 from lisa.util.parallel import run_in_parallel
-from lisa.util.process import ExecutableResult, Process, process_command
+from lisa.util.process import BatchCommand, ExecutableResult, Process, process_command
 from lisa.util.shell import LocalShell, Shell, SshShell, WslShell
 
 T = TypeVar("T")
@@ -87,12 +91,16 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
 
         # will be initialized by platform
         self.features: Features
+        # cached facts, which are read by tools and the os.
+        self.facts = Facts()
+        self.facts.add_listener(self._on_fact_event)
         self.tools = Tools(self)
         # the path uses remotely
         node_id = str(self.index) if self.index >= 0 else ""
         self.log = get_logger(logger_name, node_id, parent=parent_logger)
 
-        # to be initialized when it's first used.
+        # to be initialized when it's first used. It's stateful, so it's not a
+        # fact, and it's reset only on reboot or nic changes.
         self._nics: Optional[Nics] = None
 
         # The working path will be created in remote node, when it's used.
@@ -113,6 +121,9 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         self.capture_azure_information: bool = False
         self.capture_kernel_config: bool = False
         self.has_checked_bash_prompt: bool = False
+        # the boot id, posix type and detected information of the OS detection.
+        # It's kept over reconnections, and reused until the node is rebooted.
+        self.detected_posix_type: Optional[Tuple[str, Type[Posix], str]] = None
 
     @property
     def shell(self) -> Shell:
@@ -254,6 +265,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         timeout: int = 600,
         update_envs: Optional[Dict[str, str]] = None,
         encoding: str = "",
+        output_memory_limit: int = -1,
         expected_exit_code: Optional[int] = None,
         expected_exit_code_failure_message: str = "",
     ) -> ExecutableResult:
@@ -268,6 +280,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             cwd=cwd,
             update_envs=update_envs,
             encoding=encoding,
+            output_memory_limit=output_memory_limit,
         )
         return process.wait_result(
             timeout=timeout,
@@ -275,6 +288,102 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             expected_exit_code_failure_message=expected_exit_code_failure_message,
         )
 
+    async def execute_async_io(
+        self,
+        cmd: str,
+        shell: bool = False,
+        sudo: bool = False,
+        nohup: bool = False,
+        no_error_log: bool = False,
+        no_info_log: bool = True,
+        no_debug_log: bool = False,
+        cwd: Optional[PurePath] = None,
+        timeout: int = 600,
+        update_envs: Optional[Dict[str, str]] = None,
+        encoding: str = "",
+        output_memory_limit: int = -1,
+        expected_exit_code: Optional[int] = None,
+        expected_exit_code_failure_message: str = "",
+    ) -> ExecutableResult:
+        """
+        The awaitable version of execute. Connecting and spawning are blocking
+        calls of the shell, so they run in the default executor of the event
+        loop. The running command is awaited on the loop, so commands on many
+        nodes can be fanned out without a thread for each command.
+        """
+        loop = asyncio.get_running_loop()
+        process = await loop.run_in_executor(
+            None,
+            partial(
+                self.execute_async,
+                cmd,
+                shell=shell,
+                sudo=sudo,
+                nohup=nohup,
+                no_error_log=no_error_log,
+                no_info_log=no_info_log,
+                no_debug_log=no_debug_log,
+                cwd=cwd,
+                update_envs=update_envs,
+                encoding=encoding,
+                output_memory_limit=output_memory_limit,
+            ),
+        )
+        return await process.wait_result_aio(
+            timeout=timeout,
+            expected_exit_code=expected_exit_code,
+            expected_exit_code_failure_message=expected_exit_code_failure_message,
+        )
+
+    def execute_batch(
+        self,
+        cmds: List[str],
+        sudo: bool = False,
+        no_error_log: bool = False,
+        no_info_log: bool = True,
+        no_debug_log: bool = False,
+        cwd: Optional[PurePath] = None,
+        timeout: int = 600,
+        update_envs: Optional[Dict[str, str]] = None,
+    ) -> List[ExecutableResult]:
+        """
+        Run shell commands in one round trip, and return a result for each
+        command. Commands run one by one, even if some of them fail. On Windows,
+        commands are executed one by one.
+        """
+        self.initialize()
+        # the os may not be detected yet, so check the shell.
+        self.shell.initialize()
+        if not self.shell.is_posix:
+            return [
+                self.execute(
+                    cmd,
+                    shell=True,
+                    sudo=sudo,
+                    no_error_log=no_error_log,
+                    no_info_log=no_info_log,
+                    no_debug_log=no_debug_log,
+                    cwd=cwd,
+                    timeout=timeout,
+                    update_envs=update_envs,
+                )
+                for cmd in cmds
+            ]
+
+        batch = BatchCommand(cmds)
+        result = self.execute(
+            batch.script,
+            shell=True,
+            sudo=sudo,
+            no_error_log=no_error_log,
+            no_info_log=no_info_log,
+            no_debug_log=no_debug_log,
+            cwd=cwd,
+            timeout=timeout,
+            update_envs=update_envs,
+        )
+        return batch.split_result(result)
+
     def execute_async(
         self,
         cmd: str,
@@ -287,6 +396,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         cwd: Optional[PurePath] = None,
         update_envs: Optional[Dict[str, str]] = None,
         encoding: str = "",
+        output_memory_limit: int = -1,
     ) -> Process:
         self.initialize()
         if isinstance(self, RemoteNode):
@@ -303,6 +413,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
             cwd=cwd,
             update_envs=update_envs,
             encoding=encoding,
+            output_memory_limit=output_memory_limit,
         )
 
     def cleanup(self) -> None:
@@ -315,8 +426,8 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         self.log.debug("closing node connection...")
         if self._shell:
             self._shell.close()
-        if self._nics:
-            self._nics = None
+        self._nics = None
+        self.log.debug(f"facts: {self.facts.metrics}")
 
     def get_pure_path(self, path: str) -> PurePath:
         # spurplus doesn't support PurePath, so it needs to resolve by the
@@ -468,6 +579,7 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
     def mark_dirty(self) -> None:
         self.log.debug("mark node to dirty")
         self._is_dirty = True
+        self.facts.notify(EVENT_DIRTY)
 
     def test_connection(self) -> bool:
         assert self._shell
@@ -529,12 +641,18 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         cwd: Optional[PurePath] = None,
         update_envs: Optional[Dict[str, str]] = None,
         encoding: str = "",
+        output_memory_limit: int = -1,
         command_splitter: Callable[..., List[str]] = process_command,
     ) -> Process:
         cmd_id = str(randint(0, 10000))
         if not encoding:
             encoding = self._encoding
-        process = Process(cmd_id, self.shell, parent_logger=self.log)
+        process = Process(
+            cmd_id,
+            self.shell,
+            parent_logger=self.log,
+            output_memory_limit=output_memory_limit,
+        )
         process.start(
             cmd,
             shell=shell,
@@ -550,6 +668,10 @@ class Node(subclasses.BaseClassWithRunbookMixin, ContextMixin, InitializableMixi
         )
         return process
 
+    def _on_fact_event(self, event: str) -> None:
+        if event in [EVENT_REBOOT, EVENT_NIC]:
+            self._nics = None
+
     def _get_node_part_path(self) -> PurePath:
         path_name = self.name
         if not path_name:
@@ -662,7 +784,14 @@ class RemoteNode(Node):
             password,
             private_key_file,
         )
-        self._shell = SshShell(self._connection_info)
+        pool_size = 1
+        session_mode = ""
+        if isinstance(self.runbook, schema.RemoteNode):
+            pool_size = self.runbook.ssh_pool_size
+            session_mode = self.runbook.persistent_session
+        self._shell = SshShell(
+            self._connection_info, pool_size=pool_size, session_mode=session_mode
+        )
 
         self.public_address = public_address
         self.public_port = public_port
@@ -941,6 +1070,7 @@ class WslContainerNode(GuestNode):
 
     def reboot(self, time_out: int = 300) -> None:
         self._wsl.shutdown_distro(self._distro)
+        self.facts.notify(EVENT_REBOOT)
 
     def _provision(self) -> None:
         assert self.parent, self.__PARENT_ASSERT_MESSAGE
@@ -972,6 +1102,7 @@ class WslContainerNode(GuestNode):
         cwd: Optional[PurePath] = None,
         update_envs: Optional[Dict[str, str]] = None,
         encoding: str = "",
+        output_memory_limit: int = -1,
         command_splitter: Callable[..., List[str]] = process_command,
     ) -> Process:
         assert self.parent, self.__PARENT_ASSERT_MESSAGE
@@ -1051,6 +1182,7 @@ class WslContainerNode(GuestNode):
             cwd=None,
             update_envs=update_envs,
             encoding=encoding,
+            output_memory_limit=output_memory_limit,
             command_splitter=_get_wsl_cmd,
         )
 
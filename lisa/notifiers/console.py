@@ -34,9 +34,13 @@ class Console(notifier.Notifier):
         return ConsoleSchema
 
     def _received_message(self, message: messages.MessageBase) -> None:
+        log_level = getattr(logging, self._log_level)
+        if not self._log.isEnabledFor(log_level):
+            # skip formatting, if the message won't be output.
+            return
         simplify_message(message)
         self._log.log(
-            getattr(logging, self._log_level),
+            log_level,
             f"received message [{message.type}]: {message}",
         )
 
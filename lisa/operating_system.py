@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import re
+import threading
 import time
 from dataclasses import dataclass
 from enum import Enum
@@ -16,6 +17,7 @@ from typing import (
     Optional,
     Pattern,
     Sequence,
+    Tuple,
     Type,
     Union,
 )
@@ -42,11 +44,13 @@ from lisa.util import (
     MissingPackagesException,
     ReleaseEndOfLifeException,
     RepoNotExistException,
+    constants,
     filter_ansi_escape,
     get_matched_str,
     parse_version,
     retry_without_exceptions,
 )
+from lisa.util.facts import BOOT_ID_FACT_KEY, EVENT_PACKAGE
 from lisa.util.logger import get_logger
 from lisa.util.perf_timer import create_timer
 from lisa.util.process import ExecutableResult
@@ -57,6 +61,21 @@ if TYPE_CHECKING:
 
 
 _get_init_logger = partial(get_logger, name="os")
+_INFORMATION_FACT_KEY = "os.information"
+_PACKAGE_INVENTORY_FACT_KEY = "os.package_inventory"
+BOOT_ID_COMMAND = "cat /proc/sys/kernel/random/boot_id"
+
+
+def _get_package_fact_key(package_name: str) -> str:
+    return f"os.package.{package_name}"
+
+
+def _get_package_inventory_name(package: str) -> str:
+    # versions are pinned like "name=1.0" in apt. Package files aren't named by
+    # packages, so they are skipped.
+    if "/" in package or package.endswith((".deb", ".rpm")):
+        return ""
+    return package.split("=")[0]
 
 
 class CpuArchitecture(str, Enum):
@@ -97,6 +116,123 @@ class OsInformation:
     full_version: str = "Unknown"
 
 
+@dataclass
+# Installed packages of a node. It's loaded by one command, and updated in
+# place after packages are installed or uninstalled by LISA.
+class PackageInventory:
+    # versions of installed packages by names.
+    packages: Dict[str, str]
+    # dependencies may be installed with packages, so missing packages are
+    # queried again, if the inventory isn't complete.
+    is_complete: bool = True
+
+    def add(self, packages: List[str]) -> None:
+        for package in packages:
+            name = _get_package_inventory_name(package)
+            if name:
+                self.packages.setdefault(name, "")
+        self.is_complete = False
+
+    def remove(self, packages: List[str]) -> None:
+        for package in packages:
+            self.packages.pop(_get_package_inventory_name(package), None)
+
+
+class PackageTransaction:
+    """
+    Packages, which are installed in the transaction, are collected and
+    installed by one package manager transaction on exit, so the package
+    manager lock, metadata loading and dependency solving are paid once.
+    Code in the transaction shouldn't use the packages, because they are
+    installed on exit. If the transaction fails, packages are installed one
+    by one, so other packages are still installed.
+    """
+
+    def __init__(self, os: "Posix") -> None:
+        self._os = os
+        self._log = os._log
+        self._is_nested = False
+        # packages by arguments in the order of requests.
+        self._packages: Dict[Tuple[bool, Tuple[str, ...]], Dict[str, None]] = {}
+        self._timeouts: Dict[Tuple[bool, Tuple[str, ...]], int] = {}
+        self.request_count = 0
+
+    def __enter__(self) -> "PackageTransaction":
+        # nested transactions join the outer one.
+        current = self._os._package_transaction
+        if current:
+            self._is_nested = True
+            return current
+        self._os._package_transaction = self
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        if self._is_nested:
+            return
+        self._os._package_transaction = None
+        if exc_type is None:
+            self.commit()
+
+    def add(
+        self,
+        packages: List[str],
+        signed: bool,
+        timeout: int,
+        extra_args: Optional[List[str]],
+    ) -> None:
+        key = (signed, tuple(extra_args or []))
+        self._packages.setdefault(key, {}).update(dict.fromkeys(packages))
+        self._timeouts[key] = max(self._timeouts.get(key, 0), timeout)
+        self.request_count += 1
+
+    def commit(self) -> None:
+        timer = create_timer()
+        transaction_count = 0
+        package_count = 0
+        failures: List[Exception] = []
+        for key, packages in self._packages.items():
+            signed, extra_args = key
+            package_names = list(packages)
+            package_count += len(package_names)
+            transaction_count += 1
+            try:
+                self._os._install_package_list(
+                    package_names, signed, self._timeouts[key], list(extra_args)
+                )
+            except Exception as identifier:
+                if len(package_names) == 1:
+                    failures.append(identifier)
+                    continue
+                self._log.debug(
+                    f"failed to install {package_names} in one transaction, "
+                    f"install them one by one. {identifier}"
+                )
+                for package in package_names:
+                    transaction_count += 1
+                    try:
+                        self._os._install_package_list(
+                            [package], signed, self._timeouts[key], list(extra_args)
+                        )
+                    except Exception as package_identifier:
+                        failures.append(package_identifier)
+        self._packages.clear()
+
+        if transaction_count:
+            # the time of each transaction is estimated by the average.
+            elapsed = timer.elapsed()
+            saved_count = max(self.request_count - transaction_count, 0)
+            saved_time = elapsed / transaction_count * saved_count
+            self._log.info(
+                f"installed {package_count} packages of {self.request_count} "
+                f"requests in {transaction_count} transaction(s), elapsed: "
+                f"{elapsed:.3f} sec, saved {saved_count} transaction(s), about "
+                f"{saved_time:.3f} sec"
+            )
+        self.request_count = 0
+        if failures:
+            raise failures[0]
+
+
 @dataclass
 # It's similar with UnameResult, and will replace it.
 class KernelInformation:
@@ -136,8 +272,6 @@ class OperatingSystem:
         self._node: Node = node
         self._is_posix = is_posix
         self._log = get_logger(name="os", parent=self._node.log)
-        self._information: Optional[OsInformation] = None
-        self._packages: Dict[str, VersionInfo] = dict()
 
     @classmethod
     def create(cls, node: "Node") -> Any:
@@ -154,32 +288,11 @@ class OperatingSystem:
             # cast type for easy to use
             posix_factory: Factory[Posix] = cls.__posix_factory
 
-            matched = False
-            os_infos: List[str] = []
-            for os_info_item in cls._get_detect_string(node):
-                if os_info_item:
-                    os_infos.append(os_info_item)
-                    for sub_type in posix_factory.values():
-                        posix_type: Type[Posix] = sub_type
-                        pattern = posix_type.name_pattern()
-                        if pattern.findall(os_info_item):
-                            detected_info = os_info_item
-                            result = posix_type(node)
-                            matched = True
-                            break
-                    if matched:
-                        break
-
-            if not os_infos:
-                raise LisaException(
-                    "unknown posix distro, no os info found. "
-                    "it may cause by not support basic commands like `cat`"
-                )
-            elif not result:
-                raise LisaException(
-                    f"unknown posix distro names '{os_infos}', "
-                    f"support it in operating_system."
-                )
+            detected_type, detected_info = cls._get_cached_posix_type(node)
+            if detected_type:
+                result = detected_type(node)
+            else:
+                result, detected_info = cls._detect_posix(node, posix_factory)
         else:
             result = Windows(node)
         log.debug(f"detected OS: '{result.name}' by pattern '{detected_info}'")
@@ -195,11 +308,7 @@ class OperatingSystem:
 
     @property
     def information(self) -> OsInformation:
-        if not self._information:
-            self._information = self._get_information()
-            self._log.debug(f"parsed os information: {self._information}")
-
-        return self._information
+        return self._node.facts.get(_INFORMATION_FACT_KEY, self._load_information)
 
     @property
     def name(self) -> str:
@@ -208,52 +317,132 @@ class OperatingSystem:
     def capture_system_information(self, saved_path: Path) -> None:
         ...
 
+    @classmethod
+    def _detect_posix(
+        cls, node: "Node", posix_factory: Factory["Posix"]
+    ) -> Tuple["Posix", str]:
+        os_infos: List[str] = []
+        for os_info_item in cls._get_detect_string(node):
+            if os_info_item:
+                os_infos.append(os_info_item)
+                for sub_type in posix_factory.values():
+                    posix_type: Type[Posix] = sub_type
+                    pattern = posix_type.name_pattern()
+                    if pattern.findall(os_info_item):
+                        cls._cache_posix_type(node, posix_type, os_info_item)
+                        return posix_type(node), os_info_item
+
+        if not os_infos:
+            raise LisaException(
+                "unknown posix distro, no os info found. "
+                "it may cause by not support basic commands like `cat`"
+            )
+        raise LisaException(
+            f"unknown posix distro names '{os_infos}', "
+            f"support it in operating_system."
+        )
+
+    @classmethod
+    def _get_cached_posix_type(
+        cls, node: "Node"
+    ) -> Tuple[Optional[Type["Posix"]], str]:
+        # a detection is reused, if the boot id of the node is the same, so
+        # reconnecting to a node doesn't detect it again.
+        cached = node.detected_posix_type
+        if not cached:
+            return None, ""
+
+        cached_boot_id, posix_type, detected_info = cached
+        boot_id = node.facts.peek(BOOT_ID_FACT_KEY)
+        if boot_id is None:
+            result = node.execute(BOOT_ID_COMMAND, no_error_log=True)
+            boot_id = result.stdout.strip() if result.exit_code == 0 else ""
+            node.facts.set(BOOT_ID_FACT_KEY, boot_id)
+        if boot_id != cached_boot_id:
+            return None, ""
+        return posix_type, detected_info
+
+    @classmethod
+    def _cache_posix_type(
+        cls, node: "Node", posix_type: Type["Posix"], detected_info: str
+    ) -> None:
+        boot_id = node.facts.peek(BOOT_ID_FACT_KEY)
+        # without a boot id, like on BSD, a reboot cannot be found.
+        if boot_id:
+            node.detected_posix_type = (boot_id, posix_type, detected_info)
+
     @classmethod
     def _get_detect_string(cls, node: Any) -> Iterable[str]:
         typed_node: Node = node
-        cmd_result = typed_node.execute(cmd="lsb_release -d", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__lsb_release_pattern)
+        # the detection may try all commands, so run them in one round trip.
+        (
+            boot_id,
+            lsb_release,
+            os_release,
+            redhat_release,
+            uname,
+            issue,
+            release,
+            lsb_release_file,
+            suse_release,
+            wcscli,
+        ) = typed_node.execute_batch(
+            [
+                BOOT_ID_COMMAND,
+                "lsb_release -d",
+                "cat /etc/os-release",
+                # for RedHat, CentOS 6.x
+                "cat /etc/redhat-release",
+                # for FreeBSD
+                "uname",
+                # for Debian
+                "cat /etc/issue",
+                # note, cat /etc/*release doesn't work in some images, so try
+                # them one by one. Try best for other distros, like Sapphire
+                "cat /etc/release",
+                # try best for other distros, like VeloCloud
+                "cat /etc/lsb-release",
+                # try best for some suse derives, like netiq
+                "cat /etc/SuSE-release",
+                "wcscli",
+            ],
+            no_error_log=True,
+        )
+        typed_node.facts.set(
+            BOOT_ID_FACT_KEY, boot_id.stdout.strip() if boot_id.exit_code == 0 else ""
+        )
 
-        cmd_result = typed_node.execute(cmd="cat /etc/os-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__os_release_pattern_name)
-        yield get_matched_str(cmd_result.stdout, cls.__os_release_pattern_id)
-        cmd_result_os_release = cmd_result
+        yield get_matched_str(lsb_release.stdout, cls.__lsb_release_pattern)
 
-        # for RedHat, CentOS 6.x
-        cmd_result = typed_node.execute(
-            cmd="cat /etc/redhat-release", no_error_log=True
+        yield get_matched_str(os_release.stdout, cls.__os_release_pattern_name)
+        yield get_matched_str(os_release.stdout, cls.__os_release_pattern_id)
+
+        yield get_matched_str(
+            redhat_release.stdout, cls.__redhat_release_pattern_header
+        )
+        yield get_matched_str(
+            redhat_release.stdout, cls.__redhat_release_pattern_bracket
         )
-        yield get_matched_str(cmd_result.stdout, cls.__redhat_release_pattern_header)
-        yield get_matched_str(cmd_result.stdout, cls.__redhat_release_pattern_bracket)
 
-        # for FreeBSD
-        cmd_result = typed_node.execute(cmd="uname", no_error_log=True)
-        yield cmd_result.stdout
+        yield uname.stdout
 
-        # for Debian
-        cmd_result = typed_node.execute(cmd="cat /etc/issue", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__debian_issue_pattern)
+        yield get_matched_str(issue.stdout, cls.__debian_issue_pattern)
 
-        # note, cat /etc/*release doesn't work in some images, so try them one by one
-        # try best for other distros, like Sapphire
-        cmd_result = typed_node.execute(cmd="cat /etc/release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__release_pattern)
+        yield get_matched_str(release.stdout, cls.__release_pattern)
 
-        # try best for other distros, like VeloCloud
-        cmd_result = typed_node.execute(cmd="cat /etc/lsb-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__release_pattern)
+        yield get_matched_str(lsb_release_file.stdout, cls.__release_pattern)
 
-        # try best for some suse derives, like netiq
-        cmd_result = typed_node.execute(cmd="cat /etc/SuSE-release", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__suse_release_pattern)
+        yield get_matched_str(suse_release.stdout, cls.__suse_release_pattern)
 
-        cmd_result = typed_node.execute(cmd="wcscli", no_error_log=True)
-        yield get_matched_str(cmd_result.stdout, cls.__bmc_release_pattern)
+        yield get_matched_str(wcscli.stdout, cls.__bmc_release_pattern)
 
         # try best from distros'family through ID_LIKE
-        yield get_matched_str(
-            cmd_result_os_release.stdout, cls.__os_release_pattern_idlike
-        )
+        yield get_matched_str(os_release.stdout, cls.__os_release_pattern_idlike)
+
+    def _load_information(self) -> OsInformation:
+        information = self._get_information()
+        self._log.debug(f"parsed os information: {information}")
+        return information
 
     def _get_information(self) -> OsInformation:
         raise NotImplementedError()
@@ -317,6 +506,9 @@ class Posix(OperatingSystem, BaseClassMixin):
     def __init__(self, node: Any) -> None:
         super().__init__(node, is_posix=True)
         self._first_time_installation: bool = True
+        # transactions are per thread, so installs in other threads, which use
+        # the same node, are not deferred into the transaction.
+        self._package_transactions = threading.local()
 
     @classmethod
     def type_name(cls) -> str:
@@ -326,6 +518,17 @@ class Posix(OperatingSystem, BaseClassMixin):
     def name_pattern(cls) -> Pattern[str]:
         return re.compile(f"^{cls.type_name()}$")
 
+    @property
+    def _package_transaction(self) -> Optional[PackageTransaction]:
+        transaction: Optional[PackageTransaction] = getattr(
+            self._package_transactions, "current", None
+        )
+        return transaction
+
+    @_package_transaction.setter
+    def _package_transaction(self, value: Optional[PackageTransaction]) -> None:
+        self._package_transactions.current = value
+
     def replace_boot_kernel(self, kernel_version: str) -> None:
         raise NotImplementedError("update boot entry is not implemented")
 
@@ -357,7 +560,22 @@ class Posix(OperatingSystem, BaseClassMixin):
         extra_args: Optional[List[str]] = None,
     ) -> None:
         package_names = self._get_package_list(packages)
-        self._install_packages(package_names, signed, timeout, extra_args)
+        if self._package_transaction:
+            self._package_transaction.add(package_names, signed, timeout, extra_args)
+            return
+        self._install_package_list(package_names, signed, timeout, extra_args)
+
+    def package_transaction(self) -> "PackageTransaction":
+        """
+        Packages, which are installed in the transaction, are installed by
+        one package manager transaction on exit. For example,
+
+            with posix_os.package_transaction():
+                for package in packages:
+                    if posix_os.is_package_in_repo(package):
+                        posix_os.install_packages(package)
+        """
+        return PackageTransaction(self)
 
     def uninstall_packages(
         self,
@@ -372,15 +590,51 @@ class Posix(OperatingSystem, BaseClassMixin):
         extra_args: Optional[List[str]] = None,
     ) -> None:
         package_names = self._get_package_list(packages)
-        self._uninstall_packages(package_names, signed, timeout, extra_args)
-
-    def package_exists(self, package: Union[str, Tool, Type[Tool]]) -> bool:
+        inventory = self._node.facts.peek(_PACKAGE_INVENTORY_FACT_KEY)
+        try:
+            self._uninstall_packages(package_names, signed, timeout, extra_args)
+        finally:
+            self._node.facts.notify(EVENT_PACKAGE)
+        if inventory:
+            inventory.remove(package_names)
+            self._set_package_inventory(inventory)
+
+    def package_exists(
+        self, package: Union[str, Tool, Type[Tool]], use_cached: bool = True
+    ) -> bool:
         """
         Query if a package/tool is installed on the node.
         Return Value - bool
         """
-        package_name = self.__resolve_package_name(package)
-        return self._package_exists(package_name)
+        return self.packages_exist([package], use_cached=use_cached)[0]
+
+    def packages_exist(
+        self,
+        packages: Sequence[Union[str, Tool, Type[Tool]]],
+        use_cached: bool = True,
+    ) -> List[bool]:
+        """
+        Query if packages/tools are installed on the node. They are looked up
+        in the package inventory, which is loaded once by one command. Set
+        use_cached to False, if packages may be installed out of LISA, like
+        by VM extensions.
+        Return Value - bool of each package in the same order.
+        """
+        package_names = [self.__resolve_package_name(x) for x in packages]
+        inventory = self.get_package_inventory(use_cached=use_cached)
+        if not inventory.is_complete and any(
+            x not in inventory.packages for x in package_names
+        ):
+            inventory = self.get_package_inventory(use_cached=False)
+        return [x in inventory.packages for x in package_names]
+
+    def get_package_inventory(self, use_cached: bool = True) -> PackageInventory:
+        return self._node.facts.get(
+            _PACKAGE_INVENTORY_FACT_KEY,
+            self._load_package_inventory,
+            force=not use_cached,
+            events=[EVENT_PACKAGE],
+        )
 
     def is_package_in_repo(self, package: Union[str, Tool, Type[Tool]]) -> bool:
         """
@@ -388,9 +642,7 @@ class Posix(OperatingSystem, BaseClassMixin):
         Return Value - bool
         """
         package_name = self.__resolve_package_name(package)
-        if self._first_time_installation:
-            self._initialize_package_installation()
-            self._first_time_installation = False
+        self._prepare_package_installation()
         return self._is_package_in_repo(package_name)
 
     def update_packages(
@@ -398,22 +650,27 @@ class Posix(OperatingSystem, BaseClassMixin):
         packages: Union[str, Tool, Type[Tool], Sequence[Union[str, Tool, Type[Tool]]]],
     ) -> None:
         package_names = self._get_package_list(packages)
-        self._update_packages(package_names)
+        try:
+            self._update_packages(package_names)
+        finally:
+            self._node.facts.notify(EVENT_PACKAGE)
 
     def clean_package_cache(self) -> None:
         raise NotImplementedError()
 
     def capture_system_information(self, saved_path: Path) -> None:
         # avoid to involve node, it's ok if some command doesn't exist.
-        self._node.execute("uname -vrmo").save_stdout_to_file(saved_path / "uname.txt")
-        self._node.execute(
-            "uptime -s || last reboot -F | head -1 | awk '{print $9,$6,$7,$8}'",
-            shell=True,
-        ).save_stdout_to_file(saved_path / "uptime.txt")
-        self._node.execute(
-            "modinfo hv_netvsc",
+        uname, uptime, modinfo = self._node.execute_batch(
+            [
+                "uname -vrmo",
+                "uptime -s || last reboot -F | head -1 | awk '{print $9,$6,$7,$8}'",
+                "modinfo hv_netvsc",
+            ],
             no_error_log=True,
-        ).save_stdout_to_file(saved_path / "modinfo-hv_netvsc.txt")
+        )
+        uname.save_stdout_to_file(saved_path / "uname.txt")
+        uptime.save_stdout_to_file(saved_path / "uptime.txt")
+        modinfo.save_stdout_to_file(saved_path / "modinfo-hv_netvsc.txt")
 
         if self._node.is_test_target:
             if self._node.capture_boot_time and self._node._first_initialize:
@@ -465,7 +722,7 @@ class Posix(OperatingSystem, BaseClassMixin):
     def get_package_information(
         self, package_name: str, use_cached: bool = True
     ) -> VersionInfo:
-        found = self._packages.get(package_name, None)
+        found = self._node.facts.peek(_get_package_fact_key(package_name))
         if found and use_cached:
             return found
         return self._get_package_information(package_name)
@@ -485,6 +742,24 @@ class Posix(OperatingSystem, BaseClassMixin):
             add_args = ""
         return add_args
 
+    def _install_package_list(
+        self,
+        package_names: List[str],
+        signed: bool,
+        timeout: int,
+        extra_args: Optional[List[str]],
+    ) -> None:
+        inventory = self._node.facts.peek(_PACKAGE_INVENTORY_FACT_KEY)
+        try:
+            self._install_packages(list(package_names), signed, timeout, extra_args)
+        finally:
+            # packages bring in commands, even if some of them fail.
+            self._node.facts.notify(EVENT_PACKAGE)
+        if inventory:
+            # update the inventory in place, so it's not loaded again.
+            inventory.add(package_names)
+            self._set_package_inventory(inventory)
+
     def _install_packages(
         self,
         packages: List[str],
@@ -506,9 +781,39 @@ class Posix(OperatingSystem, BaseClassMixin):
     def _update_packages(self, packages: Optional[List[str]] = None) -> None:
         raise NotImplementedError()
 
-    def _package_exists(self, package: str) -> bool:
+    def _get_installed_packages(self) -> Dict[str, str]:
+        """
+        Return versions of installed packages by names.
+        """
         raise NotImplementedError()
 
+    def _load_package_inventory(self) -> PackageInventory:
+        inventory = PackageInventory(self._get_installed_packages())
+        self._log.debug(f"loaded {len(inventory.packages)} installed packages")
+        return inventory
+
+    def _set_package_inventory(self, inventory: PackageInventory) -> None:
+        self._node.facts.set(
+            _PACKAGE_INVENTORY_FACT_KEY, inventory, events=[EVENT_PACKAGE]
+        )
+
+    def _get_rpm_packages(self) -> Dict[str, str]:
+        result = self._node.execute(
+            "rpm -qa --qf '%{NAME}\\t%{VERSION}-%{RELEASE}\\t%{ARCH}\\n'",
+            shell=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to list installed packages",
+        )
+        packages: Dict[str, str] = {}
+        for line in result.stdout.splitlines():
+            parts = line.strip().split("\t")
+            if len(parts) == 3:
+                name, version, arch = parts
+                packages[name] = version
+                # packages can be queried with arch, like "glibc.x86_64".
+                packages[f"{name}.{arch}"] = version
+        return packages
+
     def _is_package_in_repo(self, package: str) -> bool:
         raise NotImplementedError()
 
@@ -516,6 +821,25 @@ class Posix(OperatingSystem, BaseClassMixin):
         # sub os can override it, but it's optional
         pass
 
+    def _prepare_package_installation(self) -> None:
+        if not self._first_time_installation:
+            return
+        # set it before initialization, because the initialization may install
+        # packages.
+        self._first_time_installation = False
+        try:
+            proxy = self._node.runbook.package_proxy or constants.PACKAGE_PROXY_URL
+            if proxy:
+                self._set_package_proxy(proxy)
+            self._initialize_package_installation()
+        except Exception as identifier:
+            self._first_time_installation = True
+            raise identifier
+
+    def _set_package_proxy(self, proxy: str) -> None:
+        # sub os can override it, if the package manager supports proxy.
+        self._log.debug(f"package proxy is not supported on {self.name}, skipped.")
+
     def _get_package_information(self, package_name: str) -> VersionInfo:
         raise NotImplementedError()
 
@@ -552,7 +876,9 @@ class Posix(OperatingSystem, BaseClassMixin):
     def _cache_and_return_version_info(
         self, package_name: str, info: VersionInfo
     ) -> VersionInfo:
-        self._packages[package_name] = info
+        self._node.facts.set(
+            _get_package_fact_key(package_name), info, events=[EVENT_PACKAGE]
+        )
         return info
 
     def _get_information(self) -> OsInformation:
@@ -612,9 +938,7 @@ class Posix(OperatingSystem, BaseClassMixin):
         if isinstance(packages, (str, Tool, type)):
             packages = [packages]
         package_names = [self.__resolve_package_name(item) for item in packages]
-        if self._first_time_installation:
-            self._first_time_installation = False
-            self._initialize_package_installation()
+        self._prepare_package_installation()
         return package_names
 
     def _install_package_from_url(
@@ -719,6 +1043,7 @@ class DebianRepositoryInfo(RepositoryInfo):
 
 
 class Debian(Linux):
+    _apt_proxy_file = "/etc/apt/apt.conf.d/99lisa-package-proxy"
     # Get:5 http://azure.archive.ubuntu.com/ubuntu focal-updates/main amd64 Packages [1298 kB] # noqa: E501
     _debian_repository_info_pattern = re.compile(
         r"(?P<status>\S+):(?P<id>\d+)\s+(?P<uri>\S+)\s+(?P<name>\S+)"
@@ -1058,21 +1383,25 @@ class Debian(Linux):
             + "\n",
         )
 
-    def _package_exists(self, package: str) -> bool:
-        command = "dpkg --get-selections"
-        result = self._node.execute(command, sudo=True, shell=True)
-        # Not installed package not shown in the output
-        # Uninstall package will show as deinstall
-        # The 'hold' status means that when the operating system is upgraded, the
-        # installer will not upgrade these packages,unless explicitly stated. If
-        # package is hold status, it means this package exists.
-        # vim                                             deinstall
-        # vim-common                                      install
-        # auoms                                           hold
-        package_pattern = re.compile(f"{package}([ \t]+)(install|hold)")
-        if len(list(filter(package_pattern.match, result.stdout.splitlines()))) == 1:
-            return True
-        return False
+    def _get_installed_packages(self) -> Dict[str, str]:
+        result = self._node.execute(
+            "dpkg-query -W -f='${Package}\\t${Version}\\t${db:Status-Abbrev}\\n'",
+            shell=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to list installed packages",
+        )
+        # The status is like "ii ", the second letter is the current status,
+        # and "i" means installed. Removed packages with config files are
+        # shown as "rc ", and packages on hold are shown as "hi ".
+        # vim                 2:8.1.2269-1ubuntu5     rc
+        # vim-common          2:8.1.2269-1ubuntu5.7   ii
+        # auoms               2.4.7-1                 hi
+        packages: Dict[str, str] = {}
+        for line in result.stdout.splitlines():
+            parts = line.strip("\r\n").split("\t")
+            if len(parts) == 3 and parts[2][1:2] == "i":
+                packages[parts[0]] = parts[1]
+        return packages
 
     def _is_package_in_repo(self, package: str) -> bool:
         command = f"apt-cache policy {package}"
@@ -1149,6 +1478,17 @@ class Debian(Linux):
             command += " ".join(packages)
         self._node.execute(command, sudo=True, timeout=3600)
 
+    def _set_package_proxy(self, proxy: str) -> None:
+        # only HTTP repositories use the proxy. HTTPS cannot be cached, so they
+        # are connected directly.
+        self._node.execute(
+            f"echo 'Acquire::http::Proxy \"{proxy}\";' > {self._apt_proxy_file}",
+            shell=True,
+            sudo=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to set the apt proxy",
+        )
+
 
 class Ubuntu(Debian):
     __lsb_os_info_pattern = re.compile(
@@ -1383,9 +1723,7 @@ class FreeBSD(BSD):
         timeout: int = 600,
         extra_args: Optional[List[str]] = None,
     ) -> None:
-        if self._first_time_installation:
-            self._initialize_package_installation()
-        self._first_time_installation = False
+        self._prepare_package_installation()
         command = f"env ASSUME_ALWAYS_YES=yes pkg install -y {' '.join(packages)}"
         install_result = self._node.execute(
             command, shell=True, sudo=True, timeout=timeout
@@ -1430,6 +1768,7 @@ class RPMRepositoryInfo(RepositoryInfo):
 
 # Linux distros that use RPM.
 class RPMDistro(Linux):
+    _dnf_config_files = ["/etc/dnf/dnf.conf", "/etc/yum.conf", "/etc/tdnf/tdnf.conf"]
     # microsoft-azure-rhel8-eus  Microsoft Azure RPMs for RHEL8 Extended Update Support
     _rpm_repository_info_pattern = re.compile(r"(?P<id>\S+)\s+(?P<name>\S.*\S)\s*")
 
@@ -1443,9 +1782,7 @@ class RPMDistro(Linux):
     )
 
     def get_repositories(self) -> List[RepositoryInfo]:
-        if self._first_time_installation:
-            self._initialize_package_installation()
-            self._first_time_installation = False
+        self._prepare_package_installation()
         repo_list_str = self._node.execute(
             f"{self._dnf_tool()} repolist", sudo=True
         ).stdout.splitlines()
@@ -1551,15 +1888,8 @@ class RPMDistro(Linux):
 
         self._log.debug(f"{packages} is/are uninstalled successfully.")
 
-    def _package_exists(self, package: str) -> bool:
-        command = f"{self._dnf_tool()} list installed {package}"
-        result = self._node.execute(command, sudo=True)
-        if result.exit_code == 0:
-            for row in result.stdout.splitlines():
-                if package in row:
-                    return True
-
-        return False
+    def _get_installed_packages(self) -> Dict[str, str]:
+        return self._get_rpm_packages()
 
     def _is_package_in_repo(self, package: str) -> bool:
         command = f"{self._dnf_tool()} list {package} -y"
@@ -1575,6 +1905,19 @@ class RPMDistro(Linux):
             command += " ".join(packages)
         self._node.execute(command, sudo=True, timeout=3600)
 
+    def _set_package_proxy(self, proxy: str) -> None:
+        # the package manager may be yum, dnf or tdnf, so set all existing
+        # configurations. HTTPS repositories are tunneled by the proxy.
+        files = " ".join(self._dnf_config_files)
+        self._node.execute(
+            f"for f in {files}; do [ -f $f ] && sed -i -e '/^proxy=/d' "
+            f"-e '/^\\[main\\]/a proxy={proxy}' $f; done; true",
+            shell=True,
+            sudo=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to set the package proxy",
+        )
+
 
 class Fedora(RPMDistro):
     # Red Hat Enterprise Linux Server 7.8 (Maipo) => 7.8
@@ -1762,14 +2105,6 @@ class Redhat(Fedora):
                 raise MissingPackagesException(missing_packages)
         super()._verify_package_result(install_result, packages)
 
-    def _package_exists(self, package: str) -> bool:
-        command = f"yum list installed {package}"
-        result = self._node.execute(command, sudo=True)
-        if result.exit_code == 0:
-            return True
-
-        return False
-
     def _is_package_in_repo(self, package: str) -> bool:
         command = f"yum --showduplicates list {package}"
         result = self._node.execute(command, sudo=True, shell=True)
@@ -1875,10 +2210,6 @@ class CBLMariner(RPMDistro):
     def _dnf_tool(self) -> str:
         return self._dnf_tool_name
 
-    def _package_exists(self, package: str) -> bool:
-        self._initialize_package_installation()
-        return super()._package_exists(package)
-
     def add_azure_core_repo(
         self, repo_name: Optional[AzureCoreRepo] = None, code_name: Optional[str] = None
     ) -> None:
@@ -2063,10 +2394,24 @@ class Suse(Linux):
             command += " ".join(packages)
         self._node.execute(command, sudo=True, timeout=3600)
 
-    def _package_exists(self, package: str) -> bool:
-        command = f"zypper search --installed-only --match-exact {package}"
-        result = self._node.execute(command, sudo=True, shell=True)
-        return 0 == result.exit_code
+    def _set_package_proxy(self, proxy: str) -> None:
+        # zypper reads the system proxy. Only HTTP repositories use it, because
+        # HTTPS cannot be cached. The file may not exist on minimal images, so
+        # it's created, and the settings are replaced or appended.
+        proxy_file = "/etc/sysconfig/proxy"
+        self._node.execute(
+            f"mkdir -p /etc/sysconfig && touch {proxy_file} && "
+            f"sed -i -e '/^PROXY_ENABLED=/d' -e '/^HTTP_PROXY=/d' {proxy_file} && "
+            f'printf \'PROXY_ENABLED="yes"\\nHTTP_PROXY="{proxy}"\\n\' '
+            f">> {proxy_file}",
+            shell=True,
+            sudo=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to set the zypper proxy",
+        )
+
+    def _get_installed_packages(self) -> Dict[str, str]:
+        return self._get_rpm_packages()
 
     def _is_package_in_repo(self, package: str) -> bool:
         command = f"zypper search -s --match-exact {package}"
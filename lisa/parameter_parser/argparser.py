@@ -32,6 +32,40 @@ def support_debug(parser: ArgumentParser) -> None:
     )
 
 
+def support_queued_log(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--queued_log",
+        dest="queued_log",
+        action="store_true",
+        help="Write log files in a background thread. Log records are queued and "
+        "written in batches, so test threads don't wait on disk writes.",
+    )
+
+
+def support_download_cache(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--download_cache_size",
+        type=int,
+        dest="download_cache_size",
+        default=0,
+        help="The size limit in MB of the download cache. If it's set, files of "
+        "Wget, Curl and Aria are downloaded once on the controller, and pushed to "
+        "nodes, so nodes don't need internet access to get them.",
+    )
+
+
+def support_output_memory_limit(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--output_memory_limit",
+        type=int,
+        dest="output_memory_limit",
+        default=constants.COMMAND_OUTPUT_MEMORY_LIMIT // 1024 // 1024,
+        help="The size limit in MB of command output, which is kept in memory. "
+        "Output over it is spilled to a temp file, so commands with huge output "
+        "don't hold it in memory.",
+    )
+
+
 def support_variable(parser: ArgumentParser) -> None:
     parser.add_argument(
         "--variable",
@@ -81,6 +115,9 @@ def parse_args() -> Namespace:
     """This wraps Python's 'ArgumentParser' to setup our CLI."""
     parser = ArgumentParser(prog="lisa")
     support_debug(parser)
+    support_queued_log(parser)
+    support_download_cache(parser)
+    support_output_memory_limit(parser)
     support_runbook(parser, required=False)
     support_variable(parser)
     support_log_path(parser)
@@ -11,7 +11,7 @@ from typing import Any, Dict, List, Type, cast
 from lisa import schema
 from lisa.environment import Environment, EnvironmentStatus
 from lisa.feature import Feature, Features
-from lisa.messages import MessageBase
+from lisa.messages import MessageBase, slots
 from lisa.node import Node, RemoteNode
 from lisa.parameter_parser.runbook import RunbookBuilder
 from lisa.util import (
@@ -37,6 +37,7 @@ PlatformStatus = Enum(
 )
 
 
+@slots
 @dataclass
 class PlatformMessage(MessageBase):
     type: str = "Platform"
@@ -1210,6 +1210,8 @@ class Node(TypedSchema, ExtendableSchemaMixin):
     capability: Capability = field(default_factory=Capability)
     name: str = ""
     is_default: bool = field(default=False)
+    # the caching HTTP proxy of package managers, like "http://10.0.0.4:3142".
+    package_proxy: str = ""
 
 
 @dataclass_json()
@@ -1240,6 +1242,22 @@ class RemoteNode(Node):
     username: str = constants.DEFAULT_USER_NAME
     password: str = ""
     private_key_file: str = ""
+    # the max count of SSH connections to the node. Commands are spread over
+    # connections, and more connections are established only when all existing
+    # ones are busy.
+    ssh_pool_size: int = field(
+        default=1,
+        metadata=field_metadata(
+            field_function=fields.Int, validate=validate.Range(min=1)
+        ),
+    )
+    # run commands in a long-lived shell instead of a new channel for each.
+    # "user" runs commands without sudo in it, and "root" runs sudo commands
+    # in a root shell also, if sudo doesn't need a password.
+    persistent_session: str = field(
+        default="",
+        metadata=field_metadata(validate=validate.OneOf(["", "user", "root"])),
+    )
 
     def __post_init__(self, *args: Any, **kwargs: Any) -> None:
         add_secret(self.username, PATTERN_HEADTAIL)
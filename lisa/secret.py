@@ -2,7 +2,9 @@
 # Licensed under the MIT license.
 
 import re
-from typing import Any, List, Optional, Pattern, Set, Tuple, Union
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, List, Optional, Pattern, Tuple, Union
 
 PATTERN_GUID = (
     re.compile(r"^([0-9a-f]{8})-(?:[0-9a-f]{4}-){3}[0-9a-f]{8}([0-9a-f]{4})$"),
@@ -46,13 +48,114 @@ def replace(
         return sub
 
 
-_secret_list: List[Tuple[str, str]] = []
-_secret_set: Set[str] = set()
+class _SecretMatcher:
+    """
+    Finds secrets in one pass of the text by a compiled regular expression.
+    Secrets are merged by their common prefixes, like a trie, so the
+    expression checks a few chars at each position, instead of trying each
+    secret. It finds the longest secret, which starts at each position.
+
+    Secrets may overlap, like "ab" and "bcd" in "abcd". Longer secrets have
+    the priority, so they are masked fully, like the masking by the length
+    order of secrets.
+
+    The expression is rebuilt on the next match after secrets are added, so
+    adding many secrets in a row doesn't compile it many times.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._trie: Dict[str, Any] = {}
+        # the pattern of secrets, and the pattern of overlapped secrets.
+        self._patterns: Optional[Tuple[Pattern[str], Pattern[str]]] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._trie
+
+    def add(self, secret: str) -> None:
+        with self._lock:
+            node = self._trie
+            for char in secret:
+                node = node.setdefault(char, {})
+            node[""] = {}
+            self._patterns = None
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Returns spans of secrets in the text, which don't overlap, in the order
+        of positions.
+        """
+        pattern, overlapped_pattern = self._get_patterns()
+        first = pattern.search(text)
+        if not first:
+            return []
+        # the longest secret at each position.
+        candidates = [
+            (matched.start(), matched.end(1))
+            for matched in overlapped_pattern.finditer(text, first.start())
+        ]
+        if len(candidates) == 1:
+            return candidates
+        candidates.sort(key=lambda x: (x[0] - x[1], x[0]))
+        starts: List[int] = []
+        ends: List[int] = []
+        for start, end in candidates:
+            index = bisect_left(starts, start)
+            if (index > 0 and ends[index - 1] > start) or (
+                index < len(starts) and starts[index] < end
+            ):
+                continue
+            starts.insert(index, start)
+            ends.insert(index, end)
+        return list(zip(starts, ends))
+
+    def _get_patterns(self) -> Tuple[Pattern[str], Pattern[str]]:
+        patterns = self._patterns
+        if patterns is None:
+            with self._lock:
+                if self._patterns is None:
+                    expression = self._build(self._trie)
+                    # the lookahead matches at each position, so overlapped
+                    # secrets are found.
+                    self._patterns = (
+                        re.compile(expression),
+                        re.compile(f"(?=({expression}))"),
+                    )
+                patterns = self._patterns
+        return patterns
+
+    def _build(self, node: Dict[str, Any]) -> str:
+        # follow chains of single char without recursion, because secrets like
+        # keys may be longer than the recursion limit.
+        chars: List[str] = []
+        while len(node) == 1 and "" not in node:
+            char, node = next(iter(node.items()))
+            chars.append(re.escape(char))
+        branches = [
+            re.escape(char) + self._build(child) for char, child in node.items() if char
+        ]
+        result = "".join(chars)
+        if not branches:
+            return result
+        if len(branches) == 1:
+            branch = branches[0]
+        else:
+            branch = f"(?:{'|'.join(branches)})"
+        if "" in node:
+            # a secret ends here, try the longer secrets first.
+            branch = f"(?:{branch})?"
+        return result + branch
+
+
+_secrets: Dict[str, str] = {}
+_matcher = _SecretMatcher()
 
 
 def reset() -> None:
-    _secret_set.clear()
-    _secret_list.clear()
+    global _matcher
+    _secrets.clear()
+    _matcher = _SecretMatcher()
 
 
 def add_secret(
@@ -60,24 +163,27 @@ def add_secret(
     mask: Optional[Union[Pattern[str], Tuple[Pattern[str], str]]] = None,
     sub: str = "******",
 ) -> None:
-    global _secret_list
     if origin:
         if not isinstance(origin, str):
             origin = str(origin)
-        if origin in _secret_set:
-            for index, secret in enumerate(_secret_list):
-                if origin == secret[0]:
-                    _secret_list[index] = (origin, replace(origin, sub=sub, mask=mask))
-                    break
-        else:
-            _secret_set.add(origin)
-            _secret_list.append((origin, replace(origin, sub=sub, mask=mask)))
-            # deal with longer first, in case it's broken by shorter
-            _secret_list = sorted(_secret_list, reverse=True, key=lambda x: len(x[0]))
+        is_new = origin not in _secrets
+        _secrets[origin] = replace(origin, sub=sub, mask=mask)
+        if is_new:
+            _matcher.add(origin)
 
 
 def mask(text: str) -> str:
-    for secret in _secret_list:
-        if secret[0] in text:
-            text = text.replace(secret[0], secret[1])
-    return text
+    matcher = _matcher
+    if matcher.is_empty or not text:
+        return text
+    spans = matcher.find(text)
+    if not spans:
+        return text
+    parts: List[str] = []
+    position = 0
+    for start, end in spans:
+        parts.append(text[position:start])
+        parts.append(_secrets[text[start:end]])
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
@@ -16,6 +16,7 @@ from lisa.node import Node
 from lisa.operating_system import CentOs, Redhat, Suse, Ubuntu
 from lisa.search_space import RequirementMethod
 from lisa.util import LisaException, set_filtered_fields
+from lisa.util.facts import EVENT_NIC
 
 if TYPE_CHECKING:
     from .platform_ import AwsPlatform
@@ -252,6 +253,7 @@ class NetworkInterface(AwsFeatureMixin, features.NetworkInterface):
             )
 
             index += 1
+        self._node.facts.notify(EVENT_NIC)
 
     def remove_extra_nics(self) -> None:
         aws_platform: AwsPlatform = self._platform  # type: ignore
@@ -271,6 +273,7 @@ class NetworkInterface(AwsFeatureMixin, features.NetworkInterface):
         self._log.debug(
             f"Only associated nic {networkinterface_id} into VM {self._node.name}."
         )
+        self._node.facts.notify(EVENT_NIC)
 
 
 # TODO: GPU feature is not verified yet.
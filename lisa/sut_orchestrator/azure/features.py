@@ -82,6 +82,7 @@ from lisa.util import (
     get_matched_str,
     set_filtered_fields,
 )
+from lisa.util.facts import EVENT_NIC
 
 if TYPE_CHECKING:
     from .platform_ import AzurePlatform, AzureCapability
@@ -1040,6 +1041,7 @@ class NetworkInterface(AzureFeatureMixin, features.NetworkInterface):
         )
         self._log.debug(f"attach the nics into VM {self._node.name} successfully.")
         startstop.start()
+        self._node.facts.notify(EVENT_NIC)
 
     def get_nic_count(self, is_sriov_enabled: bool = True) -> int:
         return len(
@@ -1079,6 +1081,7 @@ class NetworkInterface(AzureFeatureMixin, features.NetworkInterface):
             f"Only associated nic {primary_nic.id} into VM {self._node.name}."
         )
         startstop.start()
+        self._node.facts.notify(EVENT_NIC)
 
     def reload_module(self) -> None:
         modprobe_tool = self._node.tools[Modprobe]
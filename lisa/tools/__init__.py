@@ -112,7 +112,9 @@ from .tee import Tee
 from .texinfo import Texinfo
 from .timedatectl import Timedatectl
 from .timeout import Timeout
+from .tool_artifact import ToolArtifact
 from .unzip import Unzip
+from .upload_cache import UploadCache
 from .uptime import Uptime
 from .usermod import Usermod
 from .vdsotest import Vdsotest
@@ -236,8 +238,10 @@ __all__ = [
     "TcpDump",
     "Timedatectl",
     "Timeout",
+    "ToolArtifact",
     "Uname",
     "Unzip",
+    "UploadCache",
     "Uptime",
     "Usermod",
     "Wget",
@@ -7,7 +7,8 @@ from lisa.tools.lscpu import Lscpu
 from lisa.tools.make import Make
 from lisa.tools.mkdir import Mkdir
 from lisa.tools.tar import Tar
-from lisa.util import ReleaseEndOfLifeException, RepoNotExistException
+from lisa.tools.upload_cache import UploadCache
+from lisa.util import ReleaseEndOfLifeException, RepoNotExistException, constants
 
 
 class Aria(Tool):
@@ -70,6 +71,10 @@ class Aria(Tool):
 
         # set download path
         download_path = f"{file_path}/{filename}"
+        if constants.DOWNLOAD_CACHE_SIZE and self.node.tools[UploadCache].upload_url(
+            url, self.node.get_pure_path(download_path), sudo=sudo
+        ):
+            return download_path
 
         # if num_connections is not specified, set to minimum of number of cores
         # on the node, or 16 which is the max number of connections aria2 can
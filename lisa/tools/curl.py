@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import re
+import shlex
+from hashlib import sha256
 from pathlib import PurePath
 from typing import Optional, cast
 
@@ -8,9 +10,12 @@ from semver import VersionInfo
 
 from lisa.executable import Tool
 from lisa.operating_system import Posix
-from lisa.util import LisaException
+from lisa.util import LisaException, constants
+from lisa.util.perf_timer import create_timer
 from lisa.util.process import ExecutableResult
 
+from .upload_cache import UploadCache
+
 
 class Curl(Tool):
     # curl 7.68.0 (x86_64-pc-linux-gnu)
@@ -43,6 +48,11 @@ class Curl(Tool):
         shell: bool = False,
         cwd: Optional[PurePath] = None,
     ) -> ExecutableResult:
+        if constants.DOWNLOAD_CACHE_SIZE:
+            cached_result = self._fetch_cached(url, arg, execute_arg, sudo, cwd)
+            if cached_result:
+                return cached_result
+
         err_msg = "curl fetch failed"
         cmd_arg = f" {arg} {url}"
         if execute_arg:
@@ -57,6 +67,49 @@ class Curl(Tool):
         )
         return result
 
+    def _fetch_cached(
+        self,
+        url: str,
+        arg: str,
+        execute_arg: str,
+        sudo: bool,
+        cwd: Optional[PurePath],
+    ) -> Optional[ExecutableResult]:
+        # only downloads to a file, or scripts piped to sh, can use the download
+        # cache. Others, like the output to stdout, are fetched by curl.
+        try:
+            args = shlex.split(arg)
+        except ValueError:
+            return None
+        output = ""
+        for option in ("-o", "--output"):
+            if option in args[:-1]:
+                output = args[args.index(option) + 1]
+        if bool(output) == bool(execute_arg):
+            return None
+
+        timer = create_timer()
+        if output:
+            node_path: PurePath = self.node.get_pure_path(output)
+            if cwd and not node_path.is_absolute():
+                node_path = cwd / node_path
+        else:
+            url_hash = sha256(url.encode()).hexdigest()
+            node_path = self.get_tool_path() / f"{url_hash}.sh"
+        if not self.node.tools[UploadCache].upload_url(url, node_path, sudo=sudo):
+            return None
+        if not execute_arg:
+            return ExecutableResult("", "", 0, f"curl {arg} {url}", timer.elapsed())
+
+        return self.node.execute(
+            f"sh {execute_arg} < {node_path}",
+            shell=True,
+            sudo=sudo,
+            cwd=cwd,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="curl fetch failed",
+        )
+
     def get_version(
         self,
         sudo: bool = False,
@@ -10,6 +10,7 @@ from lisa.util import (
     find_group_in_lines,
     find_groups_in_lines,
 )
+from lisa.util.process import ExecutableResult
 
 from .find import Find
 from .ip import Ip
@@ -722,6 +723,11 @@ class Ethtool(Tool):
             return device.device_ringbuffer_settings
 
         result = self.run(f"-g {interface}", force_run=force_run)
+        return self._set_device_ring_buffer_settings(interface, result)
+
+    def _set_device_ring_buffer_settings(
+        self, interface: str, result: ExecutableResult
+    ) -> DeviceRingBufferSettings:
         if (result.exit_code != 0) and ("Operation not supported" in result.stdout):
             raise UnsupportedOperationException(
                 f"ethtool -g {interface} operation not supported."
@@ -730,6 +736,7 @@ class Ethtool(Tool):
             message=f"Couldn't get device {interface} ring buffer settings."
         )
 
+        device = self._get_or_create_device_setting(interface)
         device.device_ringbuffer_settings = DeviceRingBufferSettings(
             interface, result.stdout
         )
@@ -873,6 +880,11 @@ class Ethtool(Tool):
             return device.device_statistics
 
         result = self.run(f"-S {interface}", force_run=True)
+        return self._set_device_statistics(interface, result)
+
+    def _set_device_statistics(
+        self, interface: str, result: ExecutableResult
+    ) -> DeviceStatistics:
         if (result.exit_code != 0) and (
             "Operation not supported" in result.stdout
             or "no stats available" in result.stdout
@@ -882,6 +894,7 @@ class Ethtool(Tool):
             )
         result.assert_exit_code(message=f"Couldn't get device {interface} statistics.")
 
+        device = self._get_or_create_device_setting(interface)
         device.device_statistics = DeviceStatistics(interface, result.stdout)
         return device.device_statistics
 
@@ -912,6 +925,11 @@ class Ethtool(Tool):
             return device.device_firmware_version
 
         result = self.run(f"-i {interface}", force_run=force_run)
+        return self._set_device_firmware_version(interface, result)
+
+    def _set_device_firmware_version(
+        self, interface: str, result: ExecutableResult
+    ) -> str:
         if (result.exit_code != 0) and ("Operation not supported" in result.stdout):
             raise UnsupportedOperationException(
                 f"ethtool -i {interface} operation not supported."
@@ -927,6 +945,7 @@ class Ethtool(Tool):
             )
         firmware_version = firmware_version_pattern.group("value")
 
+        device = self._get_or_create_device_setting(interface)
         device.device_firmware_version = firmware_version
         return firmware_version
 
@@ -975,13 +994,18 @@ class Ethtool(Tool):
         return devices_msg_level_list
 
     def get_all_device_ring_buffer_settings(self) -> List[DeviceRingBufferSettings]:
-        devices_ring_buffer_settings_list = []
         devices = self.get_device_list()
-        for device in devices:
-            devices_ring_buffer_settings_list.append(
-                self.get_device_ring_buffer_settings(device)
-            )
-        return devices_ring_buffer_settings_list
+        # query devices without cached settings in one round trip.
+        devices_to_query = [
+            x
+            for x in devices
+            if not self._get_or_create_device_setting(x).device_ringbuffer_settings
+        ]
+        results = self.run_batch([f"-g {x}" for x in devices_to_query])
+        for device, result in zip(devices_to_query, results):
+            self._set_device_ring_buffer_settings(device, result)
+
+        return [self.get_device_ring_buffer_settings(x) for x in devices]
 
     def get_all_device_rss_hash_key(self) -> List[DeviceRssHashKey]:
         devices_rss_hash_keys = []
@@ -1002,24 +1026,20 @@ class Ethtool(Tool):
         return devices_rx_hash_level
 
     def get_all_device_statistics(self) -> List[DeviceStatistics]:
-        devices_statistics = []
         devices = self.get_device_list()
-        for device in devices:
-            devices_statistics.append(
-                self.get_device_statistics(device, force_run=True)
-            )
-
-        return devices_statistics
+        results = self.run_batch([f"-S {x}" for x in devices])
+        return [
+            self._set_device_statistics(device, result)
+            for device, result in zip(devices, results)
+        ]
 
     def get_all_device_firmware_version(self) -> Dict[str, str]:
-        devices_firmware_versions: Dict[str, str] = {}
         devices = self.get_device_list()
-        for device in devices:
-            devices_firmware_versions[device] = self.get_device_firmware_version(
-                device, force_run=True
-            )
-
-        return devices_firmware_versions
+        results = self.run_batch([f"-i {x}" for x in devices])
+        return {
+            device: self._set_device_firmware_version(device, result)
+            for device, result in zip(devices, results)
+        }
 
     def _get_or_create_device_setting(self, interface: str) -> DeviceSettings:
         settings = self._device_settings_map.get(interface, None)
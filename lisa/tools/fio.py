@@ -13,6 +13,7 @@ from lisa.util import LisaException, RepoNotExistException, constants
 from lisa.util.process import Process
 
 from .git import Git
+from .tool_artifact import ToolArtifact
 
 if TYPE_CHECKING:
     from lisa.testsuite import TestResult
@@ -361,9 +362,10 @@ class Fio(Tool):
             raise LisaException(
                 f"tool {self.command} can't be installed in distro {self.node.os.name}."
             )
-        for package in list(package_list):
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        with posix_os.package_transaction():
+            for package in list(package_list):
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
 
     def _install_from_src(self) -> bool:
         self._install_dep_packages()
@@ -383,6 +385,17 @@ class Fio(Tool):
                 sudo=True,
                 shell=True,
             )
+        git = self.node.tools[Git]
+        version = git.get_remote_commit_id(self.fio_repo, "refs/heads/master")
+        self.node.tools[ToolArtifact].install_from_cache(
+            self.name, version, self._build
+        )
+        self.node.execute(
+            "ln -sf /usr/local/bin/fio /usr/bin/fio", sudo=True
+        ).assert_exit_code()
+        return self._check_exists()
+
+    def _build(self, destdir: pathlib.PurePath) -> None:
         tool_path = self.get_tool_path()
         self.node.shell.mkdir(tool_path, exist_ok=True)
         git = self.node.tools[Git]
@@ -394,8 +407,4 @@ class Fio(Tool):
         from .make import Make
 
         make = self.node.tools[Make]
-        make.make_install(cwd=code_path)
-        self.node.execute(
-            "ln -sf /usr/local/bin/fio /usr/bin/fio", sudo=True, cwd=code_path
-        ).assert_exit_code()
-        return self._check_exists()
+        make.make_install(cwd=code_path, destdir=destdir)
@@ -303,6 +303,22 @@ class Git(Tool):
         )
         return filter_ansi_escape(result.stdout)
 
+    def get_remote_commit_id(self, url: str, ref: str = "HEAD") -> str:
+        """
+        Returns the commit id of the ref in a remote repo without cloning it, or
+        empty string if it's not found.
+        """
+        result = self.run(
+            f"ls-remote {url} {ref}",
+            force_run=True,
+            no_error_log=True,
+            timeout=60,
+        )
+        lines = filter_ansi_escape(result.stdout).splitlines()
+        if result.exit_code != 0 or not lines:
+            return ""
+        return lines[0].split()[0]
+
     def get_repo_url(self, cwd: pathlib.PurePath, name: str = "origin") -> str:
         result = self.run(
             f"config --get remote.{name}.url",
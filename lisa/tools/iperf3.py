@@ -4,6 +4,7 @@ import json
 import re
 import time
 from decimal import Decimal
+from pathlib import PurePath
 from typing import TYPE_CHECKING, Any, Dict, List, Pattern, Type, cast
 
 from retry import retry
@@ -26,6 +27,7 @@ from .git import Git
 from .ls import Ls
 from .lsof import Lsof
 from .make import Make
+from .tool_artifact import ToolArtifact
 
 if TYPE_CHECKING:
     from lisa.testsuite import TestResult
@@ -447,17 +449,24 @@ class Iperf3(Tool):
         firewall.stop()
 
     def _install_from_src(self) -> None:
+        git = self.node.tools[Git]
+        version = git.get_remote_commit_id(self._repo)
+        self.node.tools[ToolArtifact].install_from_cache(
+            self.name, version, self._build
+        )
+        self.node.execute("ldconfig", sudo=True).assert_exit_code()
+        self.node.execute(
+            "ln -fs /usr/local/bin/iperf3 /usr/bin/iperf3", sudo=True
+        ).assert_exit_code()
+
+    def _build(self, destdir: PurePath) -> None:
         tool_path = self.get_tool_path()
         git = self.node.tools[Git]
         git.clone(self._repo, tool_path)
         code_path = tool_path.joinpath("iperf")
         make = self.node.tools[Make]
         self.node.execute("./configure", cwd=code_path).assert_exit_code()
-        make.make_install(code_path)
-        self.node.execute("ldconfig", sudo=True, cwd=code_path).assert_exit_code()
-        self.node.execute(
-            "ln -fs /usr/local/bin/iperf3 /usr/bin/iperf3", sudo=True, cwd=code_path
-        ).assert_exit_code()
+        make.make_install(code_path, destdir=destdir)
 
     def _get_bandwidth(self, result: str, pattern: Pattern[str]) -> Decimal:
         matched = pattern.match(result)
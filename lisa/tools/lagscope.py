@@ -3,6 +3,7 @@
 
 import re
 from decimal import Decimal
+from pathlib import PurePath
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, cast
 
 from lisa import notifier
@@ -20,6 +21,7 @@ from .make import Make
 from .mixins import KillableMixin
 from .sockperf import Sockperf
 from .sysctl import Sysctl
+from .tool_artifact import ToolArtifact
 
 if TYPE_CHECKING:
     from lisa.testsuite import TestResult
@@ -297,6 +299,21 @@ class Lagscope(Tool, KillableMixin):
 
     def _install(self) -> bool:
         self._install_dep_packages()
+        git = self.node.tools[Git]
+        version = git.get_remote_commit_id(self.repo, self.branch)
+        self.node.tools[ToolArtifact].install_from_cache(
+            self.name, version, self._build
+        )
+        self.node.execute(
+            "ln -sf /usr/local/bin/lagscope /usr/bin/lagscope",
+            sudo=True,
+            shell=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="fail to create symlink to lagscope",
+        )
+        return self._check_exists()
+
+    def _build(self, destdir: PurePath) -> None:
         tool_path = self.get_tool_path()
         git = self.node.tools[Git]
         git.clone(self.repo, tool_path, ref=self.branch)
@@ -313,17 +330,10 @@ class Lagscope(Tool, KillableMixin):
             cwd=code_path,
             sudo=True,
             shell=True,
+            update_envs={"DESTDIR": str(destdir)},
             expected_exit_code=0,
             expected_exit_code_failure_message="fail to run do-cmake.sh install",
         )
-        self.node.execute(
-            "ln -sf /usr/local/bin/lagscope /usr/bin/lagscope",
-            sudo=True,
-            shell=True,
-            expected_exit_code=0,
-            expected_exit_code_failure_message="fail to create symlink to lagscope",
-        )
-        return self._check_exists()
 
     def _install_dep_packages(self) -> None:
         posix_os: Posix = cast(Posix, self.node.os)
@@ -363,9 +373,10 @@ class Lagscope(Tool, KillableMixin):
             raise LisaException(
                 f"tool {self.command} can't be installed in distro {self.node.os.name}."
             )
-        for package in list(package_list):
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        with posix_os.package_transaction():
+            for package in list(package_list):
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
 
 
 class BSDLagscope(Lagscope):
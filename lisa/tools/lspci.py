@@ -52,6 +52,8 @@ VENDOR_TYPE_DICT: Dict[str, List[str]] = {
 # Kernel driver in use: mlx5_core\r
 PATTERN_MODULE_IN_USE = re.compile(r"Kernel driver in use: ([A-Za-z0-9_-]*)", re.M)
 
+_DEVICES_FACT_KEY = "lspci.devices"
+
 
 class PciDevice:
     def __init__(self, pci_device_raw: str) -> None:
@@ -91,7 +93,6 @@ class Lspci(Tool):
 
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         self._command = "lspci"
-        self._pci_devices: List[PciDevice] = []
 
     def _install(self) -> bool:
         if isinstance(self.node.os, Posix):
@@ -121,22 +122,9 @@ class Lspci(Tool):
         return device_type_list
 
     def get_devices(self, force_run: bool = False) -> List[PciDevice]:
-        if (not self._pci_devices) or force_run:
-            self._pci_devices = []
-            # Ensure pci device ids and name mappings are updated.
-            self.node.execute("update-pciids", sudo=True)
-            result = self.run(
-                "-m",
-                force_run=force_run,
-                shell=True,
-                expected_exit_code=0,
-                sudo=True,
-            )
-            for pci_raw in result.stdout.splitlines():
-                pci_device = PciDevice(pci_raw)
-                self._pci_devices.append(pci_device)
-
-        return self._pci_devices
+        return self.node.facts.get(
+            _DEVICES_FACT_KEY, self._get_devices, force=force_run
+        )
 
     def disable_devices_by_type(self, device_type: str) -> int:
         devices = self.get_devices_by_type(device_type, force_run=True)
@@ -184,6 +172,19 @@ class Lspci(Tool):
         ]
         return gpu_device_list
 
+    def _get_devices(self) -> List[PciDevice]:
+        # Ensure pci device ids and name mappings are updated.
+        self.node.execute("update-pciids", sudo=True)
+        # the parsed devices are cached in facts, so the output isn't.
+        result = self.run(
+            "-m",
+            force_run=True,
+            shell=True,
+            expected_exit_code=0,
+            sudo=True,
+        )
+        return [PciDevice(pci_raw) for pci_raw in result.stdout.splitlines()]
+
 
 class LspciBSD(Lspci):
     _DEVICE_DRIVER_MAPPING: Dict[str, Pattern[str]] = {
@@ -31,6 +31,8 @@ from .python import Python
 # \r\n\r\n
 PATTERN_VMBUS_DEVICE = re.compile(r"(VMBUS ID[\w\W]*?)(?=VMBUS ID|\Z)", re.MULTILINE)
 
+_DEVICES_FACT_KEY = "lsvmbus.devices"
+
 
 class ChannelVPMap:
     def __init__(self, vmbus_id: str, rel_id: str, cpu: str) -> None:
@@ -153,7 +155,6 @@ class Lsvmbus(Tool):
 
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         self._command = "lsvmbus"
-        self._vmbus_devices: List[VmBusDevice] = []
         cmd_result = self.node.execute("which python", sudo=True)
         if 0 != cmd_result.exit_code:
             ln = self.node.tools[Ln]
@@ -228,23 +229,25 @@ class Lsvmbus(Tool):
         return self._check_exists()
 
     def get_device_channels(self, force_run: bool = False) -> List[VmBusDevice]:
-        if (not self._vmbus_devices) or force_run:
-            self._vmbus_devices = []
-            result = self.run("-vv", force_run=force_run, shell=True)
-            if result.exit_code != 0:
-                result = self.run(
-                    "-vv",
-                    force_run=force_run,
-                    shell=True,
-                    sudo=True,
-                    expected_exit_code=0,
-                )
-            raw_list = re.finditer(PATTERN_VMBUS_DEVICE, result.stdout)
-            for vmbus_raw in raw_list:
-                vmbus_device = LinuxVmBusDeviceParser(vmbus_raw.group())
-                self._vmbus_devices.append(vmbus_device)
+        return self.node.facts.get(
+            _DEVICES_FACT_KEY, self._get_device_channels, force=force_run
+        )
 
-        return self._vmbus_devices
+    def _get_device_channels(self) -> List[VmBusDevice]:
+        # the parsed devices are cached in facts, so the output isn't.
+        result = self.run("-vv", force_run=True, shell=True)
+        if result.exit_code != 0:
+            result = self.run(
+                "-vv",
+                force_run=True,
+                shell=True,
+                sudo=True,
+                expected_exit_code=0,
+            )
+        return [
+            LinuxVmBusDeviceParser(vmbus_raw.group())
+            for vmbus_raw in re.finditer(PATTERN_VMBUS_DEVICE, result.stdout)
+        ]
 
 
 class LsvmbusFreeBSD(Lsvmbus):
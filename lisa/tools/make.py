@@ -46,6 +46,7 @@ class Make(Tool):
         timeout: int = 600,
         sudo: bool = True,
         update_envs: Optional[Dict[str, str]] = None,
+        destdir: Optional[PurePath] = None,
     ) -> None:
         self.make(
             arguments=arguments,
@@ -56,8 +57,11 @@ class Make(Tool):
         )
 
         # install with sudo
+        install_arguments = "install"
+        if destdir:
+            install_arguments += f" DESTDIR={destdir}"
         self.make(
-            arguments="install",
+            arguments=install_arguments,
             cwd=cwd,
             timeout=timeout,
             sudo=sudo,
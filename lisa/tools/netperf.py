@@ -101,9 +101,10 @@ class Netperf(Tool):
             raise LisaException(
                 f"tool {self.command} can't be installed in distro {self.node.os.name}."
             )
-        for package in list(package_list):
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        with posix_os.package_transaction():
+            for package in list(package_list):
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
 
     def _install_from_src(self) -> None:
         self._install_dep_packages()
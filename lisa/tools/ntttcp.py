@@ -4,6 +4,7 @@
 import re
 import time
 from decimal import Decimal
+from pathlib import PurePath
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
 
 from lisa.executable import Tool
@@ -19,6 +20,7 @@ from lisa.util import LisaException, constants
 from lisa.util.process import ExecutableResult, Process
 
 from .sysctl import Sysctl
+from .tool_artifact import ToolArtifact
 
 if TYPE_CHECKING:
     from lisa.testsuite import TestResult
@@ -461,18 +463,25 @@ class Ntttcp(Tool):
                     "zlib-devel",
                 ]
             )
-        tool_path = self.get_tool_path()
         git = self.node.tools[Git]
-        git.clone(self.repo, tool_path)
-        make = self.node.tools[Make]
-        code_path = tool_path.joinpath(self.tool_path_folder)
-        make.make_install(cwd=code_path)
+        version = git.get_remote_commit_id(self.repo)
+        self.node.tools[ToolArtifact].install_from_cache(
+            self.name, version, self._build
+        )
         if not isinstance(self.node.os, BSD):
             self.node.execute(
-                "ln -s /usr/local/bin/ntttcp /usr/bin/ntttcp", sudo=True, cwd=code_path
+                "ln -sf /usr/local/bin/ntttcp /usr/bin/ntttcp", sudo=True
             ).assert_exit_code()
         return self._check_exists()
 
+    def _build(self, destdir: PurePath) -> None:
+        tool_path = self.get_tool_path()
+        git = self.node.tools[Git]
+        git.clone(self.repo, tool_path)
+        make = self.node.tools[Make]
+        code_path = tool_path.joinpath(self.tool_path_folder)
+        make.make_install(cwd=code_path, destdir=destdir)
+
     def _set_tasks_max(self) -> None:
         need_reboot = False
         if self.node.shell.exists(
@@ -5,12 +5,13 @@ import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from time import sleep
-from typing import Any, Optional, Type, cast
+from typing import Any, Dict, List, Optional, Type, cast
 
 from func_timeout import FunctionTimedOut, func_set_timeout  # type: ignore
 
 from lisa.executable import Tool
 from lisa.features import SerialConsole
+from lisa.operating_system import BOOT_ID_COMMAND
 from lisa.tools.powershell import PowerShell
 from lisa.util import (
     BadEnvironmentStateException,
@@ -18,13 +19,18 @@ from lisa.util import (
     TcpConnectionException,
     constants,
 )
+from lisa.util.facts import BOOT_ID_FACT_KEY, EVENT_REBOOT
 from lisa.util.perf_timer import create_timer
-from lisa.util.shell import wait_tcp_port_ready
+from lisa.util.shell import is_tcp_port_ready, wait_tcp_port_ready
 
 from .date import Date
 from .uptime import Uptime
 from .who import Who
 
+# the interval to poll the node on reboot, it's doubled on each try.
+_MIN_POLL_INTERVAL = 0.1
+_MAX_POLL_INTERVAL = 5
+
 
 # this method is easy to stuck on reboot, so use timeout to recycle it faster.
 @func_set_timeout(30)  # type: ignore
@@ -32,10 +38,17 @@ def _who_last(who: Who) -> datetime:
     return who.last_boot()
 
 
+@func_set_timeout(30)  # type: ignore
+def _read_boot_id(reboot: "Reboot") -> str:
+    return reboot._read_boot_id()
+
+
 class Reboot(Tool):
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         # timeout to wait
         self._command = "/sbin/reboot"
+        # seconds from the reboot to ready of each reboot.
+        self._latencies: List[float] = []
 
     @property
     def command(self) -> str:
@@ -64,7 +77,117 @@ class Reboot(Tool):
                 raise BadEnvironmentStateException(f"after reboot, {identifier}")
             raise identifier
 
+    @property
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "count": len(self._latencies),
+            "last_latency": self._latencies[-1] if self._latencies else 0,
+            "total_latency": sum(self._latencies),
+        }
+
     def reboot(self, time_out: int = 300) -> None:
+        """
+        Reboot the node, and wait until it's ready. The reboot is detected by
+        the change of boot id. If the boot id is not supported, like on BSD,
+        it's detected by the boot time.
+        """
+        timer = create_timer()
+        # read it right before the reboot, because a cached boot id may be
+        # stale, if the node is rebooted by others, like a kernel panic.
+        last_boot_id = self._read_boot_id()
+        if not last_boot_id:
+            self._reboot_by_boot_time(time_out)
+            self._add_latency(timer.elapsed())
+            return
+
+        self._log.debug(f"rebooting with boot id: {last_boot_id}")
+        self._start_reboot()
+        # facts may be changed on boot, like installed kernels.
+        self.node.facts.notify(EVENT_REBOOT)
+
+        connected = False
+        current_boot_id = last_boot_id
+        wait_seconds = _MIN_POLL_INTERVAL
+        # The previous steps may take longer time than time out. After that, it
+        # needs to connect at least once.
+        tried_times: int = 0
+        while timer.elapsed(False) < time_out or tried_times < 1:
+            tried_times += 1
+            self.node.close()
+            if self._is_port_ready():
+                try:
+                    current_boot_id = _read_boot_id(self)
+                    connected = True
+                except FunctionTimedOut as identifier:
+                    # The FunctionTimedOut must be caught separated, or the
+                    # process will exit.
+                    self._log.debug(f"ignorable timeout exception: {identifier}")
+                except Exception as identifier:
+                    # error is ignorable, as ssh may be closed suddenly.
+                    self._log.debug(f"ignorable ssh exception: {identifier}")
+                if current_boot_id and current_boot_id != last_boot_id:
+                    break
+            sleep(wait_seconds)
+            wait_seconds = min(wait_seconds * 2, _MAX_POLL_INTERVAL)
+
+        if not current_boot_id or current_boot_id == last_boot_id:
+            if connected:
+                raise LisaException(
+                    "timeout to wait reboot, the node may not perform reboot."
+                )
+            else:
+                raise LisaException(
+                    "timeout to wait reboot, the node may stuck on reboot command."
+                )
+
+        # clear facts, which are read between the reboot command and the reboot.
+        self.node.facts.notify(EVENT_REBOOT)
+        self.node.facts.set(BOOT_ID_FACT_KEY, current_boot_id)
+        self._add_latency(timer.elapsed())
+        self._log.debug(f"rebooted with boot id: {current_boot_id}")
+
+    def _read_boot_id(self) -> str:
+        result = self.node.execute(
+            BOOT_ID_COMMAND, no_error_log=True, no_info_log=True, timeout=20
+        )
+        return result.stdout.strip() if result.exit_code == 0 else ""
+
+    def _start_reboot(self) -> None:
+        # Reboot is not reliable, and sometime stuck, like SUSE
+        # sles-15-sp1-sapcal gen1 2020.10.23. So it starts in background after
+        # the command returns, and the channel is closed before the reboot.
+        # Not all distros have the same reboot execution path, so it's found in
+        # the PATH of sudo, or falls back to the default path.
+        try:
+            self.node.execute(
+                f"nohup sh -c 'sleep 1; reboot || {self._command}' "
+                "> /dev/null 2>&1 &",
+                shell=True,
+                sudo=True,
+                no_info_log=True,
+                timeout=10,
+            )
+        except Exception as identifier:
+            # it doesn't matter to exceptions here. The system may reboot fast
+            self._log.debug(f"ignorable exception on rebooting: {identifier}")
+
+    def _is_port_ready(self) -> bool:
+        from lisa.node import RemoteNode
+
+        if not isinstance(self.node, RemoteNode):
+            return True
+        return is_tcp_port_ready(
+            address=self.node.connection_info[
+                constants.ENVIRONMENTS_NODES_REMOTE_ADDRESS
+            ],
+            port=self.node.connection_info[constants.ENVIRONMENTS_NODES_REMOTE_PORT],
+        )
+
+    def _add_latency(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._log.info(f"rebooted and ready in {latency:.3f} seconds")
+
+    def _reboot_by_boot_time(self, time_out: int) -> None:
         who = self.node.tools[Who]
         timer = create_timer()
 
@@ -109,6 +232,8 @@ class Reboot(Tool):
         except Exception as identifier:
             # it doesn't matter to exceptions here. The system may reboot fast
             self._log.debug(f"ignorable exception on rebooting: {identifier}")
+        # facts may be changed on boot, like installed kernels.
+        self.node.facts.notify(EVENT_REBOOT)
 
         connected: bool = False
         # The previous steps may take longer time than time out. After that, it
@@ -154,6 +279,7 @@ class WindowsReboot(Reboot):
         self.node.tools[PowerShell].run_cmdlet(
             "Restart-Computer -Force", force_run=True
         )
+        self.node.facts.notify(EVENT_REBOOT)
 
         # wait for nested vm ssh connection to be ready
         from lisa.node import RemoteNode
@@ -193,6 +319,7 @@ class WindowsReboot(Reboot):
                 if last_boot_time < current_boot_time:
                     self._log.debug("VM has rebooted")
                     is_ready = True
+                    self._add_latency(time.time() - timeout_start)
                     break
 
             except Exception as identifier:
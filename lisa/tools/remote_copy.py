@@ -16,6 +16,14 @@ if TYPE_CHECKING:
 
 
 class RemoteCopy(Tool):
+    """
+    Copy files and directories between the local and the node. If bulk is True,
+    a directory with recurse is copied by a tar stream on one SSH channel,
+    which keeps permissions and symlinks. Otherwise, or if the node doesn't
+    support it, like minimal shells, files are copied one by one by SFTP.
+        compression: "", "gz", "bz2" or "xz", the compression of tar stream.
+    """
+
     @property
     def command(self) -> str:
         return ""
@@ -29,9 +37,16 @@ class RemoteCopy(Tool):
         src: PurePath,
         dest: PurePath,
         recurse: bool = False,
+        bulk: bool = True,
+        compression: str = "",
     ) -> List[PurePath]:
         return self._copy_internal(
-            src=src, dest=dest, recurse=recurse, is_copy_to_local=True
+            src=src,
+            dest=dest,
+            recurse=recurse,
+            is_copy_to_local=True,
+            bulk=bulk,
+            compression=compression,
         )
 
     def copy_to_remote(
@@ -39,9 +54,16 @@ class RemoteCopy(Tool):
         src: PurePath,
         dest: PurePath,
         recurse: bool = False,
+        bulk: bool = True,
+        compression: str = "",
     ) -> List[PurePath]:
         return self._copy_internal(
-            src=src, dest=dest, recurse=recurse, is_copy_to_local=False
+            src=src,
+            dest=dest,
+            recurse=recurse,
+            is_copy_to_local=False,
+            bulk=bulk,
+            compression=compression,
         )
 
     @classmethod
@@ -60,6 +82,8 @@ class RemoteCopy(Tool):
         dest: PurePath,
         recurse: bool = False,
         is_copy_to_local: bool = True,
+        bulk: bool = True,
+        compression: str = "",
     ) -> List[PurePath]:
         is_file = self._is_file(
             self._get_source_node(is_copy_to_local=is_copy_to_local), src
@@ -75,6 +99,8 @@ class RemoteCopy(Tool):
                 recurse=recurse,
                 is_file=is_file,
                 is_copy_to_local=is_copy_to_local,
+                bulk=bulk,
+                compression=compression,
             )
         except Exception as e:
             # use temp folder on copy to local only, because no scenario needs
@@ -92,7 +118,14 @@ class RemoteCopy(Tool):
 
             # copy files from the temp directory and remove the temp directory
             try:
-                return self._copy(tmp_location, dest, recurse=recurse, is_file=is_file)
+                return self._copy(
+                    tmp_location,
+                    dest,
+                    recurse=recurse,
+                    is_file=is_file,
+                    bulk=bulk,
+                    compression=compression,
+                )
             finally:
                 self.node.tools[Rm].remove_directory(
                     self.node.get_str_path(tmp_location), sudo=True
@@ -165,7 +198,23 @@ class RemoteCopy(Tool):
         is_file: bool = False,
         recurse: bool = False,
         is_copy_to_local: bool = True,
+        bulk: bool = True,
+        compression: str = "",
     ) -> List[PurePath]:
+        if (
+            bulk
+            and recurse
+            and not is_file
+            and self._local_node.is_posix
+            and self.node.shell.is_tree_copy_supported
+        ):
+            return self._copy_tree(
+                src,
+                dest,
+                is_copy_to_local=is_copy_to_local,
+                compression=compression,
+            )
+
         dest_files: List[PurePath] = []
 
         if is_copy_to_local:
@@ -212,10 +261,36 @@ class RemoteCopy(Tool):
 
         # copy sub folders
         for dir_ in dirs:
-            dest_files.extend(self._copy(dir_, destination_dir, recurse=recurse))
+            dest_files.extend(
+                self._copy(
+                    dir_,
+                    destination_dir,
+                    recurse=recurse,
+                    is_copy_to_local=is_copy_to_local,
+                    bulk=bulk,
+                )
+            )
 
         return dest_files
 
+    def _copy_tree(
+        self,
+        src: PurePath,
+        dest: PurePath,
+        is_copy_to_local: bool,
+        compression: str,
+    ) -> List[PurePath]:
+        destination_dir = dest / src.name
+        if is_copy_to_local:
+            names = self.node.shell.copy_tree_back(
+                src, destination_dir, compression=compression
+            )
+        else:
+            names = self.node.shell.copy_tree(
+                src, destination_dir, compression=compression
+            )
+        return [destination_dir / name for name in names]
+
 
 class WindowsRemoteCopy(RemoteCopy):
     @property
@@ -4,7 +4,7 @@
 import pathlib
 import re
 from decimal import Decimal
-from typing import TYPE_CHECKING, Any, Dict, List, Type, Union, cast
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, Union, cast
 
 from assertpy import assert_that
 
@@ -19,6 +19,7 @@ from .firewall import Firewall
 from .gcc import Gcc
 from .git import Git
 from .make import Make
+from .tool_artifact import ToolArtifact
 
 if TYPE_CHECKING:
     from lisa.testsuite import TestResult
@@ -117,30 +118,39 @@ class Sockperf(Tool):
             if not isinstance(posix_os, BSD):
                 self.node.tools[Gcc].install_cpp_compiler()
 
-            tool_path = self.get_tool_path()
-
             git = self.node.tools[Git]
-            git.clone(self._sockperf_repo, tool_path)
-            code_path = tool_path.joinpath("sockperf")
-            # try latest, if fails, try stable
-            # seems to work best for BSD+Linux compat for now
-            try:
-                self.run_build_install(code_path)
-            except AssertionError:  # catch build failures
-                self.node.tools[Make].run("clean", cwd=code_path, force_run=True)
-                # try and older stable tag
-                git.checkout(cwd=code_path, ref="3.10")
-                self.node.log.debug(
-                    "Latest build failed, re-running with stable version 3.10."
-                )
-                self.run_build_install(code_path)
+            version = git.get_remote_commit_id(self._sockperf_repo)
+            self.node.tools[ToolArtifact].install_from_cache(
+                self.name, version, self._build
+            )
 
         # disable any firewalls running which might mess with the test
         self.node.tools[Firewall].stop()
 
         return self._check_exists()
 
-    def run_build_install(self, code_path: pathlib.PurePath) -> None:
+    def _build(self, destdir: pathlib.PurePath) -> None:
+        tool_path = self.get_tool_path()
+
+        git = self.node.tools[Git]
+        git.clone(self._sockperf_repo, tool_path)
+        code_path = tool_path.joinpath("sockperf")
+        # try latest, if fails, try stable
+        # seems to work best for BSD+Linux compat for now
+        try:
+            self.run_build_install(code_path, destdir)
+        except AssertionError:  # catch build failures
+            self.node.tools[Make].run("clean", cwd=code_path, force_run=True)
+            # try and older stable tag
+            git.checkout(cwd=code_path, ref="3.10")
+            self.node.log.debug(
+                "Latest build failed, re-running with stable version 3.10."
+            )
+            self.run_build_install(code_path, destdir)
+
+    def run_build_install(
+        self, code_path: pathlib.PurePath, destdir: Optional[pathlib.PurePath] = None
+    ) -> None:
         make = self.node.tools[Make]
         self.node.execute(
             "./autogen.sh",
@@ -162,7 +172,7 @@ class Sockperf(Tool):
             ),
         )
 
-        make.make_install(cwd=code_path, sudo=True)
+        make.make_install(cwd=code_path, sudo=True, destdir=destdir)
 
     def start(self, command: str) -> Process:
         return self.run_async(command, shell=True, force_run=True)
@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import uuid
+from pathlib import PurePath
+from typing import Callable
+
+from lisa.base_tools import Uname
+from lisa.executable import Tool
+from lisa.operating_system import Linux
+from lisa.util import constants
+from lisa.util.artifact_store import ArtifactStore
+
+_ARTIFACT_PATH = "tool_artifacts"
+
+
+class ToolArtifact(Tool):
+    """
+    A cache of tools, which are built from source code. After the first build
+    on a distro, release, architecture and version of source code, the
+    installed files are packed as a tarball, and saved on the controller.
+    Later nodes with the same key get the tarball pushed and unpacked,
+    instead of building again. The sha256 of tarballs is checked on the
+    controller and on nodes.
+    """
+
+    @property
+    def command(self) -> str:
+        return "tar"
+
+    @property
+    def can_install(self) -> bool:
+        return False
+
+    def install_from_cache(
+        self, name: str, version: str, build: Callable[[PurePath], None]
+    ) -> None:
+        """
+        name: the name of the tool.
+        version: the version of source code, like a commit id or a tag. If it's
+            empty, the tool is built, and it's not cached.
+        build: builds the tool, and installs it into the given path as DESTDIR.
+            If nothing is installed into the path, the tool is not cached.
+        """
+        key = self._get_key(name, version) if version else ""
+        store = ArtifactStore(constants.CACHE_PATH / _ARTIFACT_PATH)
+        if key:
+            artifact = store.get(key)
+            if artifact and self._restore(name, *artifact):
+                self._log.info(f"installed {name} from the cached artifact {key}")
+                return
+
+        tool_path = self.get_tool_path()
+        staging_path = tool_path / name
+        archive_path = tool_path / f"{name}.tar.gz"
+        self.node.execute(
+            f"rm -rf {staging_path} && mkdir -p {staging_path}",
+            shell=True,
+            sudo=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to create staging path",
+        )
+        build(staging_path)
+
+        installed = self.node.execute(
+            f"find {staging_path} ! -type d | head -n 1", shell=True, sudo=True
+        )
+        if not installed.stdout:
+            # the build doesn't support DESTDIR, so it's installed already.
+            self._log.debug(f"nothing is installed in {staging_path}, skip caching.")
+            return
+
+        self.run(
+            f"-czf {archive_path} -C {staging_path} .",
+            shell=True,
+            sudo=True,
+            force_run=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message=f"failed to pack {name}",
+        )
+        self._extract(archive_path)
+        if key:
+            self._save(store, key, archive_path)
+
+    def _get_key(self, name: str, version: str) -> str:
+        information = self.node.os.information
+        arch = self.node.tools[Uname].get_linux_information().hardware_platform
+        return ArtifactStore.create_key(
+            name, f"{information.vendor}_{information.release}_{arch}", version
+        )
+
+    def _restore(self, name: str, local_path: PurePath, checksum: str) -> bool:
+        archive_path = self.get_tool_path() / f"{name}.tar.gz"
+        self.node.shell.copy(local_path, archive_path)
+        node_checksum = self._get_node_checksum(archive_path)
+        if node_checksum != checksum:
+            self._log.debug(
+                f"the checksum of {archive_path} is {node_checksum}, "
+                f"but {checksum} is expected. Build {name} instead."
+            )
+            return False
+        self._extract(archive_path)
+        return True
+
+    def _save(self, store: ArtifactStore, key: str, archive_path: PurePath) -> None:
+        checksum = self._get_node_checksum(archive_path)
+        if not checksum:
+            return
+        local_path = store.path / f"{uuid.uuid4().hex}.download"
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.node.shell.copy_back(archive_path, local_path)
+            store.put(key, local_path, checksum)
+            self._log.debug(f"saved the artifact {key}")
+        except Exception as identifier:
+            # the tool is installed already, so caching is best effort.
+            self._log.debug(f"failed to save the artifact {key}: {identifier}")
+        finally:
+            local_path.unlink(missing_ok=True)
+
+    def _extract(self, archive_path: PurePath) -> None:
+        parameters = f"-xzf {archive_path} -C /"
+        if isinstance(self.node.os, Linux):
+            # keep the owner and mode of existing folders, like /usr/local/bin.
+            parameters += " --no-overwrite-dir"
+        self.run(
+            parameters,
+            shell=True,
+            sudo=True,
+            force_run=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message=f"failed to extract {archive_path}",
+        )
+
+    def _get_node_checksum(self, path: PurePath) -> str:
+        result = self.node.execute(f"sha256sum {path}", shell=True, sudo=True)
+        if result.exit_code != 0:
+            return ""
+        return result.stdout.split()[0]
@@ -0,0 +1,164 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import hashlib
+import re
+import shlex
+from functools import partial
+from pathlib import PurePath
+from typing import Dict, List, Optional, Set, Tuple
+
+from lisa.executable import Tool
+from lisa.util.download_cache import get_download_cache
+
+
+class UploadCache(Tool):
+    """
+    A content-addressed store of uploaded files on the node. Blobs are named by
+    sha256 under the global tool path, so they are kept when the environment
+    is reused, or the node is initialized again after a reboot. The blobs of
+    all files are checked by one command, only missing or broken blobs are
+    uploaded, and then files are copied into place by one command. Files are
+    copied instead of hard linked, so changes of placed files don't change
+    blobs.
+    """
+
+    # the output of sha256sum, like "<hash>  <path>".
+    _sha256sum_pattern = re.compile(r"^(?P<hash>[0-9a-f]{64})\s+\*?(?P<path>.+)$")
+
+    @property
+    def command(self) -> str:
+        return "sha256sum"
+
+    @property
+    def can_install(self) -> bool:
+        return False
+
+    def upload(
+        self,
+        files: List[Tuple[PurePath, PurePath]],
+        mode: Optional[int] = None,
+        sudo: bool = False,
+    ) -> List[PurePath]:
+        """
+        files: pairs of the local path and the node path.
+        mode: the mode of node files, if it's set.
+        sudo: place files by sudo, if node paths are not writable by the user.
+            Files are owned by root, and the mode is 644, if it's not set.
+        Returns local paths, which are uploaded, so others are in the cache.
+        """
+        if not self.node.is_posix or not self.exists:
+            for local_path, node_path in files:
+                self.node.shell.copy(local_path, node_path)
+                if mode is not None:
+                    self.node.shell.chmod(node_path, mode)
+            return [local_path for local_path, _ in files]
+
+        store_path = self.get_tool_path(use_global=True)
+        hashes = {local_path: _get_file_hash(local_path) for local_path, _ in files}
+        blob_paths = {x: store_path / x for x in set(hashes.values())}
+        cached_hashes = self._get_cached_hashes(list(blob_paths.values()))
+
+        uploaded_paths: List[PurePath] = []
+        for local_path, file_hash in hashes.items():
+            if file_hash not in cached_hashes:
+                self._log.debug(f"uploading {local_path} to cache as {file_hash}")
+                self.node.shell.copy(local_path, blob_paths[file_hash])
+                cached_hashes.add(file_hash)
+                uploaded_paths.append(local_path)
+
+        self._place_files(
+            [(blob_paths[hashes[local]], node) for local, node in files], mode, sudo
+        )
+        return uploaded_paths
+
+    def upload_url(
+        self,
+        url: str,
+        node_path: PurePath,
+        mode: Optional[int] = None,
+        sudo: bool = False,
+    ) -> bool:
+        """
+        Download the url on the controller by the download cache, and upload it
+        to the node path. Returns False, if the download cache is not enabled,
+        or the url cannot be downloaded on the controller, so the caller should
+        download it on the node.
+        """
+        download_cache = get_download_cache()
+        if not download_cache or not self.node.is_posix or not self.exists:
+            return False
+        local_path = download_cache.get(url, self._log)
+        if not local_path:
+            return False
+        try:
+            self.upload([(local_path, node_path)], mode=mode, sudo=sudo)
+        except Exception as identifier:
+            # the cached file may be evicted by other downloads.
+            self._log.debug(
+                f"failed to upload the cached file of '{url}': {identifier}"
+            )
+            return False
+        self._log.debug(f"uploaded '{url}' from the download cache to {node_path}")
+        return True
+
+    def _get_cached_hashes(self, blob_paths: List[PurePath]) -> Set[str]:
+        # hash blobs again, so a broken blob is uploaded again.
+        result = self.run(
+            " ".join(shlex.quote(self.node.get_str_path(x)) for x in blob_paths),
+            force_run=True,
+            shell=True,
+            no_info_log=True,
+            no_error_log=True,
+        )
+        cached_hashes: Set[str] = set()
+        for line in result.stdout.splitlines():
+            matched = self._sha256sum_pattern.match(line.strip())
+            if matched and PurePath(matched["path"]).name == matched["hash"]:
+                cached_hashes.add(matched["hash"])
+        return cached_hashes
+
+    def _place_files(
+        self, files: List[Tuple[PurePath, PurePath]], mode: Optional[int], sudo: bool
+    ) -> None:
+        parents: Dict[str, None] = {
+            shlex.quote(self.node.get_str_path(node.parent)): None for _, node in files
+        }
+        commands = [f"mkdir -p {' '.join(parents)}"]
+        for blob_path, node_path in files:
+            blob = shlex.quote(self.node.get_str_path(blob_path))
+            node_str = self.node.get_str_path(node_path)
+            node = shlex.quote(node_str)
+            temp = shlex.quote(f"{node_str}.lisa_tmp")
+            if sudo:
+                # blobs are owned by the user, so files are installed as root.
+                install_mode = 0o644 if mode is None else mode
+                commands.append(
+                    f"install -m {install_mode:o} -o 0 -g 0 {blob} {temp} "
+                    f"&& mv -f {temp} {node}"
+                )
+                continue
+            # copy to a temp file and move it, so the inode of the existing
+            # file, which may be a hard link of others, isn't written.
+            commands.append(
+                f"{{ cp --reflink=auto {blob} {temp} 2>/dev/null "
+                f"|| cp {blob} {temp}; }} && mv -f {temp} {node}"
+            )
+            if mode is not None:
+                commands.append(f"chmod {mode:o} {node}")
+        self.node.execute(
+            " && ".join(commands),
+            shell=True,
+            sudo=sudo,
+            no_info_log=True,
+            expected_exit_code=0,
+            expected_exit_code_failure_message="failed to place files from cache",
+        )
+
+
+def _get_file_hash(path: PurePath) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(partial(file.read, 1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
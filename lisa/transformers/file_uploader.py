@@ -3,12 +3,12 @@
 import os
 from dataclasses import dataclass, field
 from pathlib import PurePath
-from typing import Any, Dict, List, Type
+from typing import Any, Dict, List, Tuple, Type
 
 from dataclasses_json import dataclass_json
 
 from lisa import schema
-from lisa.tools import Ls, Mkdir, RemoteCopy
+from lisa.tools import Ls, Mkdir, RemoteCopy, UploadCache
 from lisa.transformers.deployment_transformer import (
     DeploymentTransformer,
     DeploymentTransformerSchema,
@@ -73,13 +73,21 @@ class FileUploaderTransformer(DeploymentTransformer):
             mkdir = self._node.tools[Mkdir]
             mkdir.create_directory(runbook.destination)
 
+        # files are uploaded through the cache on node, so the same content
+        # isn't uploaded again, like the environment is reused.
+        cached_files: List[Tuple[PurePath, PurePath]] = []
         for name in runbook.files:
             local_path = PurePath(runbook.source) / name
             remote_path = PurePath(runbook.destination)
             self._log.debug(f"uploading file from '{local_path}' to '{remote_path}'")
 
-            copy.copy_to_remote(local_path, remote_path)
+            if os.path.isfile(local_path):
+                cached_files.append((local_path, remote_path / local_path.name))
+            else:
+                copy.copy_to_remote(local_path, remote_path)
             uploaded_files.append(name)
+        if cached_files:
+            self._node.tools[UploadCache].upload(cached_files)
 
         result[UPLOADED_FILES] = uploaded_files
         return result
@@ -20,6 +20,7 @@ from lisa.transformers.deployment_transformer import (
     DeploymentTransformerSchema,
 )
 from lisa.util import field_metadata, filter_ansi_escape, get_matched_str, subclasses
+from lisa.util.facts import EVENT_KERNEL
 from lisa.util.logger import Logger, get_logger
 
 
@@ -151,6 +152,7 @@ class KernelInstallerTransformer(DeploymentTransformer):
             ).kernel_version_raw
 
             installed_kernel_version = installer.install()
+            node.facts.notify(EVENT_KERNEL)
             build_sucess = True
             self._information = installer.information
             self._log.info(f"installed kernel version: {installed_kernel_version}")
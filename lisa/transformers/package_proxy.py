@@ -0,0 +1,128 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import socket
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+from dataclasses_json import dataclass_json
+
+from lisa import schema
+from lisa.node import Node, quick_connect
+from lisa.tools import Python
+from lisa.transformer import Transformer
+from lisa.util import constants, field_metadata, package_proxy
+from lisa.util.package_proxy import PackageProxy
+
+PACKAGE_PROXY = "package_proxy"
+_OUTPUT_URL = "url"
+# the proxy prints it, when it's ready to serve.
+_READY_KEYWORD = "serving on"
+
+
+@dataclass_json
+@dataclass
+class PackageProxyTransformerSchema(schema.Transformer):
+    # The proxy runs on the node, if it's set. Otherwise, it runs on the
+    # controller.
+    connection: Optional[schema.RemoteNode] = field(
+        default=None, metadata=field_metadata(required=False)
+    )
+    # the address, which nodes connect to. The default is the address of the
+    # connection, or the address of the controller.
+    address: str = ""
+    # the address, which the proxy binds to. The default is the address above.
+    # Set it, if nodes connect to a translated address, like a public IP.
+    bind_address: str = ""
+    port: int = 3142
+    # addresses or networks of nodes, like "10.0.0.0/16". If it's empty, nodes
+    # in the /24 subnet of the bind address are allowed.
+    allowed_clients: List[str] = field(default_factory=list)
+    # mirror hosts of HTTPS repositories, which are tunneled on port 443. If
+    # it's empty, HTTPS repositories are not reachable by the proxy.
+    connect_hosts: List[str] = field(default_factory=list)
+    # the default path is in the cache path of the controller, or the working
+    # path of the node.
+    cache_path: str = ""
+    # in MB
+    cache_size: int = 10240
+    # use the proxy on all nodes, which don't set package_proxy.
+    apply_to_nodes: bool = True
+
+
+class PackageProxyTransformer(Transformer):
+    """
+    This transformer starts a caching proxy of package managers, so packages
+    are downloaded once from mirrors, and served to all nodes of the run.
+    Nodes use it, when package installation is initialized.
+    """
+
+    @classmethod
+    def type_name(cls) -> str:
+        return PACKAGE_PROXY
+
+    @classmethod
+    def type_schema(cls) -> Type[schema.TypedSchema]:
+        return PackageProxyTransformerSchema
+
+    @property
+    def _output_names(self) -> List[str]:
+        return [_OUTPUT_URL]
+
+    def _internal_run(self) -> Dict[str, Any]:
+        runbook: PackageProxyTransformerSchema = self.runbook
+        if runbook.connection:
+            node = quick_connect(
+                runbook.connection, runbook.name, parent_logger=self._log
+            )
+            address = runbook.address or runbook.connection.address
+            self._start_on_node(node, runbook.bind_address or address)
+        else:
+            address = runbook.address or socket.gethostbyname(socket.gethostname())
+            self._start_on_controller(runbook.bind_address or address)
+
+        url = f"http://{address}:{runbook.port}"
+        self._log.info(f"package proxy is started on {url}")
+        if runbook.apply_to_nodes:
+            constants.PACKAGE_PROXY_URL = url
+        return {_OUTPUT_URL: url}
+
+    def _start_on_controller(self, bind_address: str) -> None:
+        runbook: PackageProxyTransformerSchema = self.runbook
+        cache_path = (
+            Path(runbook.cache_path)
+            if runbook.cache_path
+            else constants.CACHE_PATH / PACKAGE_PROXY
+        )
+        # the proxy serves in a daemon thread until the run ends.
+        self._proxy = PackageProxy(
+            cache_path,
+            runbook.cache_size * 1024 * 1024,
+            address=bind_address,
+            port=runbook.port,
+            allowed_clients=runbook.allowed_clients,
+            connect_hosts=runbook.connect_hosts,
+        )
+        self._proxy.start()
+
+    def _start_on_node(self, node: Node, bind_address: str) -> None:
+        runbook: PackageProxyTransformerSchema = self.runbook
+        working_path = node.working_path / PACKAGE_PROXY
+        node.shell.mkdir(working_path, exist_ok=True)
+        script_path = working_path / "package_proxy.py"
+        node.shell.copy(Path(package_proxy.__file__), script_path)
+        cache_path = runbook.cache_path or str(working_path / "cache")
+
+        arguments = "".join(f" --allowed-client {x}" for x in runbook.allowed_clients)
+        arguments += "".join(f" --connect-host {x}" for x in runbook.connect_hosts)
+
+        python = node.tools[Python]
+        process = node.execute_async(
+            f"{python.command} {script_path} --address {bind_address} "
+            f"--port {runbook.port} --cache-path {cache_path} "
+            f"--cache-size {runbook.cache_size}{arguments}",
+            shell=True,
+            nohup=True,
+        )
+        process.wait_output(_READY_KEYWORD, timeout=60)
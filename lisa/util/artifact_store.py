@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from functools import partial
+from pathlib import Path
+from typing import Optional, Tuple
+
+from lisa.util import LisaException
+
+_ARTIFACT_FILE_NAME = "artifact"
+_CHECKSUM_FILE_NAME = "artifact.sha256"
+# parts of keys are used as folder names.
+_key_part_pattern = re.compile(r"[^\w.+-]+")
+
+
+class ArtifactStore:
+    """
+    A store of built artifacts on the controller, like tarballs of tools,
+    which are built from source code. An artifact is saved with its sha256,
+    and it's checked on every get, so a broken artifact is removed and built
+    again, instead of being deployed to nodes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @staticmethod
+    def create_key(*parts: str) -> str:
+        return "/".join(_key_part_pattern.sub("_", x) or "_" for x in parts)
+
+    def get(self, key: str) -> Optional[Tuple[Path, str]]:
+        """
+        Returns the path and sha256 of the artifact, or None, if it's not
+        saved or it's broken.
+        """
+        artifact_path, checksum_path = self._get_paths(key)
+        if not artifact_path.exists() or not checksum_path.exists():
+            return None
+
+        checksum = checksum_path.read_text().strip()
+        if get_file_hash(artifact_path) != checksum:
+            artifact_path.unlink(missing_ok=True)
+            checksum_path.unlink(missing_ok=True)
+            return None
+        return artifact_path, checksum
+
+    def put(self, key: str, source: Path, checksum: str) -> Path:
+        """
+        Move the source file into the store. The checksum is the sha256, which
+        is expected, so a file broken on copying is not saved.
+        """
+        actual_checksum = get_file_hash(source)
+        if actual_checksum != checksum:
+            source.unlink(missing_ok=True)
+            raise LisaException(
+                f"the checksum of artifact '{key}' is {actual_checksum}, "
+                f"but {checksum} is expected."
+            )
+
+        artifact_path, checksum_path = self._get_paths(key)
+        artifact_path.parent.mkdir(parents=True, exist_ok=True)
+        # move and replace in the same folder, so parallel puts of the same
+        # key don't see a partial file.
+        temp_path = artifact_path.with_name(f"{uuid.uuid4().hex}.tmp")
+        shutil.move(str(source), temp_path)
+        os.replace(temp_path, artifact_path)
+        temp_path = checksum_path.with_name(f"{uuid.uuid4().hex}.tmp")
+        temp_path.write_text(checksum)
+        os.replace(temp_path, checksum_path)
+        return artifact_path
+
+    def _get_paths(self, key: str) -> Tuple[Path, Path]:
+        folder = self.path / key
+        return folder / _ARTIFACT_FILE_NAME, folder / _CHECKSUM_FILE_NAME
+
+
+def get_file_hash(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(partial(file.read, 1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
@@ -40,6 +40,22 @@ NORMALIZE_PATTERN = re.compile(r"[^A-Za-z0-9]")
 
 # default values
 DEFAULT_USER_NAME = "lisatest"
+# command output over this size in chars is spilled to a temp file.
+COMMAND_OUTPUT_MEMORY_LIMIT = 16 * 1024 * 1024
+# files from this size are copied by ranges over parallel SFTP connections.
+LARGE_FILE_COPY_SIZE = 64 * 1024 * 1024
+LARGE_FILE_CHUNK_SIZE = 16 * 1024 * 1024
+LARGE_FILE_COPY_PARALLEL = 4
+# facts of a node expire after the seconds, and the least recently used facts
+# are evicted over the limit.
+NODE_FACT_TTL = 3600
+NODE_FACT_LIMIT = 1024
+# the caching package proxy of nodes, like "http://10.0.0.4:3142". It's set by
+# the package_proxy transformer, and the package_proxy of nodes overrides it.
+PACKAGE_PROXY_URL = ""
+# the size limit in bytes of files, which are downloaded on the controller and
+# pushed to nodes by Wget, Curl and Aria. 0 means to download on nodes.
+DOWNLOAD_CACHE_SIZE = 0
 
 # feature names
 FEATURE_DISK = "Disk"
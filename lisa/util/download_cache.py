@@ -0,0 +1,125 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, Optional
+
+from lisa.util import constants
+from lisa.util.logger import Logger
+from lisa.util.package_proxy import PackageCache
+
+_DOWNLOAD_CACHE_PATH = "downloads"
+_DOWNLOAD_TIMEOUT = 600
+# headers, which are sent back to validate cached files.
+_VALIDATORS = {"etag": "If-None-Match", "last-modified": "If-Modified-Since"}
+
+_download_cache: Optional["DownloadCache"] = None
+_download_cache_lock = threading.Lock()
+
+
+class DownloadCache:
+    """
+    A cache of downloaded files on the controller. URLs are fetched once, and
+    files are stored by the sha256 of their content with a LRU size limit.
+    Cached files are validated by ETag and Last-Modified on each get, so a
+    changed file is downloaded again. If the controller cannot reach the URL,
+    the cached file is used as is.
+    """
+
+    def __init__(self, path: Path, size_limit: int) -> None:
+        self.path = path
+        self._cache = PackageCache(path, size_limit)
+
+    @property
+    def size_limit(self) -> int:
+        return self._cache.size_limit
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "hit": self._cache.hit_count,
+            "miss": self._cache.miss_count,
+            "eviction": self._cache.eviction_count,
+            "size": self._cache.size,
+        }
+
+    def get(self, url: str, log: Logger) -> Optional[Path]:
+        """
+        Returns the path of the cached file, or None if it cannot be downloaded
+        or cached. So the caller can download it on the node.
+        """
+        while not self._cache.begin_download(url):
+            # another thread downloaded it, check it again.
+            ...
+        try:
+            return self._download(url, log)
+        finally:
+            self._cache.end_download(url)
+
+    def _download(self, url: str, log: Logger) -> Optional[Path]:
+        cached = self._cache.get(url)
+        request = urllib.request.Request(url)
+        if cached:
+            for name, header in _VALIDATORS.items():
+                if name in cached[2]:
+                    request.add_header(header, cached[2][name])
+
+        try:
+            with urllib.request.urlopen(request, timeout=_DOWNLOAD_TIMEOUT) as response:
+                temp_file = self._cache.create_temp_file()
+                temp_path = Path(temp_file.name)
+                try:
+                    with temp_file:
+                        shutil.copyfileobj(response, temp_file, 1024 * 1024)
+                    headers = {
+                        name: response.headers[name]
+                        for name in _VALIDATORS
+                        if response.headers.get(name)
+                    }
+                    self._cache.put(url, temp_path, headers)
+                finally:
+                    temp_path.unlink(missing_ok=True)
+        except urllib.error.HTTPError as identifier:
+            if identifier.code == 304 and cached:
+                log.debug(f"the cached file of '{url}' is not modified.")
+                return cached[0]
+            log.debug(f"failed to download '{url}' on the controller: {identifier}")
+            return None
+        except Exception as identifier:
+            if cached:
+                log.debug(
+                    f"failed to validate the cached file of '{url}', "
+                    f"use it as is: {identifier}"
+                )
+                return cached[0]
+            log.debug(f"failed to download '{url}' on the controller: {identifier}")
+            return None
+
+        cached = self._cache.get(url)
+        if not cached:
+            log.debug(f"'{url}' is over the size limit of download cache.")
+            return None
+        return cached[0]
+
+
+def get_download_cache() -> Optional[DownloadCache]:
+    """
+    Returns the download cache of the run, or None if it's not enabled by
+    constants.DOWNLOAD_CACHE_SIZE.
+    """
+    global _download_cache
+    if not constants.DOWNLOAD_CACHE_SIZE:
+        return None
+    path = constants.CACHE_PATH / _DOWNLOAD_CACHE_PATH
+    with _download_cache_lock:
+        if (
+            _download_cache is None
+            or _download_cache.path != path
+            or _download_cache.size_limit != constants.DOWNLOAD_CACHE_SIZE
+        ):
+            _download_cache = DownloadCache(path, constants.DOWNLOAD_CACHE_SIZE)
+    return _download_cache
@@ -0,0 +1,176 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import RLock
+from timeit import default_timer as timer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, TypeVar
+
+from lisa.util import constants
+
+T = TypeVar("T")
+
+# the node is rebooted.
+EVENT_REBOOT = "reboot"
+# a kernel is installed, and it's effective after reboot.
+EVENT_KERNEL = "kernel"
+# the node is marked dirty, so nothing is trusted.
+EVENT_DIRTY = "dirty"
+# packages or tools are installed or removed.
+EVENT_PACKAGE = "package"
+# nics are attached or removed.
+EVENT_NIC = "nic"
+
+# events, which clear all facts.
+_GLOBAL_EVENTS = {EVENT_REBOOT, EVENT_KERNEL, EVENT_DIRTY}
+
+# the boot id of the node. It's shared by the OS detection and reboot.
+BOOT_ID_FACT_KEY = "node.boot_id"
+
+
+@dataclass
+class _Fact:
+    value: Any
+    expires_at: float
+    events: Set[str] = field(default_factory=set)
+
+
+class Facts:
+    """
+    Cached facts of a node, like command outputs, OS information and device
+    inventories. A fact expires after its TTL, and it's cleared on events,
+    which may change it, like reboot, kernel installation, or the node is
+    dirty. The least recently used facts are evicted over the limit, so the
+    cache doesn't grow without bound.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = constants.NODE_FACT_TTL,
+        limit: int = constants.NODE_FACT_LIMIT,
+    ) -> None:
+        self._default_ttl = default_ttl
+        self._limit = limit
+        self._facts: "OrderedDict[str, _Fact]" = OrderedDict()
+        # facts are read by tools, which may read other facts on creation.
+        self._lock = RLock()
+        self._listeners: List[Callable[[str], None]] = []
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+
+    def __len__(self) -> int:
+        return len(self._facts)
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "hit": self.hit_count,
+            "miss": self.miss_count,
+            "eviction": self.eviction_count,
+            "size": len(self._facts),
+        }
+
+    def get(
+        self,
+        key: str,
+        factory: Callable[[], T],
+        ttl: Optional[float] = None,
+        force: bool = False,
+        events: Sequence[str] = (),
+    ) -> T:
+        """
+        Return the fact, or create it by the factory, if it's missing, expired,
+        or forced.
+
+        ttl: seconds, which the fact is trusted. The default TTL is used, if
+            it's not set.
+        events: events, besides reboot, kernel and dirty, which clear the fact.
+        """
+        with self._lock:
+            if force:
+                self.miss_count += 1
+            else:
+                fact = self._get_fact(key)
+                if fact:
+                    self.hit_count += 1
+                    return fact.value  # type: ignore
+        # the factory may run commands, so it's not in the lock.
+        value = factory()
+        self.set(key, value, ttl=ttl, events=events)
+        return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """
+        Return the fact, or None, if it's missing or expired.
+        """
+        with self._lock:
+            fact = self._get_fact(key)
+            if fact:
+                self.hit_count += 1
+                return fact.value
+            return None
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        events: Sequence[str] = (),
+    ) -> None:
+        if ttl is None:
+            ttl = self._default_ttl
+        with self._lock:
+            self._facts[key] = _Fact(
+                value=value, expires_at=timer() + ttl, events=set(events)
+            )
+            self._facts.move_to_end(key)
+            while len(self._facts) > self._limit:
+                self._facts.popitem(last=False)
+                self.eviction_count += 1
+
+    def invalidate(self, prefix: str = "") -> None:
+        """
+        Clear facts, whose keys start with the prefix. All facts are cleared,
+        if the prefix is empty.
+        """
+        with self._lock:
+            if not prefix:
+                self._facts.clear()
+                return
+            for key in [x for x in self._facts if x.startswith(prefix)]:
+                del self._facts[key]
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        The listener is called on events, so stateful objects, which are not
+        facts, can be reset on the events they depend on.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def notify(self, event: str) -> None:
+        """
+        Clear facts, which may be changed by the event.
+        """
+        with self._lock:
+            if event in _GLOBAL_EVENTS:
+                self._facts.clear()
+            else:
+                for key in [x for x, y in self._facts.items() if event in y.events]:
+                    del self._facts[key]
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    def _get_fact(self, key: str) -> Optional[_Fact]:
+        fact = self._facts.get(key)
+        if fact and fact.expires_at < timer():
+            del self._facts[key]
+            fact = None
+        if fact is None:
+            self.miss_count += 1
+            return None
+        self._facts.move_to_end(key)
+        return fact
@@ -1,13 +1,16 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import atexit
 import json
 import logging
 import sys
 import time
 from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List, Mapping, Optional, TextIO, Union, cast
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Mapping, Optional, Set, TextIO, Union, cast
 
 from lisa.secret import mask
 from lisa.util import LisaException, filter_ansi_escape, is_unittest
@@ -99,25 +102,169 @@ class Logger(logging.Logger):
 
 
 class LogWriter(object):
-    def __init__(self, logger: Logger, level: int):
+    def __init__(self, logger: Logger, level: int, output: Any = None):
         self._level = level
         self._log = logger
-        self._buffer: str = ""
+        # chunks are joined on flush. Joining on each write copies the whole
+        # buffer, and spur writes output char by char.
+        self._buffer: List[str] = []
+        # it may be flushed by other threads, when output is being written.
+        self._lock = Lock()
+        # if it's set, the written content is captured by its write method.
+        self._output = output
+
+    @property
+    def is_capturing(self) -> bool:
+        return self._output is not None
 
     def write(self, message: str) -> None:
-        self._buffer = "".join([self._buffer, message])
+        with self._lock:
+            self._buffer.append(message)
         if "\n" in message:
             self.flush()
 
     def flush(self) -> None:
-        if len(self._buffer) > 0:
-            self._log.lines(self._level, self._buffer)
-            self._buffer = ""
+        with self._lock:
+            if not self._buffer:
+                return
+            content = "".join(self._buffer)
+            self._buffer = []
+            if self._output is not None:
+                self._output.write(content)
+        self._log.lines(self._level, content)
 
     def close(self) -> None:
         self.flush()
 
 
+class QueuedFileHandler(logging.FileHandler):
+    """
+    It works like a QueueHandler in front of a file handler. Records are put
+    into the queue of the file log listener, and the listener formats and writes
+    them in its own thread, so the logging thread doesn't wait on disk.
+    """
+
+    def __init__(self, path: Path) -> None:
+        # the file is opened by the listener on first write.
+        super().__init__(path, "w", "utf-8", delay=True)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # no need to hold the handler lock to enqueue.
+        is_handled = self.filter(record)
+        if is_handled:
+            self.emit(record)
+        return is_handled
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            # merge args on the logging thread, because args may be changed
+            # after logging. The record may be shared with other handlers, and
+            # the merged message is the same for them.
+            record.msg = record.getMessage()
+            record.args = None
+            _file_log_listener.enqueue(self, record)
+        except Exception:
+            self.handleError(record)
+
+    def write(self, record: logging.LogRecord) -> None:
+        """
+        Called by the listener thread only.
+        """
+        try:
+            message = self.format(record)
+            with self.lock:  # type: ignore
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(message + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self.lock:  # type: ignore
+            if self.stream and hasattr(self.stream, "flush"):
+                self.stream.flush()
+
+    def close(self) -> None:
+        # write out queued records, before the file is closed.
+        _file_log_listener.flush()
+        super().close()
+
+
+class _FileLogListener:
+    """
+    The listener of all queued file handlers. One queue and one thread keep the
+    order of records, and each record is routed to its own handler. Records are
+    written in batches, and each file is flushed once per batch.
+    """
+
+    _batch_size = 1000
+
+    def __init__(self) -> None:
+        self._queue: SimpleQueue[Any] = SimpleQueue()
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+
+    def enqueue(self, handler: QueuedFileHandler, record: logging.LogRecord) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put((handler, record))
+
+    def flush(self, timeout: float = 10) -> None:
+        """
+        Wait until all records, which are queued before this call, are written.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return
+        flushed = Event()
+        self._queue.put((None, flushed))
+        flushed.wait(timeout)
+
+    def stop(self) -> None:
+        self.flush()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._monitor, name="file_log_listener", daemon=True
+                )
+                self._thread.start()
+
+    def _monitor(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self._batch_size:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            written: Set[QueuedFileHandler] = set()
+            for handler, item in batch:
+                if handler is None:
+                    # it's a flush request, so flush written files before it.
+                    self._flush_handlers(written)
+                    item.set()
+                    continue
+                handler.write(item)
+                written.add(handler)
+            self._flush_handlers(written)
+
+    def _flush_handlers(self, handlers: Set[QueuedFileHandler]) -> None:
+        for handler in handlers:
+            try:
+                handler.flush()
+            except Exception as identifier:
+                print(f"failed to flush log file: {identifier}", file=_original_stderr)
+        handlers.clear()
+
+
+_file_log_listener = _FileLogListener()
+# logging.shutdown closes handlers at exit. It's registered earlier, so this one
+# runs before it.
+atexit.register(_file_log_listener.stop)
+_is_queued_file_log = False
+
 _get_root_logger = partial(logging.getLogger, DEFAULT_LOG_NAME)
 
 _format = logging.Formatter(
@@ -156,6 +303,14 @@ def enable_console_timestamp() -> None:
     _console_handler.setFormatter(_format)
 
 
+def enable_queued_file_log() -> None:
+    """
+    Log files created after this call are written by a background listener.
+    """
+    global _is_queued_file_log
+    _is_queued_file_log = True
+
+
 def add_handler(
     handler: logging.Handler,
     logger: Optional[logging.Logger] = None,
@@ -183,6 +338,9 @@ def remove_handler(
     if logger is None:
         logger = _get_root_logger()
     logger.removeHandler(log_handler)
+    if isinstance(log_handler, QueuedFileHandler):
+        # make sure the file is completed, when the handler is removed.
+        _file_log_listener.flush()
 
 
 def create_file_handler(
@@ -194,7 +352,10 @@ def create_file_handler(
     if is_unittest():
         return None  # type: ignore
 
-    file_handler = logging.FileHandler(path, "w", "utf-8")
+    if _is_queued_file_log:
+        file_handler: logging.FileHandler = QueuedFileHandler(path)
+    else:
+        file_handler = logging.FileHandler(path, "w", "utf-8")
     add_handler(file_handler, logger, formatter)
     return file_handler
 
@@ -215,3 +376,22 @@ def get_logger(
     logger: Logger = parent.getChild(name)
 
     return logger
+
+
+def get_transient_logger(
+    name: str = "", id_: str = "", parent: Optional[Logger] = None
+) -> Logger:
+    """
+    Create a logger, which isn't registered in the logging manager. The manager
+    keeps registered loggers forever, so it's used by short-lived objects like
+    commands, and the logger is released with its owner. Records propagate to
+    the parent, and the name is the same as get_logger, so the log output is the
+    same. Don't call getChild on it, use this method to create children.
+    """
+    if id_:
+        name = f"{name}[{id_}]"
+    if not parent:
+        parent = cast(Logger, _get_root_logger())
+    logger = Logger(f"{parent.name}.{name}")
+    logger.parent = parent
+    return logger
@@ -0,0 +1,511 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+A caching HTTP proxy for package managers, like apt, dnf and zypper. Package
+files are immutable, so they are cached on disk and served to all nodes, and
+other requests, like repository metadata, are passed through. HTTPS is
+tunneled by CONNECT without caching, and only to port 443 of configured mirror
+hosts. Only allowed clients can use the proxy, so it's not an open relay.
+
+It uses the standard library only, so it can run on a node by
+
+    python3 package_proxy.py --address 10.0.0.4 --port 3142 --cache-path /tmp/cache
+"""
+
+import argparse
+import hashlib
+import http.client
+import ipaddress
+import json
+import os
+import select
+import shutil
+import socket
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+# files of packages, which don't change once they are published.
+_CACHED_EXTENSIONS = (".deb", ".udeb", ".ddeb", ".rpm", ".drpm")
+# headers, which are for one connection, so they are not forwarded.
+_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+_BLOCK_SIZE = 64 * 1024
+_UPSTREAM_TIMEOUT = 60
+_INDEX_FILE_NAME = "index.json"
+# HTTPS is tunneled to this port of mirror hosts only.
+_CONNECT_PORT = 443
+# if allowed clients are not set, clients in the subnet of the bound address
+# are allowed.
+_DEFAULT_CLIENT_PREFIX = 24
+
+
+class PackageCache:
+    """
+    A content-addressed store on disk. Blobs are named by the sha256 of their
+    content, so the same package from different mirrors is stored once. The
+    index maps URLs to blobs, and it's saved with blobs, so the cache is
+    reused by later runs. The least recently used URLs are evicted, when the
+    total size of blobs is over the size limit.
+    """
+
+    def __init__(self, path: Path, size_limit: int) -> None:
+        self.path = path
+        self.size_limit = size_limit
+        self.hit_count = 0
+        self.miss_count = 0
+        self.eviction_count = 0
+        self._blob_path = path / "blobs"
+        self._blob_path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # url => (blob hash, headers) in the order of use.
+        self._urls: "OrderedDict[str, Tuple[str, Dict[str, str]]]" = OrderedDict()
+        # blob hash => (size, reference count)
+        self._blobs: Dict[str, Tuple[int, int]] = {}
+        self._size = 0
+        # urls, which are downloading, so others wait them.
+        self._downloading: Dict[str, threading.Event] = {}
+        self._load()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, url: str) -> Optional[Tuple[Path, int, Dict[str, str]]]:
+        """
+        Return the blob path, size and headers of the url, or None if it's
+        not cached.
+        """
+        with self._lock:
+            entry = self._urls.get(url)
+            if not entry:
+                self.miss_count += 1
+                return None
+            self._urls.move_to_end(url)
+            self.hit_count += 1
+            blob_hash, headers = entry
+            return self._blob_path / blob_hash, self._blobs[blob_hash][0], headers
+
+    def begin_download(self, url: str) -> bool:
+        """
+        Return True, if the caller should download the url. Otherwise, it
+        waits another download of the same url, and the caller should check
+        the cache again.
+        """
+        with self._lock:
+            event = self._downloading.get(url)
+            if not event:
+                self._downloading[url] = threading.Event()
+                return True
+        event.wait(_UPSTREAM_TIMEOUT * 10)
+        return False
+
+    def end_download(self, url: str) -> None:
+        with self._lock:
+            event = self._downloading.pop(url, None)
+        if event:
+            event.set()
+
+    def put(self, url: str, file_path: Path, headers: Dict[str, str]) -> None:
+        """
+        Move the downloaded file into the cache.
+        """
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(_BLOCK_SIZE), b""):
+                sha256.update(block)
+        blob_hash = sha256.hexdigest()
+        size = file_path.stat().st_size
+        if size > self.size_limit:
+            file_path.unlink()
+            return
+
+        with self._lock:
+            if url in self._urls:
+                self._remove_url(url)
+            if blob_hash in self._blobs:
+                file_path.unlink()
+                blob_size, reference_count = self._blobs[blob_hash]
+                self._blobs[blob_hash] = (blob_size, reference_count + 1)
+            else:
+                os.replace(file_path, self._blob_path / blob_hash)
+                self._blobs[blob_hash] = (size, 1)
+                self._size += size
+            self._urls[url] = (blob_hash, headers)
+            while self._size > self.size_limit and self._urls:
+                self._remove_url(next(iter(self._urls)))
+                self.eviction_count += 1
+            self._save()
+
+    def create_temp_file(self) -> Any:
+        return tempfile.NamedTemporaryFile(dir=self.path, delete=False)
+
+    def _remove_url(self, url: str) -> None:
+        blob_hash, _ = self._urls.pop(url)
+        size, reference_count = self._blobs[blob_hash]
+        if reference_count > 1:
+            self._blobs[blob_hash] = (size, reference_count - 1)
+            return
+        del self._blobs[blob_hash]
+        self._size -= size
+        (self._blob_path / blob_hash).unlink(missing_ok=True)
+
+    def _load(self) -> None:
+        index_path = self.path / _INDEX_FILE_NAME
+        if not index_path.exists():
+            return
+        try:
+            entries = json.loads(index_path.read_text())
+        except ValueError:
+            return
+        for url, blob_hash, headers in entries:
+            blob_path = self._blob_path / blob_hash
+            if blob_hash in self._blobs:
+                size, reference_count = self._blobs[blob_hash]
+                self._blobs[blob_hash] = (size, reference_count + 1)
+            elif blob_path.exists():
+                size = blob_path.stat().st_size
+                self._blobs[blob_hash] = (size, 1)
+                self._size += size
+            else:
+                continue
+            self._urls[url] = (blob_hash, headers)
+
+    def _save(self) -> None:
+        index_path = self.path / _INDEX_FILE_NAME
+        temp_path = index_path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps([[url, *entry] for url, entry in self._urls.items()])
+        )
+        os.replace(temp_path, index_path)
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_ProxyServer"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            self.send_error(400, "an absolute URL is expected by the proxy")
+            return
+        if (
+            self.command == "GET"
+            and url.path.endswith(_CACHED_EXTENSIONS)
+            and "Range" not in self.headers
+        ):
+            self._get_cached(self.path)
+        else:
+            self._pass_through()
+
+    do_HEAD = do_GET
+
+    def do_CONNECT(self) -> None:
+        host, _, port = self.path.rpartition(":")
+        host = host.lower()
+        if f"{host}:{port}" not in self.server.connect_hosts:
+            self.send_error(403, f"tunneling to {self.path} is not allowed")
+            return
+        try:
+            upstream = socket.create_connection(
+                (host, int(port)), timeout=_UPSTREAM_TIMEOUT
+            )
+        except (OSError, ValueError) as identifier:
+            self.send_error(502, str(identifier))
+            return
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        self.close_connection = True
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], _UPSTREAM_TIMEOUT)
+                if not readable:
+                    break
+                for source in readable:
+                    data = source.recv(_BLOCK_SIZE)
+                    if not data:
+                        return
+                    target = upstream if source is self.connection else self.connection
+                    target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            upstream.close()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # requests are too many to log.
+        ...
+
+    def _get_cached(self, url: str) -> None:
+        cache = self.server.cache
+        while True:
+            cached = cache.get(url)
+            if cached:
+                self._send_file(*cached)
+                return
+            if cache.begin_download(url):
+                break
+        try:
+            self._download(url)
+        finally:
+            cache.end_download(url)
+
+    def _send_file(self, path: Path, size: int, headers: Dict[str, str]) -> None:
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        with open(path, "rb") as file:
+            shutil.copyfileobj(file, self.wfile, _BLOCK_SIZE)
+
+    def _download(self, url: str) -> None:
+        upstream = self._request_upstream()
+        if not upstream:
+            return
+        response, connection = upstream
+        try:
+            saved_headers = {
+                name: value
+                for name, value in response.getheaders()
+                if name.lower() in ("content-type", "last-modified", "etag")
+            }
+            self._send_upstream_headers(response)
+            if response.status != 200:
+                _, last_block = self._send_body(response)
+                self.wfile.write(last_block)
+                return
+            cache = self.server.cache
+            temp_file = cache.create_temp_file()
+            temp_path = Path(temp_file.name)
+            try:
+                with temp_file:
+                    completed, last_block = self._send_body(response, temp_file)
+                # cache it before the last block, so the next request of the
+                # client hits the cache.
+                if completed:
+                    cache.put(url, temp_path, saved_headers)
+                self.wfile.write(last_block)
+            finally:
+                temp_path.unlink(missing_ok=True)
+        finally:
+            connection.close()
+
+    def _pass_through(self) -> None:
+        upstream = self._request_upstream()
+        if not upstream:
+            return
+        response, connection = upstream
+        try:
+            self._send_upstream_headers(response)
+            _, last_block = self._send_body(response)
+            self.wfile.write(last_block)
+        finally:
+            connection.close()
+
+    def _request_upstream(
+        self,
+    ) -> Optional[Tuple[http.client.HTTPResponse, http.client.HTTPConnection]]:
+        url = urlsplit(self.path)
+        connection_type = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        connection = connection_type(
+            url.hostname or "", url.port, timeout=_UPSTREAM_TIMEOUT
+        )
+        headers = {
+            name: value
+            for name, value in self.headers.items()
+            if name.lower() not in _HOP_HEADERS
+        }
+        body: Optional[bytes] = None
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            body = self.rfile.read(length)
+        path = url.path or "/"
+        if url.query:
+            path = f"{path}?{url.query}"
+        try:
+            connection.request(self.command, path, body=body, headers=headers)
+            return connection.getresponse(), connection
+        except (OSError, http.client.HTTPException) as identifier:
+            connection.close()
+            self.send_error(502, str(identifier))
+            return None
+
+    def _send_upstream_headers(self, response: http.client.HTTPResponse) -> None:
+        self.send_response(response.status, response.reason)
+        for name, value in response.getheaders():
+            if name.lower() not in _HOP_HEADERS:
+                self.send_header(name, value)
+        if response.getheader("Content-Length") is None and self.command != "HEAD":
+            # the length is unknown, so the end of body is the end of connection.
+            self.close_connection = True
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+    def _send_body(
+        self, response: http.client.HTTPResponse, file: Any = None
+    ) -> Tuple[bool, bytes]:
+        """
+        Send the body except the last block, and return whether the body is
+        completed, and the last block.
+        """
+        if self.command == "HEAD":
+            return False, b""
+        expected_length = response.getheader("Content-Length")
+        received_length = 0
+        last_block = b""
+        while True:
+            block = response.read(_BLOCK_SIZE)
+            if not block:
+                break
+            received_length += len(block)
+            if file:
+                file.write(block)
+            self.wfile.write(last_block)
+            last_block = block
+        completed = expected_length is None or int(expected_length) == received_length
+        return completed, last_block
+
+
+class _ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        cache: PackageCache,
+        allowed_clients: List[str],
+        connect_hosts: List[str],
+    ) -> None:
+        super().__init__(address, _ProxyHandler)
+        self.cache = cache
+        networks = allowed_clients or [f"{self.host}/{_DEFAULT_CLIENT_PREFIX}"]
+        self.allowed_networks = [
+            ipaddress.ip_network(x, strict=False) for x in networks
+        ]
+        # host:port, which can be tunneled by CONNECT.
+        self.connect_hosts: Set[str] = {
+            x.lower() if ":" in x else f"{x.lower()}:{_CONNECT_PORT}"
+            for x in connect_hosts
+        }
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        try:
+            client = ipaddress.ip_address(client_address[0])
+        except ValueError:
+            return False
+        return any(client in x for x in self.allowed_networks)
+
+    @property
+    def host(self) -> str:
+        # the address is typed as bytes for unix sockets, but it's str for IP.
+        host = self.server_address[0]
+        if isinstance(host, (bytes, bytearray)):
+            return host.decode(errors="replace")
+        return host
+
+
+class PackageProxy:
+    """
+    Runs the caching proxy in a background thread.
+
+    address: the address to bind, which nodes connect to.
+    allowed_clients: addresses or networks of clients, like "10.0.0.5" or
+        "10.0.0.0/16". If it's empty, clients in the /24 subnet of the address
+        are allowed.
+    connect_hosts: mirror hosts, which HTTPS is tunneled to by CONNECT. The
+        port is 443, if it's not set like "host:port".
+    """
+
+    def __init__(
+        self,
+        cache_path: Path,
+        cache_size: int,
+        address: str = "127.0.0.1",
+        port: int = 0,
+        allowed_clients: Optional[List[str]] = None,
+        connect_hosts: Optional[List[str]] = None,
+    ) -> None:
+        self.cache = PackageCache(cache_path, cache_size)
+        self._server = _ProxyServer(
+            (address, port), self.cache, allowed_clients or [], connect_hosts or []
+        )
+        self.address = self._server.host
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self.serve, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def serve(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "hit": self.cache.hit_count,
+            "miss": self.cache.miss_count,
+            "eviction": self.cache.eviction_count,
+            "size": self.cache.size,
+        }
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="caching proxy of packages")
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3142)
+    parser.add_argument(
+        "--allowed-client",
+        action="append",
+        default=[],
+        help="an address or network of clients, it can be set multiple times",
+    )
+    parser.add_argument(
+        "--connect-host",
+        action="append",
+        default=[],
+        help="a mirror host, which HTTPS is tunneled to, it can be set multiple times",
+    )
+    parser.add_argument("--cache-path", required=True)
+    parser.add_argument(
+        "--cache-size", type=int, default=10240, help="the cache size in MB"
+    )
+    arguments = parser.parse_args()
+    proxy = PackageProxy(
+        Path(arguments.cache_path),
+        arguments.cache_size * 1024 * 1024,
+        arguments.address,
+        arguments.port,
+        arguments.allowed_client,
+        arguments.connect_host,
+    )
+    # the caller waits it to know the proxy is ready.
+    print(f"serving on {proxy.address}:{proxy.port}", flush=True)
+    proxy.serve()
+
+
+if __name__ == "__main__":
+    _main()
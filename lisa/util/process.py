@@ -1,17 +1,34 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
-import io
+import asyncio
 import logging
+import os
 import pathlib
+import queue
 import re
 import shlex
 import signal
 import subprocess
-import time
-from dataclasses import dataclass
+import tempfile
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from threading import Event, Lock
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
 
 import spur  # type: ignore
 from assertpy.assertpy import AssertionBuilder, assert_that, fail
@@ -22,11 +39,12 @@ from lisa.util import (
     LisaException,
     RequireUserPasswordException,
     SshSpawnTimeoutException,
+    constants,
     create_timer,
     filter_ansi_escape,
 )
-from lisa.util.logger import Logger, LogWriter, add_handler, get_logger
-from lisa.util.shell import Shell, SshShell
+from lisa.util.logger import Logger, LogWriter, get_transient_logger
+from lisa.util.shell import Shell, SshSessionProcess, SshShell
 
 # [sudo] password for lisatest: \r\nsudo: timed out reading password
 # Password: \r\nsudo: timed out reading password
@@ -34,6 +52,234 @@ TIMEOUT_READING_PASSWORD_PATTERNS = [
     re.compile(r"\[sudo\] password for.+\r\nsudo: timed out reading password"),
     re.compile(r"Password: .+\r\nsudo: timed out reading password"),
 ]
+# the size of output head, which is checked for password prompts.
+_PASSWORD_CHECK_SIZE = 64 * 1024
+# the wait before checking password prompts of sudo.
+_PASSWORD_CHECK_DELAY = 0.5
+# the range of intervals, which awaited processes are polled by.
+_AIO_POLL_MIN_INTERVAL = 0.001
+_AIO_POLL_MAX_INTERVAL = 0.05
+# the tail of output, which is kept to match keywords across writes.
+_OUTPUT_MATCH_WINDOW = 4096
+# the interval, which streamed lines check the process exit by.
+_LINE_POLL_INTERVAL = 0.1
+
+
+class OutputBuffer:
+    """
+    Holds output of a command. The content is kept in memory chunks, until it
+    exceeds the memory limit. After that, the content is spilled to a temp file,
+    so commands with huge output don't hold it in memory.
+    """
+
+    def __init__(self, memory_limit: int = -1) -> None:
+        if memory_limit < 0:
+            memory_limit = constants.COMMAND_OUTPUT_MEMORY_LIMIT
+        self._memory_limit = memory_limit
+        self._chunks: List[str] = []
+        self._size = 0
+        self._file: Optional[IO[str]] = None
+        self._lock = Lock()
+
+    @property
+    def is_spilled(self) -> bool:
+        return self._file is not None
+
+    @property
+    def spilled_path(self) -> Optional[Path]:
+        if self._file is None:
+            return None
+        return Path(self._file.name)
+
+    def __len__(self) -> int:
+        # number of chars, which are written.
+        return self._size
+
+    def write(self, content: str) -> None:
+        if not content:
+            return
+        with self._lock:
+            self._size += len(content)
+            if self._file is not None:
+                self._file.write(content)
+                return
+            self._chunks.append(content)
+            if self._size > self._memory_limit:
+                self._spill()
+
+    def getvalue(self) -> str:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                with open(self._file.name, "r", encoding="utf-8", newline="") as f:
+                    return f.read()
+            if len(self._chunks) > 1:
+                self._chunks = ["".join(self._chunks)]
+            return self._chunks[0] if self._chunks else ""
+
+    def read_head(self, size: int) -> str:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                with open(self._file.name, "r", encoding="utf-8", newline="") as f:
+                    return f.read(size)
+            return "".join(self._chunks)[:size]
+
+    def iter_chunks(self, size: int = 1024 * 1024) -> Iterator[str]:
+        """
+        Iterate the content by chunks. If it's spilled, chunks are read from
+        the file, so the whole content isn't loaded into memory.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                path: Optional[str] = self._file.name
+            else:
+                path = None
+                chunks = list(self._chunks)
+        if path is None:
+            yield from chunks
+            return
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from iter(partial(f.read, size), "")
+
+    def iter_lines(self, keepends: bool = False) -> Iterator[str]:
+        """
+        Iterate lines of the content. If it's spilled, lines are read from the
+        file, so the whole content isn't loaded into memory.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                path: Optional[str] = self._file.name
+            else:
+                path = None
+                content = "".join(self._chunks)
+        if path is None:
+            yield from content.splitlines(keepends)
+            return
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for line in f:
+                yield line if keepends else line.rstrip("\r\n")
+
+    def _spill(self) -> None:
+        spilled_file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", newline="", prefix="lisa_output_", delete=False
+        )
+        # remove the file, when the buffer is released.
+        weakref.finalize(self, _remove_spilled_file, spilled_file)
+        spilled_file.writelines(self._chunks)
+        self._chunks = []
+        self._file = spilled_file
+
+
+def _remove_spilled_file(spilled_file: IO[str]) -> None:
+    spilled_file.close()
+    try:
+        os.remove(spilled_file.name)
+    except OSError:
+        pass
+
+
+class _OutputStream:
+    """
+    The output of log writers. The content is kept in the buffer, and passed to
+    listeners, like line splitters and keyword matchers, as it's written, so
+    listeners don't scan the buffer again.
+    """
+
+    def __init__(self, buffer: OutputBuffer) -> None:
+        self.buffer = buffer
+        self._listeners: List[Any] = []
+        self._is_closed = False
+        self._lock = Lock()
+
+    def write(self, content: str) -> None:
+        if not content:
+            return
+        with self._lock:
+            self.buffer.write(content)
+            for listener in self._listeners:
+                listener.write(content)
+
+    def close(self) -> None:
+        with self._lock:
+            self._is_closed = True
+            for listener in self._listeners:
+                listener.close()
+
+    def add_listener(self, listener: Any) -> None:
+        """
+        The written content is replayed to the listener first, so it doesn't
+        miss the content before it's added.
+        """
+        with self._lock:
+            for chunk in self.buffer.iter_chunks():
+                listener.write(chunk)
+            if self._is_closed:
+                listener.close()
+            else:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Any) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+class _LineSplitter:
+    """
+    Splits written content into lines for the callback. A partial line is kept
+    until its end is written, or the output is closed.
+    """
+
+    def __init__(self, callback: Callable[[str], None]) -> None:
+        self._callback = callback
+        self._partial = ""
+
+    def write(self, content: str) -> None:
+        lines = (self._partial + content).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._callback(_remove_line_ending(line))
+
+    def close(self) -> None:
+        if self._partial:
+            self._callback(_remove_line_ending(self._partial))
+            self._partial = ""
+
+
+class _OutputMatcher:
+    """
+    Searches patterns in the written content. A rolling window of the tail is
+    kept, so a match, which is split by writes, is found, if it's not longer
+    than the window.
+    """
+
+    def __init__(self, patterns: List[Pattern[str]], event: Event) -> None:
+        self._patterns = patterns
+        self._event = event
+        self._tail = ""
+        self.matched = ""
+
+    def write(self, content: str) -> None:
+        if self._event.is_set():
+            return
+        text = self._tail + content
+        for pattern in self._patterns:
+            matched = pattern.search(text)
+            if matched:
+                self.matched = matched.group(0)
+                self._event.set()
+                return
+        self._tail = text[-_OUTPUT_MATCH_WINDOW:]
+
+    def close(self) -> None:
+        pass
+
+
+def _remove_line_ending(line: str) -> str:
+    return line[:-1] if line.endswith("\r") else line
 
 
 @dataclass
@@ -44,10 +290,47 @@ class ExecutableResult:
     cmd: Union[str, List[str]]
     elapsed: float
     is_timeout: bool = False
+    # the spilled output. If it's set, stdout is read from it on the first
+    # access of stdout, and filters are applied then.
+    _stdout_buffer: Optional[OutputBuffer] = field(
+        default=None, repr=False, compare=False
+    )
+    _stdout_filters: List[Callable[[str], str]] = field(
+        default_factory=list, repr=False, compare=False
+    )
 
     def __str__(self) -> str:
         return self.stdout
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # the buffer holds a temp file and a lock, so stdout is loaded first.
+        self._load_stdout()
+        return self.__dict__.copy()
+
+    @property
+    def is_stdout_loaded(self) -> bool:
+        return self._stdout_buffer is None
+
+    def filter_stdout(self, stdout_filter: Callable[[str], str]) -> None:
+        """
+        Apply the filter on stdout. If stdout isn't loaded, the filter is
+        applied when it's loaded.
+        """
+        if self.is_stdout_loaded:
+            self.stdout = stdout_filter(self.stdout)
+        else:
+            self._stdout_filters.append(stdout_filter)
+
+    def iter_stdout_lines(self) -> Iterator[str]:
+        """
+        Iterate lines of stdout. If stdout isn't loaded, lines are read from the
+        spilled file, and the filters of stdout are not applied.
+        """
+        if self.is_stdout_loaded or self._stdout_buffer is None:
+            yield from self.stdout.splitlines()
+        else:
+            yield from self._stdout_buffer.iter_lines()
+
     def assert_exit_code(
         self,
         expected_exit_code: Union[int, List[int]] = 0,
@@ -79,6 +362,135 @@ class ExecutableResult:
             f.write(self.stdout)
         return self
 
+    def _load_stdout(self) -> str:
+        stdout_buffer = self._stdout_buffer
+        if stdout_buffer is not None:
+            stdout = stdout_buffer.getvalue().strip()
+            for stdout_filter in self._stdout_filters:
+                stdout = stdout_filter(stdout)
+            self._stdout = stdout
+            self._stdout_buffer = None
+            self._stdout_filters = []
+        return self._stdout
+
+    def _set_stdout(self, stdout: str) -> None:
+        self._stdout = stdout
+        self._stdout_buffer = None
+        self._stdout_filters = []
+
+
+# stdout is a property, so the spilled output is loaded on the first access. It's
+# set after the dataclass is created, so stdout is still the first field, and
+# __init__, replace, asdict and repr work as other fields.
+setattr(
+    ExecutableResult,
+    "stdout",
+    property(ExecutableResult._load_stdout, ExecutableResult._set_stdout),
+)
+
+
+class BatchCommand:
+    """
+    Runs several commands in one sh process, so they cost one round trip.
+    Each command runs in a subshell, and it's framed by delimiter lines on
+    stdout and stderr. The end delimiter carries the exit code, and both
+    delimiters carry timestamps, so each command gets its own result.
+    """
+
+    def __init__(self, commands: List[str]) -> None:
+        self.commands = commands
+        self._delimiter = f"lisa_batch_{uuid.uuid4().hex}"
+        self._delimiter_pattern = re.compile(
+            rf"^{self._delimiter} (?P<stream>[oe]) (?P<index>\d+) "
+            r"(?P<kind>begin|end)(?P<values>[^\r\n]*)\r?$\n?",
+            re.M,
+        )
+
+    @property
+    def script(self) -> str:
+        lines: List[str] = [f"d={self._delimiter}"]
+        for index, command in enumerate(self.commands):
+            lines += [
+                f'printf \'\\n%s o {index} begin %s\\n\' "$d" "$(date +%s.%N)"',
+                f"printf '\\n%s e {index} begin\\n' \"$d\" >&2",
+                "(",
+                command,
+                ") </dev/null",
+                "r=$?",
+                f'printf \'\\n%s o {index} end %s %s\\n\' "$d" "$r" "$(date +%s.%N)"',
+                f"printf '\\n%s e {index} end\\n' \"$d\" >&2",
+            ]
+        return "\n".join(lines)
+
+    def split_result(self, result: ExecutableResult) -> List[ExecutableResult]:
+        """
+        Split the result of the batch into results of commands. If a command
+        didn't finish, like on timeout, its exit code is None.
+        """
+        stdouts, values = self._split_stream(result.stdout, "o")
+        stderrs, _ = self._split_stream(result.stderr, "e")
+        results: List[ExecutableResult] = []
+        for index, command in enumerate(self.commands):
+            exit_code: Optional[int] = None
+            elapsed = 0.0
+            begin_values, end_values = values.get(index, ([], []))
+            if end_values:
+                exit_code = int(end_values[0])
+                begin_time = _parse_batch_time(begin_values)
+                end_time = _parse_batch_time(end_values[1:])
+                elapsed = max(end_time - begin_time, 0.0)
+            results.append(
+                ExecutableResult(
+                    stdouts.get(index, ""),
+                    stderrs.get(index, ""),
+                    exit_code,
+                    command,
+                    elapsed,
+                    is_timeout=result.is_timeout and exit_code is None,
+                )
+            )
+        return results
+
+    def _split_stream(
+        self, content: str, stream: str
+    ) -> Tuple[Dict[int, str], Dict[int, Tuple[List[str], List[str]]]]:
+        outputs: Dict[int, str] = {}
+        values: Dict[int, Tuple[List[str], List[str]]] = {}
+        # with pty, stderr is merged into stdout, so delimiters of the other
+        # stream are removed from outputs.
+        begin_index = -1
+        pieces: List[str] = []
+        position = 0
+        for matched in self._delimiter_pattern.finditer(content):
+            if begin_index >= 0:
+                pieces.append(content[position : matched.start()])
+            position = matched.end()
+            if matched.group("stream") != stream:
+                continue
+            index = int(matched.group("index"))
+            matched_values = matched.group("values").split()
+            if matched.group("kind") == "begin":
+                begin_index = index
+                pieces = []
+                values[index] = (matched_values, [])
+            elif index == begin_index:
+                outputs[index] = "".join(pieces).strip()
+                values[index] = (values[index][0], matched_values)
+                begin_index = -1
+        if begin_index >= 0:
+            # the command didn't end, keep the output so far.
+            outputs[begin_index] = ("".join(pieces) + content[position:]).strip()
+        return outputs, values
+
+
+def _parse_batch_time(values: List[str]) -> float:
+    # date of BSD doesn't support %N, so it may be like "1700000000.N".
+    if values:
+        matched = re.match(r"\d+(\.\d+)?", values[0])
+        if matched:
+            return float(matched.group(0))
+    return 0.0
+
 
 def _create_exports(update_envs: Dict[str, str]) -> str:
     result: str = ""
@@ -184,23 +596,31 @@ class Process:
         id_: str,
         shell: Shell,
         parent_logger: Optional[Logger] = None,
+        output_memory_limit: int = -1,
     ) -> None:
+        """
+        output_memory_limit: the size in chars of output, which is kept in
+            memory. Over it, the output is spilled to a temp file. The default
+            is constants.COMMAND_OUTPUT_MEMORY_LIMIT.
+        """
         # the shell can be LocalShell or SshShell
         self._shell = shell
         self._id_ = id_
         self._is_posix = shell.is_posix
         self._running: bool = False
-        self._log = get_logger("cmd", id_, parent=parent_logger)
+        # commands are created a lot, so the logger isn't registered to
+        # logging, and it's released with the process.
+        self._log = get_transient_logger("cmd", id_, parent=parent_logger)
         self._process: Optional[spur.local.LocalProcess] = None
         self._result: Optional[ExecutableResult] = None
         self._sudo: bool = False
         self._nohup: bool = False
 
-        # add a string stream handler to the logger
-        self._log_buffer = io.StringIO()
-        self._log_handler = logging.StreamHandler(self._log_buffer)
-        msg_only_format = logging.Formatter(fmt="%(message)s", datefmt="")
-        add_handler(self._log_handler, self._log, msg_only_format)
+        # the output is captured by log writers, instead of spur.
+        self._stdout_buffer = OutputBuffer(output_memory_limit)
+        self._stderr_buffer = OutputBuffer(output_memory_limit)
+        self._stdout_stream = _OutputStream(self._stdout_buffer)
+        self._stderr_stream = _OutputStream(self._stderr_buffer)
 
     @_retry_spawn
     def start(
@@ -231,10 +651,14 @@ class Process:
         if no_error_log:
             stderr_level = stdout_level
 
-        self.stdout_logger = get_logger("stdout", parent=self._log)
-        self.stderr_logger = get_logger("stderr", parent=self._log)
-        self._stdout_writer = LogWriter(logger=self.stdout_logger, level=stdout_level)
-        self._stderr_writer = LogWriter(logger=self.stderr_logger, level=stderr_level)
+        self.stdout_logger = get_transient_logger("stdout", parent=self._log)
+        self.stderr_logger = get_transient_logger("stderr", parent=self._log)
+        self._stdout_writer = LogWriter(
+            logger=self.stdout_logger, level=stdout_level, output=self._stdout_stream
+        )
+        self._stderr_writer = LogWriter(
+            logger=self.stderr_logger, level=stderr_level, output=self._stderr_stream
+        )
 
         self._sudo = sudo
         self._nohup = nohup
@@ -278,17 +702,30 @@ class Process:
 
         try:
             self._timer = create_timer()
-            self._process = self._shell.spawn(
-                command=split_command,
-                stdout=self._stdout_writer,
-                stderr=self._stderr_writer,
-                cwd=cwd_path,
-                update_env=update_envs,
-                allow_error=True,
-                store_pid=self._is_posix,
-                encoding=encoding,
-                use_pty=use_pty,
-            )
+            self._process = None
+            if isinstance(self._shell, SshShell) and not nohup:
+                # nohup processes outlive the session, so they run by exec.
+                self._process = self._shell.spawn_in_session(
+                    command=split_command,
+                    update_env=update_envs,
+                    cwd=cwd_path,
+                    stdout=self._stdout_writer,
+                    stderr=self._stderr_writer,
+                    encoding=encoding,
+                    merge_stderr=use_pty,
+                )
+            if self._process is None:
+                self._process = self._shell.spawn(
+                    command=split_command,
+                    stdout=self._stdout_writer,
+                    stderr=self._stderr_writer,
+                    cwd=cwd_path,
+                    update_env=update_envs,
+                    allow_error=True,
+                    store_pid=self._is_posix,
+                    encoding=encoding,
+                    use_pty=use_pty,
+                )
             # save for logging.
             self._cmd = split_command
             self._running = True
@@ -330,16 +767,61 @@ class Process:
         expected_exit_code_failure_message: str = "",
     ) -> ExecutableResult:
         timer = create_timer()
-        is_timeout = False
-        has_checked_password = False
 
-        while self.is_running() and timeout >= timer.elapsed(False):
-            time.sleep(0.01)
-            if timer.elapsed(False) > 0.5 and not has_checked_password:
+        # the password prompt of sudo needs some time to show, so check it
+        # once, if the process is still running after a short wait.
+        if self._wait_exit(min(timeout, _PASSWORD_CHECK_DELAY)):
+            self.check_and_input_password()
+            self._wait_exit(timeout - timer.elapsed(False))
+
+        return self._get_result(
+            timeout, expected_exit_code, expected_exit_code_failure_message
+        )
+
+    async def wait_result_aio(
+        self,
+        timeout: float = 600,
+        expected_exit_code: Optional[int] = None,
+        expected_exit_code_failure_message: str = "",
+    ) -> ExecutableResult:
+        """
+        Like wait_result, but it's awaited on the event loop, so a running
+        process doesn't hold a thread. The exit is polled by growing intervals,
+        and the result is collected in the default executor of the loop, since
+        it joins output readers, and may kill the process remotely.
+        """
+        timer = create_timer()
+        interval = _AIO_POLL_MIN_INTERVAL
+        is_password_checked = False
+        while self.is_running():
+            elapsed = timer.elapsed(False)
+            if elapsed >= timeout:
+                break
+            if not is_password_checked and elapsed >= _PASSWORD_CHECK_DELAY:
                 self.check_and_input_password()
-                has_checked_password = True
+                is_password_checked = True
+            await asyncio.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * 2, _AIO_POLL_MAX_INTERVAL)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            partial(
+                self._get_result,
+                timeout,
+                expected_exit_code,
+                expected_exit_code_failure_message,
+            ),
+        )
 
-        if timeout < timer.elapsed():
+    def _get_result(
+        self,
+        timeout: float,
+        expected_exit_code: Optional[int],
+        expected_exit_code_failure_message: str,
+    ) -> ExecutableResult:
+        is_timeout = False
+        if self.is_running():
             if self._process is not None:
                 self._log.info(f"timeout in {timeout} sec, and killed")
             self.kill()
@@ -348,37 +830,42 @@ class Process:
         if self._result is None:
             assert self._process
             if is_timeout:
-                # LogWriter only flushes if "\n" is written, so we need to flush
-                # manually.
-                self._stdout_writer.flush()
-                process_result = spur.results.result(
-                    return_code=1,
-                    allow_error=True,
-                    output=self._log_buffer.getvalue(),
-                    stderr_output="",
-                )
+                return_code: Optional[int] = 1
             else:
-                process_result = self._process.wait_for_result()
+                # the output is captured by log writers, so the output of spur
+                # is empty.
+                return_code = self._process.wait_for_result().return_code
+            # LogWriter only flushes if "\n" is written, so flush the rest.
+            self._stdout_writer.close()
+            self._stderr_writer.close()
+            self._stdout_stream.close()
+            self._stderr_stream.close()
+
+            # a spilled stdout is loaded on first access.
+            stdout = ""
+            stdout_buffer: Optional[OutputBuffer] = self._stdout_buffer
+            stderr = self._stderr_buffer.getvalue()
             if not self._is_posix and self._shell.is_remote:
                 # special handle remote windows. There are extra control chars
                 # and on extra line at the end.
 
                 # remove extra controls in remote Windows
-                process_result.output = filter_ansi_escape(process_result.output)
-                process_result.stderr_output = filter_ansi_escape(
-                    process_result.stderr_output
-                )
+                stdout = filter_ansi_escape(self._stdout_buffer.getvalue()).strip()
+                stderr = filter_ansi_escape(stderr)
+                stdout_buffer = None
+            elif not self._stdout_buffer.is_spilled:
+                stdout = self._stdout_buffer.getvalue().strip()
+                stdout_buffer = None
 
-            self._stdout_writer.close()
-            self._stderr_writer.close()
             # cache for future queries, in case it's queried twice.
             self._result = ExecutableResult(
-                process_result.output.strip(),
-                process_result.stderr_output.strip(),
-                process_result.return_code,
+                stdout,
+                stderr.strip(),
+                return_code,
                 self._cmd,
                 self._timer.elapsed(),
                 is_timeout,
+                _stdout_buffer=stdout_buffer,
             )
 
             self._recycle_resource()
@@ -401,18 +888,23 @@ class Process:
             )
 
         if self._is_posix and self._sudo:
-            self._result.stdout = self._filter_sudo_result(self._result.stdout)
+            self._result.filter_stdout(self._filter_sudo_result)
 
-        self._result.stdout = self._filter_profile_error(self._result.stdout)
-        self._result.stdout = self._filter_bash_prompt(self._result.stdout)
-        self._check_if_need_input_password(self._result.stdout)
-        self._result.stdout = self._filter_sudo_required_password_info(
-            self._result.stdout
-        )
+        self._result.filter_stdout(self._filter_profile_error)
+        self._result.filter_stdout(self._filter_bash_prompt)
+        if self._result.is_stdout_loaded:
+            self._check_if_need_input_password(self._result.stdout)
+        else:
+            # the password prompt is at the beginning, so the spilled output
+            # doesn't need to be loaded.
+            self._check_if_need_input_password(
+                self._stdout_buffer.read_head(_PASSWORD_CHECK_SIZE)
+            )
+        self._result.filter_stdout(self._filter_sudo_required_password_info)
 
         if not self._is_posix:
             # fix windows ending with " by some unknown reason.
-            self._result.stdout = self._remove_ending_quote(self._result.stdout)
+            self._result.filter_stdout(self._remove_ending_quote)
             self._result.stderr = self._remove_ending_quote(self._result.stderr)
 
         return self._result
@@ -443,27 +935,65 @@ class Process:
             self._running = self._process.is_running()
         return self._running
 
+    def _wait_exit(self, timeout: float) -> bool:
+        """
+        Block until the process exits or the timeout, and return whether it's
+        still running. It waits on the exit status event of the SSH channel,
+        the session command, or the local subprocess, so a waiting thread
+        doesn't wake up to poll.
+        """
+        if timeout > 0 and self.is_running():
+            assert self._process
+            if isinstance(self._process, spur.ssh.SshProcess):
+                self._process._channel.status_event.wait(timeout)
+            elif isinstance(self._process, SshSessionProcess):
+                self._process.wait(timeout)
+            else:
+                try:
+                    self._process._subprocess.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    pass
+        return self.is_running()
+
     def wait_output(
         self,
-        keyword: str,
+        keyword: Union[str, Pattern[str], List[Union[str, Pattern[str]]]],
         timeout: int = 300,
         error_on_missing: bool = True,
         interval: int = 1,
-    ) -> None:
-        # check if stdout buffers contain the string "keyword" to determine if
-        # it is running
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            # LogWriter only flushes if "\n" is written, so we need to flush
-            # manually.
-            self._stdout_writer.flush()
-
-            # check if buffer contains the keyword
-            if keyword in self._log_buffer.getvalue():
-                return
-
-            time.sleep(interval)
-
+    ) -> str:
+        """
+        Wait until one of keywords or regex patterns shows in stdout or stderr,
+        and return the matched text. The output is matched incrementally, as
+        it's written.
+        """
+        if isinstance(keyword, list):
+            keywords = keyword
+        else:
+            keywords = [keyword]
+        patterns = [
+            re.compile(re.escape(x)) if isinstance(x, str) else x for x in keywords
+        ]
+        found = Event()
+        matchers = [_OutputMatcher(patterns, found) for _ in range(2)]
+        streams = [self._stdout_stream, self._stderr_stream]
+        for stream, matcher in zip(streams, matchers):
+            stream.add_listener(matcher)
+        try:
+            timer = create_timer()
+            while not found.is_set() and timer.elapsed(False) < timeout:
+                # LogWriter only flushes if "\n" is written, so we need to flush
+                # partial lines manually.
+                self._stdout_writer.flush()
+                self._stderr_writer.flush()
+                found.wait(min(interval, max(0, timeout - timer.elapsed(False))))
+        finally:
+            for stream, matcher in zip(streams, matchers):
+                stream.remove_listener(matcher)
+
+        for matcher in matchers:
+            if matcher.matched:
+                return matcher.matched
         if error_on_missing:
             raise LisaException(
                 f"{keyword} not found in stdout after {timeout} seconds"
@@ -472,6 +1002,42 @@ class Process:
             self._log.debug(
                 f"not found '{keyword}' in {timeout} seconds, but ignore it."
             )
+        return ""
+
+    def iter_lines(self, timeout: float = 600, stderr: bool = False) -> Iterator[str]:
+        """
+        Yield lines of stdout, or stderr, as they arrive, from the first line of
+        output. It ends when the process exits. On timeout, the process is
+        killed like wait_result. With pty, stderr is merged into stdout.
+        """
+        lines: "queue.Queue[str]" = queue.Queue()
+        splitter = _LineSplitter(lines.put)
+        stream = self._stderr_stream if stderr else self._stdout_stream
+        stream.add_listener(splitter)
+        timer = create_timer()
+        try:
+            while self.is_running() and timer.elapsed(False) < timeout:
+                # LogWriter only flushes if "\n" is written, so partial lines
+                # are kept in the splitter until they end.
+                try:
+                    yield lines.get(timeout=_LINE_POLL_INTERVAL)
+                except queue.Empty:
+                    pass
+            # collect the rest of output, which closes the stream.
+            self.wait_result(timeout=0)
+            while not lines.empty():
+                yield lines.get_nowait()
+        finally:
+            stream.remove_listener(splitter)
+
+    def on_line(self, callback: Callable[[str], None], stderr: bool = False) -> None:
+        """
+        Call the callback with each line of stdout, or stderr, from the first
+        line of output. It's called on the thread, which reads the output, so
+        it should return quickly.
+        """
+        stream = self._stderr_stream if stderr else self._stdout_stream
+        stream.add_listener(_LineSplitter(callback))
 
     def _recycle_resource(self) -> None:
         # TODO: The spur library is not very good and leaves open
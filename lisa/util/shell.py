@@ -1,17 +1,40 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 
+import atexit
+import codecs
+import hashlib
 import logging
 import os
+import posixpath
+import queue
 import re
+import shlex
 import shutil
 import socket
 import sys
+import tarfile
+import threading
 import time
+import uuid
 from functools import partial
 from pathlib import Path, PurePath, PureWindowsPath
 from time import sleep
-from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import paramiko
 import spur  # type: ignore
@@ -25,17 +48,45 @@ from lisa.util import (
     LisaException,
     SshSpawnTimeoutException,
     TcpConnectionException,
+    constants,
     filter_ansi_escape,
 )
 
 from .logger import Logger, get_logger
+from .parallel import run_in_parallel
 from .perf_timer import create_timer
 
 _get_jump_box_logger = partial(get_logger, name="jump_box")
+_SESSION_READY_TIMEOUT = 10
+_CHUNK_RETRY_COUNT = 3
+# the compression of tar streams, and the flag of tar command for it.
+_TAR_COMPRESSION_FLAGS = {"": "", "gz": "z", "bz2": "j", "xz": "J"}
+# the modes of tarfile streams by the compression, which are literals for type
+# checks.
+_TAR_WRITE_MODES: Dict[str, Literal["w|", "w|gz", "w|bz2", "w|xz"]] = {
+    "": "w|",
+    "gz": "w|gz",
+    "bz2": "w|bz2",
+    "xz": "w|xz",
+}
+_TAR_READ_MODES: Dict[str, Literal["r|", "r|gz", "r|bz2", "r|xz"]] = {
+    "": "r|",
+    "gz": "r|gz",
+    "bz2": "r|bz2",
+    "xz": "r|xz",
+}
+# The "tar" filter keeps permissions and symlinks, but refuses paths out of
+# the destination. It's available since Python 3.12, and security updates of
+# earlier versions.
+_TAR_EXTRACT_KWARGS: Dict[str, Any] = (
+    {"filter": "tar"} if hasattr(tarfile, "tar_filter") else {}
+)
 
 # (Failed to parse line 'b'/etc/profile.d/vglrun.sh: line 3: lspci: command not found'' as integer)  # noqa: E501
 # (Failed to parse line 'b"touch: cannot touch '/tmp/version-updated': Permission denied"' as integer)  # noqa: E501
 # (Failed to parse line 'b'/etc/profile.d/clover.sh: line 10: /opt/clover/bin/prepare-hostname.sh: Permission denied'' as integer)  # noqa: E501
+# a single "&" puts a job in background, but "&&", "&>", ">&" and "2>&1" don't.
+_background_job_pattern = re.compile(r"(^|[^&>|<])&([^&>]|$)")
 _spawn_initialization_error_pattern = re.compile(
     r"(Failed to parse line \'b[\'\"](?P<linux_profile_error>.*?)[\'\"]\' as integer)"
 )
@@ -95,6 +146,19 @@ def wait_tcp_port_ready(
     return is_ready, result
 
 
+def is_tcp_port_ready(address: str, port: int, timeout: float = 1) -> bool:
+    """
+    Check the port once, so callers can poll it in their own intervals.
+    """
+    if development.is_mock_tcp_ping():
+        return True
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
 class WindowsShellType(object):
     """
     Windows command generator
@@ -144,6 +208,23 @@ def try_connect(
     ssh_timeout: int = 300,
     sock: Optional[Any] = None,
 ) -> Any:
+    paramiko_client, stdout = _connect_and_detect(
+        connection_info, ssh_timeout=ssh_timeout, sock=sock
+    )
+    paramiko_client.close()
+    return stdout
+
+
+def _connect_and_detect(
+    connection_info: schema.ConnectionInfo,
+    ssh_timeout: int = 300,
+    sock: Optional[Any] = None,
+) -> Tuple[paramiko.SSHClient, Any]:
+    """
+    Connect and run a detection command. It returns the connected client, and
+    the stdout of the detection command. The client is kept open, so it can be
+    used by following commands without another handshake.
+    """
     # spur always run a posix command and will fail on Windows.
     # So try with paramiko firstly.
     paramiko_client = paramiko.SSHClient()
@@ -174,18 +255,23 @@ def try_connect(
 
             # Give it some time to process the command, otherwise reads on
             # stdout on calling contexts have been seen having empty strings
-            # from stdout, on Windows. There is a certain 3s penalty on Linux
-            # systems, as it's never ready for that (nonexisting) command, but
-            # that should only happen once per node (not per command)
-            tries = 3
-            while not stdout.channel.recv_ready() and tries:
-                sleep(1)
+            # from stdout, on Windows. On Linux, the nonexisting command exits
+            # with an error, so stop waiting once the exit status arrives. The
+            # output is received already at that point.
+            tries = 30
+            while (
+                not stdout.channel.recv_ready()
+                and not stdout.channel.exit_status_ready()
+                and tries
+            ):
+                sleep(0.1)
                 tries -= 1
 
             stdin.channel.shutdown_write()
-            paramiko_client.close()
+            # close the channel only, the received output is still readable.
+            stdout.channel.close()
 
-            return stdout
+            return paramiko_client, stdout
         except SSHException as e:
             # socket is open, but SSH service not responded
             if (
@@ -203,6 +289,870 @@ def try_connect(
     raise LisaException(f"ssh connection cannot be established: {connection_info}")
 
 
+class SshTransportPool:
+    """
+    The SSH transports of a node. A new channel is opened on the least loaded
+    transport. When all transports have open channels and the pool isn't full,
+    a new transport is connected, so idle nodes keep one connection only. Dead
+    transports, like after a reboot, are dropped and replaced on demand.
+    """
+
+    def __init__(self, size: int, connect: Callable[[], paramiko.SSHClient]) -> None:
+        assert size > 0, f"pool size must be positive, but it's {size}"
+        self._size = size
+        self._connect = connect
+        self._clients: List[paramiko.SSHClient] = []
+        # channels, which are opened by the pool on each client.
+        self._channels: Dict[paramiko.SSHClient, List[paramiko.Channel]] = {}
+        # channels, which are opening on each client.
+        self._opening_counts: Dict[paramiko.SSHClient, int] = {}
+        # clients, which are connecting out of the lock.
+        self._connecting_count = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def transport_count(self) -> int:
+        with self._condition:
+            return len(self._clients)
+
+    def add(self, client: paramiko.SSHClient) -> None:
+        with self._condition:
+            self._clients.append(client)
+
+    def open_session(self) -> paramiko.Channel:
+        client = self._acquire_client()
+        try:
+            transport = client.get_transport()
+            if transport is None:
+                raise EOFError("the transport is closed.")
+            channel = transport.open_session()
+        except BaseException:
+            self._release_client(client)
+            raise
+        self._release_client(client, channel)
+        return channel
+
+    def open_sftp_client(self) -> paramiko.SFTPClient:
+        channel = self.open_session()
+        channel.invoke_subsystem("sftp")
+        return paramiko.SFTPClient(channel)
+
+    def close(self) -> None:
+        with self._condition:
+            for client in self._clients:
+                client.close()
+            self._clients.clear()
+            self._channels.clear()
+            self._opening_counts.clear()
+
+    def _acquire_client(self) -> paramiko.SSHClient:
+        """
+        Return a client with a reserved channel. The connection happens out of
+        the lock, so other callers can use connected transports meanwhile.
+        """
+        with self._condition:
+            while True:
+                self._remove_inactive_clients()
+                client = min(self._clients, key=self._get_channel_count, default=None)
+                has_slot = len(self._clients) + self._connecting_count < self._size
+                if client and (not has_slot or not self._get_channel_count(client)):
+                    self._opening_counts[client] += 1
+                    return client
+                if has_slot:
+                    self._connecting_count += 1
+                    break
+                # all slots are connecting, wait for one of them.
+                self._condition.wait()
+
+        try:
+            client = self._connect()
+        finally:
+            with self._condition:
+                self._connecting_count -= 1
+                self._condition.notify_all()
+        with self._condition:
+            self._clients.append(client)
+            self._channels[client] = []
+            self._opening_counts[client] = 1
+        return client
+
+    def _release_client(
+        self, client: paramiko.SSHClient, channel: Optional[paramiko.Channel] = None
+    ) -> None:
+        with self._condition:
+            # the client may be removed, when it's opening the channel.
+            if client in self._opening_counts:
+                self._opening_counts[client] -= 1
+            if channel is not None and client in self._channels:
+                self._channels[client].append(channel)
+
+    def _get_channel_count(self, client: paramiko.SSHClient) -> int:
+        channels = self._channels.setdefault(client, [])
+        open_channels = [x for x in channels if not x.closed]
+        if len(open_channels) < len(channels):
+            self._channels[client] = open_channels
+        return len(open_channels) + self._opening_counts.setdefault(client, 0)
+
+    def _remove_inactive_clients(self) -> None:
+        active_clients: List[paramiko.SSHClient] = []
+        for client in self._clients:
+            transport = client.get_transport()
+            if transport and transport.is_active():
+                active_clients.append(client)
+            else:
+                client.close()
+                self._channels.pop(client, None)
+                self._opening_counts.pop(client, None)
+        self._clients = active_clients
+
+
+class JumpBoxPool:
+    """
+    The authenticated transports of jump boxes, which are shared by all nodes
+    in the process. A transport is kept for each chain of hops, so a node
+    connection is a direct-tcpip channel on the transport of the last hop,
+    instead of new handshakes with all hops. Dead transports, like a rebooted
+    jump box, are found by health checks and connected again. Transports are
+    closed, when the process exits.
+    """
+
+    def __init__(self, keepalive_interval: int = 30) -> None:
+        self._keepalive_interval = keepalive_interval
+        self._clients: Dict[Tuple[Any, ...], paramiko.SSHClient] = {}
+        self._key_locks: Dict[Tuple[Any, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def transport_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def open_channel(
+        self,
+        jump_boxes: List[schema.ProxyConnectionInfo],
+        dest_address: str,
+        dest_port: int,
+    ) -> paramiko.Channel:
+        last_hop = jump_boxes[-1]
+        for retry in range(2):
+            transport = self._get_transport(jump_boxes)
+            try:
+                return transport.open_channel(
+                    kind="direct-tcpip",
+                    src_addr=(last_hop.address, last_hop.port),
+                    dest_addr=(dest_address, dest_port),
+                )
+            except (SSHException, EOFError, OSError):
+                # the transport looks active, but it's broken. Connect again.
+                if retry > 0:
+                    raise
+                self._remove(jump_boxes)
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        with self._lock:
+            for client in reversed(list(self._clients.values())):
+                client.close()
+            self._clients.clear()
+
+    def _get_transport(
+        self, jump_boxes: List[schema.ProxyConnectionInfo]
+    ) -> paramiko.Transport:
+        transport: Optional[paramiko.Transport] = None
+        for index in range(len(jump_boxes)):
+            transport = self._get_hop_transport(jump_boxes[: index + 1], transport)
+        assert transport, "no jump box is specified"
+        return transport
+
+    def _get_hop_transport(
+        self,
+        hops: List[schema.ProxyConnectionInfo],
+        previous_transport: Optional[paramiko.Transport],
+    ) -> paramiko.Transport:
+        """
+        Return the transport of the last hop. It's connected through the
+        transport of the previous hop, if there is one. Hops are connected out
+        of the pool lock, so a slow hop doesn't block other chains, and the
+        lock of each chain makes sure a hop is connected once.
+        """
+        key = _get_hop_chain_key(hops)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                client = self._clients.get(key)
+            if client:
+                transport = client.get_transport()
+                if transport and transport.is_active():
+                    return transport
+                client.close()
+
+            hop = hops[-1]
+            sock: Any = None
+            if previous_transport:
+                previous_hop = hops[-2]
+                sock = previous_transport.open_channel(
+                    kind="direct-tcpip",
+                    src_addr=(previous_hop.address, previous_hop.port),
+                    dest_addr=(
+                        hop.private_address or hop.address,
+                        hop.private_port or hop.port,
+                    ),
+                )
+            if development.is_trace_enabled():
+                _get_jump_box_logger().debug(f"creating connection to jump box: {hop}")
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
+            client.connect(
+                hostname=hop.address,
+                port=hop.port,
+                username=hop.username,
+                password=hop.password,
+                key_filename=hop.private_key_file,
+                banner_timeout=10,
+                sock=sock,
+            )
+            transport = client.get_transport()
+            assert transport
+            transport.set_keepalive(self._keepalive_interval)
+            with self._lock:
+                self._clients[key] = client
+            return transport
+
+    def _remove(self, jump_boxes: List[schema.ProxyConnectionInfo]) -> None:
+        with self._lock:
+            client = self._clients.pop(_get_hop_chain_key(jump_boxes), None)
+        if client:
+            client.close()
+
+
+def _get_hop_chain_key(jump_boxes: List[schema.ProxyConnectionInfo]) -> Tuple[Any, ...]:
+    return tuple(
+        (x.address, x.port, x.username, x.private_address, x.private_port)
+        for x in jump_boxes
+    )
+
+
+_jump_box_pool = JumpBoxPool()
+atexit.register(_jump_box_pool.close)
+
+
+class _PooledSpurSshShell(spur.SshShell):  # type: ignore
+    """
+    spur opens all channels on one client. This shell takes transports from
+    the pool, so both commands and sftp are spread over the pool.
+    """
+
+    def __init__(self, pool: SshTransportPool, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._pool = pool
+
+    def close(self) -> None:
+        self._closed = True
+        self._pool.close()
+
+    def open_session(self) -> paramiko.Channel:
+        try:
+            return self._pool.open_session()
+        except (socket.error, paramiko.SSHException, EOFError) as error:
+            raise self._connection_error(error)
+
+    def open_sftp_client(self) -> paramiko.SFTPClient:
+        try:
+            return self._pool.open_sftp_client()
+        except (socket.error, paramiko.SSHException, EOFError) as error:
+            raise self._connection_error(error)
+
+    def _get_ssh_transport(self) -> "_PooledSpurSshShell":
+        # spur opens channels on the transport, so the shell opens them by the
+        # pool instead.
+        if self._closed:
+            raise RuntimeError("Shell is closed")
+        return self
+
+
+class SshSessionProcess:
+    """
+    A command in a SshSession. It has the methods of spur processes, which are
+    used by Process.
+    """
+
+    def __init__(
+        self, session: "SshSession", stdout: Any, stderr: Any, encoding: str
+    ) -> None:
+        self.pid: Optional[int] = None
+        self.return_code: Optional[int] = None
+        self._session = session
+        self._writers = {True: stdout, False: stderr}
+        self._decoders = {
+            True: codecs.getincrementaldecoder(encoding)(errors="replace"),
+            False: codecs.getincrementaldecoder(encoding)(errors="replace"),
+        }
+        self._open_streams = {True, False}
+        self._started = threading.Event()
+        self._exited = threading.Event()
+
+    def is_running(self) -> bool:
+        return not self._exited.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._exited.wait(timeout)
+
+    def wait_for_result(self) -> Any:
+        self._exited.wait()
+        return spur.results.ExecutionResult(self.return_code, "", "")
+
+    def send_signal(self, signal: int) -> None:
+        assert self.pid and self.pid > 0, f"the command isn't started: {self.pid}"
+        self._session.send_signal(self.pid, signal)
+
+    def stdin_write(self, value: Any) -> None:
+        raise LisaException("commands in the persistent session don't take inputs.")
+
+    def _write(self, is_stdout: bool, data: bytes, final: bool = False) -> None:
+        text = self._decoders[is_stdout].decode(data, final)
+        writer = self._writers[is_stdout]
+        if text and writer:
+            writer.write(text)
+
+    def _end_stream(self, is_stdout: bool, return_code: Optional[int]) -> bool:
+        self._write(is_stdout, b"", final=True)
+        if is_stdout:
+            self.return_code = return_code
+        self._open_streams.discard(is_stdout)
+        return not self._open_streams
+
+    def _abort(self) -> None:
+        # the session is closed, so the command is lost.
+        for is_stdout in list(self._open_streams):
+            self._write(is_stdout, b"", final=True)
+        self._open_streams.clear()
+        if self.return_code is None:
+            self.return_code = -1
+        self._started.set()
+        self._exited.set()
+
+
+class SshSession:
+    """
+    A long-lived sh on a SSH channel, which runs commands one by one, so a
+    command doesn't pay a new channel, a login shell and a pty. Each command
+    is a request on the stdin of sh, and its output is framed by delimiter
+    lines on stdout and stderr. The begin line carries the pid, and the end
+    line carries the exit code.
+
+    If setsid exists, each command runs in its own process group, so a
+    cancel or a timeout signals the whole group. Commands with background
+    jobs, like "&" or nohup, don't run in the session, because their children
+    may write into the output of next commands.
+    """
+
+    def __init__(self, kill: Callable[[List[str]], Any], is_root: bool) -> None:
+        self.is_root = is_root
+        self.is_alive = False
+        self._kill = kill
+        self._delimiter = f"lisa_session_{uuid.uuid4().hex}"
+        self._marker_prefix = f"\n{self._delimiter} ".encode()
+        self._marker_pattern = re.compile(
+            re.escape(self._marker_prefix)
+            + rb"(?P<kind>ready|begin|end)(?: (?P<value>-?\d+))?\n"
+        )
+        self._channel: Optional[paramiko.Channel] = None
+        self._process: Optional[SshSessionProcess] = None
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self, channel: paramiko.Channel) -> bool:
+        """
+        Return False, if the shell exits at once, like "sudo -n" needs a
+        password.
+        """
+        self._channel = channel
+        self._channel.exec_command("sudo -n sh" if self.is_root else "sh")
+        self.is_alive = True
+        for recv, is_stdout in [
+            (self._channel.recv, True),
+            (self._channel.recv_stderr, False),
+        ]:
+            threading.Thread(
+                target=self._read, args=(recv, is_stdout), daemon=True
+            ).start()
+        self._channel.sendall(
+            f"d={self._delimiter}; "
+            "if command -v setsid >/dev/null 2>&1; then s=setsid; else s=; fi; "
+            "printf '\\n%s ready\\n' \"$d\"\n".encode()
+        )
+        return self._ready.wait(_SESSION_READY_TIMEOUT) and self.is_alive
+
+    def try_acquire(self) -> bool:
+        return self.is_alive and self._busy.acquire(blocking=False)
+
+    def spawn(
+        self,
+        command: Sequence[str],
+        cwd: Optional[str],
+        stdout: Any,
+        stderr: Any,
+        encoding: str,
+        merge_stderr: bool,
+    ) -> SshSessionProcess:
+        """
+        The session must be acquired by try_acquire, and it's released when
+        the command ends.
+        """
+        assert self._channel
+        process = SshSessionProcess(self, stdout, stderr, encoding)
+        with self._lock:
+            self._process = process
+        try:
+            self._channel.sendall(
+                self._create_request(command, cwd, merge_stderr).encode()
+            )
+        except Exception:
+            self._finish(process)
+            raise
+        if not process._started.wait(_SESSION_READY_TIMEOUT):
+            # the session may be stuck, so it's released and closed.
+            self._finish(process)
+            self.close()
+            raise SshSpawnTimeoutException(
+                f"The persistent session is timeout on execute {command}."
+            )
+        if process.pid == -1:
+            raise spur.NoSuchCommandError(command[0])
+        return process
+
+    def send_signal(self, pid: int, signal: int) -> None:
+        # signal the process group, or the process, if setsid doesn't exist.
+        command = [
+            "sh",
+            "-c",
+            f"kill -{signal} -{pid} 2>/dev/null || kill -{signal} {pid}",
+        ]
+        if self.is_root:
+            command = ["sudo", "-n"] + command
+        self._kill(command)
+
+    def close(self) -> None:
+        self.is_alive = False
+        process = self._process
+        if process and process.pid and process.pid > 0 and process.is_running():
+            # the running command outlives the channel, so kill it.
+            try:
+                self.send_signal(process.pid, 9)
+            except Exception:
+                pass
+        if self._channel:
+            self._channel.close()
+
+    def _create_request(
+        self, command: Sequence[str], cwd: Optional[str], merge_stderr: bool
+    ) -> str:
+        # the command runs in background, so its pid is sent before it ends.
+        # The stdin is /dev/null, so it doesn't read the next requests. setsid
+        # keeps the pid, because the subshell isn't a process group leader.
+        change_directory = f"cd {shlex.quote(cwd)} || exit 1; " if cwd else ""
+        redirection = " 2>&1" if merge_stderr else ""
+        return (
+            f"if command -v {shlex.quote(command[0])} >/dev/null 2>&1; then "
+            f"( {change_directory}exec $s {shlex.join(command)} ) "
+            f"</dev/null{redirection} & p=$!; "
+            'printf \'\\n%s begin %s\\n\' "$d" "$p"; wait $p; r=$?; '
+            "else printf '\\n%s begin -1\\n' \"$d\"; r=127; fi; "
+            'printf \'\\n%s end %s\\n\' "$d" "$r"; '
+            "printf '\\n%s end\\n' \"$d\" >&2\n"
+        )
+
+    def _read(self, recv: Callable[[int], bytes], is_stdout: bool) -> None:
+        buffer = b""
+        try:
+            while True:
+                data = recv(32768)
+                if not data:
+                    break
+                buffer = self._process_data(buffer + data, is_stdout)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        self._on_closed()
+
+    def _process_data(self, buffer: bytes, is_stdout: bool) -> bytes:
+        """
+        Write output to the current command, and handle delimiter lines. It
+        returns the tail, which may be the beginning of a delimiter line.
+        """
+        while True:
+            matched = self._marker_pattern.search(buffer)
+            if not matched:
+                break
+            self._write(is_stdout, buffer[: matched.start()])
+            self._on_marker(is_stdout, matched.group("kind"), matched.group("value"))
+            buffer = buffer[matched.end() :]
+
+        index = buffer.rfind(b"\n")
+        if index >= 0:
+            tail = buffer[index:]
+            if self._marker_prefix.startswith(tail) or tail.startswith(
+                self._marker_prefix
+            ):
+                self._write(is_stdout, buffer[:index])
+                return tail
+        self._write(is_stdout, buffer)
+        return b""
+
+    def _write(self, is_stdout: bool, data: bytes) -> None:
+        # the output out of commands, like messages of login, is dropped.
+        process = self._process
+        if data and process:
+            process._write(is_stdout, data)
+
+    def _on_marker(self, is_stdout: bool, kind: bytes, value: Optional[bytes]) -> None:
+        if kind == b"ready":
+            self._ready.set()
+            return
+        process = self._process
+        if not process:
+            return
+        if kind == b"begin":
+            process.pid = int(value) if value else -1
+            process._started.set()
+        elif process._end_stream(is_stdout, int(value) if value else None):
+            self._finish(process)
+
+    def _finish(self, process: SshSessionProcess) -> None:
+        with self._lock:
+            if self._process is process:
+                self._process = None
+                self._busy.release()
+        # the session is released before the command exits, so next commands
+        # can use it once this one is waited.
+        process._exited.set()
+
+    def _on_closed(self) -> None:
+        self.is_alive = False
+        self._ready.set()
+        with self._lock:
+            process = self._process
+            self._process = None
+        if process:
+            process._abort()
+
+
+def _get_tar_compression_flag(compression: str) -> str:
+    if compression not in _TAR_COMPRESSION_FLAGS:
+        raise LisaException(
+            f"unsupported compression '{compression}' of tar stream, "
+            f"supported: {list(_TAR_COMPRESSION_FLAGS)}"
+        )
+    return _TAR_COMPRESSION_FLAGS[compression]
+
+
+class _LocalFiles:
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def get_size(self, path: str) -> int:
+        return os.path.getsize(path)
+
+    def get_hash(self, path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(partial(file.read, 1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def read(self, path: str, offset: int, length: int) -> bytes:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            return file.read(length)
+
+    def write(self, path: str, offset: int, data: bytes) -> None:
+        with open(path, "r+b") as file:
+            file.seek(offset)
+            file.write(data)
+
+    def read_text(self, path: str) -> Optional[str]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as file:
+            return file.read()
+
+    def write_text(self, path: str, content: str, append: bool = False) -> None:
+        with open(path, "a" if append else "w") as file:
+            file.write(content)
+
+    def allocate(self, path: str, size: int) -> None:
+        with open(path, "wb") as file:
+            file.truncate(size)
+
+    def remove(self, path: str) -> None:
+        if os.path.exists(path):
+            os.remove(path)
+
+    def copy_attributes(self, source: str, destination: str) -> None:
+        stat = os.stat(source)
+        os.chmod(destination, stat.st_mode & 0o7777)
+        try:
+            os.chown(destination, stat.st_uid, stat.st_gid)
+        except (OSError, AttributeError):
+            # the owner can be changed by root only, and not on Windows.
+            pass
+
+    def rename(self, source: str, destination: str) -> None:
+        os.replace(source, destination)
+
+
+class _SftpFiles:
+    def __init__(
+        self,
+        sftp: paramiko.SFTPClient,
+        run_command: Callable[[str], Tuple[int, str]],
+        hash_command: str,
+    ) -> None:
+        self._sftp = sftp
+        self._run_command = run_command
+        self._hash_command = hash_command
+
+    def exists(self, path: str) -> bool:
+        try:
+            self._sftp.stat(path)
+        except IOError:
+            return False
+        return True
+
+    def get_size(self, path: str) -> int:
+        return int(self._sftp.stat(path).st_size or 0)
+
+    def get_hash(self, path: str) -> str:
+        # hash on the node, so the file isn't read over network again.
+        exit_code, output = self._run_command(
+            f"{self._hash_command} {shlex.quote(path)}"
+        )
+        if exit_code != 0 or not output.strip():
+            raise LisaException(f"failed to get sha256 of {path}: {output}")
+        return output.split()[0]
+
+    def read(self, path: str, offset: int, length: int) -> bytes:
+        with self._sftp.open(path, "rb") as file:
+            # readv sends read requests of the range without waiting.
+            return b"".join(file.readv([(offset, length)]))
+
+    def write(self, path: str, offset: int, data: bytes) -> None:
+        # the range is written, when the file is closed.
+        with self._sftp.open(path, "r+b") as file:
+            file.set_pipelined(True)
+            file.seek(offset)
+            file.write(data)
+
+    def read_text(self, path: str) -> Optional[str]:
+        if not self.exists(path):
+            return None
+        with self._sftp.open(path, "r") as file:
+            return str(file.read().decode())
+
+    def write_text(self, path: str, content: str, append: bool = False) -> None:
+        with self._sftp.open(path, "a" if append else "w") as file:
+            file.write(content)
+
+    def allocate(self, path: str, size: int) -> None:
+        with self._sftp.open(path, "wb"):
+            pass
+        self._sftp.truncate(path, size)
+
+    def remove(self, path: str) -> None:
+        if self.exists(path):
+            self._sftp.remove(path)
+
+    def copy_attributes(self, source: str, destination: str) -> None:
+        stat = self._sftp.stat(source)
+        self._sftp.chmod(destination, (stat.st_mode or 0) & 0o7777)
+        if stat.st_uid is not None and stat.st_gid is not None:
+            try:
+                self._sftp.chown(destination, stat.st_uid, stat.st_gid)
+            except IOError:
+                # the owner can be changed by root only.
+                pass
+
+    def rename(self, source: str, destination: str) -> None:
+        self._sftp.posix_rename(source, destination)
+
+
+_Files = Union[_LocalFiles, _SftpFiles]
+
+
+class _ChunkedFileCopy:
+    """
+    Copy a large file by ranges over parallel SFTP connections, since a single
+    SFTP stream is bound by the window and the cipher of one connection.
+
+    Ranges are written to a partial file, and finished ranges are appended to
+    a journal next to it. The journal starts with the size and the sha256 of
+    the source, so a copy of the same source resumes from finished ranges.
+    The partial file replaces the destination, after its sha256 matches. The
+    mode and owner of an existing destination are kept.
+    """
+
+    def __init__(
+        self,
+        local_path: str,
+        node_path: str,
+        is_upload: bool,
+        node_files: _SftpFiles,
+        open_node_files: Callable[[], Tuple[_SftpFiles, Callable[[], None]]],
+        chunk_size: int,
+        parallel: int,
+    ) -> None:
+        self._local_files = _LocalFiles()
+        self._node_files = node_files
+        self._open_node_files = open_node_files
+        self._is_upload = is_upload
+        if is_upload:
+            self._source_path, self._destination_path = local_path, node_path
+        else:
+            self._source_path, self._destination_path = node_path, local_path
+        self._partial_path = f"{self._destination_path}.lisa_partial"
+        self._journal_path = f"{self._partial_path}.journal"
+        self._chunk_size = chunk_size
+        self._parallel = parallel
+        self._journal_lock = threading.Lock()
+
+    def run(self) -> None:
+        source_files, destination_files = self._get_files(self._node_files)
+        size = source_files.get_size(self._source_path)
+        source_hash = source_files.get_hash(self._source_path)
+        header = f"{size} {self._chunk_size} {source_hash}\n"
+
+        journal = destination_files.read_text(self._journal_path)
+        if journal and journal.startswith(header):
+            finished = {int(x) for x in journal[len(header) :].split()}
+        else:
+            destination_files.allocate(self._partial_path, size)
+            destination_files.write_text(self._journal_path, header)
+            finished = set()
+
+        chunks: "queue.Queue[int]" = queue.Queue()
+        chunk_count = (size + self._chunk_size - 1) // self._chunk_size
+        for index in range(chunk_count):
+            if index not in finished:
+                chunks.put(index)
+        worker_count = min(self._parallel, chunks.qsize())
+        if worker_count:
+            run_in_parallel([partial(self._copy_chunks, chunks, size)] * worker_count)
+
+        destination_hash = destination_files.get_hash(self._partial_path)
+        if destination_hash != source_hash:
+            # the partial file is broken, so start over next time.
+            destination_files.remove(self._journal_path)
+            raise LisaException(
+                f"sha256 mismatched on copy {self._source_path} to "
+                f"{self._destination_path}, source: {source_hash}, "
+                f"destination: {destination_hash}"
+            )
+        if destination_files.exists(self._destination_path):
+            destination_files.copy_attributes(
+                self._destination_path, self._partial_path
+            )
+        destination_files.rename(self._partial_path, self._destination_path)
+        destination_files.remove(self._journal_path)
+
+    def _get_files(self, node_files: _SftpFiles) -> Tuple[_Files, _Files]:
+        if self._is_upload:
+            return self._local_files, node_files
+        return node_files, self._local_files
+
+    def _copy_chunks(self, chunks: "queue.Queue[int]", size: int) -> None:
+        # each worker has its own connection, and reconnects on failures.
+        node_files, close = self._open_node_files()
+        try:
+            while True:
+                try:
+                    index = chunks.get_nowait()
+                except queue.Empty:
+                    break
+                for retry in range(_CHUNK_RETRY_COUNT):
+                    try:
+                        self._copy_chunk(node_files, index, size)
+                        break
+                    except (OSError, EOFError, paramiko.SSHException):
+                        if retry == _CHUNK_RETRY_COUNT - 1:
+                            raise
+                        close()
+                        node_files, close = self._open_node_files()
+        finally:
+            close()
+
+    def _copy_chunk(self, node_files: _SftpFiles, index: int, size: int) -> None:
+        source_files, destination_files = self._get_files(node_files)
+        offset = index * self._chunk_size
+        length = min(self._chunk_size, size - offset)
+        data = source_files.read(self._source_path, offset, length)
+        destination_files.write(self._partial_path, offset, data)
+        with self._journal_lock:
+            destination_files.write_text(self._journal_path, f"{index}\n", append=True)
+
+
+class _CapturedOutputReader(spur.io._ContinuousReader):  # type: ignore
+    """
+    Reads output into the writer only. spur keeps all output in a list of
+    chars for its result, but the writer captures the output already, so the
+    output is held only once.
+    """
+
+    def _capture_output(self) -> None:
+        while True:
+            try:
+                output = self._file_in.read(1)
+            except IOError:
+                if self._is_pty:
+                    output = self._empty
+                else:
+                    raise
+            if not output:
+                return
+            self._file_out.write(output)
+
+
+class _CapturedIoHandler:
+    def __init__(self, readers: List[_CapturedOutputReader]) -> None:
+        self._readers = readers
+
+    def wait(self) -> List[Any]:
+        return [x.wait() for x in self._readers]
+
+
+def _is_captured(stdout: Any, stderr: Any) -> bool:
+    return getattr(stdout, "is_capturing", False) and getattr(
+        stderr, "is_capturing", False
+    )
+
+
+def _capture_process_output(
+    process: Any, streams: List[Any], writers: List[Any], encoding: str
+) -> None:
+    """
+    The process is spawned by spur without writers, so spur doesn't read its
+    output until the result is waited. The output is read by writers instead,
+    and the result of spur is empty.
+    """
+    readers: List[_CapturedOutputReader] = []
+    for stream, writer in zip(streams, writers):
+        if encoding:
+            stream = codecs.getreader(encoding)(stream)
+        readers.append(
+            _CapturedOutputReader(
+                file_in=stream,
+                file_out=writer,
+                is_pty=False,
+                empty="" if encoding else b"",
+            )
+        )
+    process._io = _CapturedIoHandler(readers)
+
+
 # paramiko stuck on get command output of 'fortinet' VM, and spur hide timeout of
 # exec_command. So use an external timeout wrapper to force timeout.
 # some images needs longer time to set up ssh connection.
@@ -214,13 +1164,28 @@ def _spawn_ssh_process(shell: spur.ssh.SshShell, **kwargs: Any) -> spur.ssh.SshP
 
 
 class SshShell(InitializableMixin):
-    def __init__(self, connection_info: schema.ConnectionInfo) -> None:
+    def __init__(
+        self,
+        connection_info: schema.ConnectionInfo,
+        pool_size: int = 1,
+        session_mode: str = "",
+    ) -> None:
         super().__init__()
         self.is_remote = True
         self.connection_info = connection_info
+        self.pool_size = pool_size
+        # "" is disabled, "user" runs commands in a persistent session, and
+        # "root" also runs sudo commands in a persistent root session.
+        self.session_mode = session_mode
+        self._sessions: Dict[bool, SshSession] = {}
+        self._failed_sessions: Set[bool] = set()
+        self._session_lock = threading.Lock()
+        self._has_tar: Optional[bool] = None
+        # the command, which prints sha256 of files first. It's empty, if the
+        # node has no such command.
+        self._hash_command: Optional[str] = None
+        self._transport_pool: Optional[SshTransportPool] = None
         self._inner_shell: Optional[spur.SshShell] = None
-        self._jump_boxes: List[Any] = []
-        self._jump_box_sock: Any = None
         self.is_sudo_required_password: bool = False
         self.password_prompts: List[str] = []
         self.bash_prompt: str = ""
@@ -240,22 +1205,24 @@ class SshShell(InitializableMixin):
                 tcp_error_code,
             )
 
-        sock = self._establish_jump_boxes(
-            address=self.connection_info.address,
-            port=self.connection_info.port,
-        )
+        sock = self._open_tunnel()
 
+        # The connection of detection is kept as the first transport of pool,
+        # and used for commands and sftp, so there is only one handshake for
+        # each connection.
         try:
-            stdout = try_connect(self.connection_info, sock=sock)
+            paramiko_client, stdout = _connect_and_detect(
+                self.connection_info, sock=sock
+            )
         except Exception as identifier:
+            if sock:
+                sock.close()
             raise LisaException(
                 f"failed to connect SSH "
                 f"[{self.connection_info.address}:{self.connection_info.port}], "
                 f"{identifier.__class__.__name__}: {identifier}"
             )
 
-        self._close_jump_boxes()
-
         # Some windows doesn't end the text stream, so read first line only.
         # it's  enough to detect os.
         stdout_content = stdout.readline()
@@ -271,11 +1238,6 @@ class SshShell(InitializableMixin):
             if stdout_content and "Unknown syntax" in stdout_content:
                 shell_type = spur.ssh.ShellTypes.minimal
 
-        sock = self._establish_jump_boxes(
-            address=self.connection_info.address,
-            port=self.connection_info.port,
-        )
-
         # According to paramiko\client.py connect() function,
         # when password and private_key_file all exist, private key is attempted
         # with high priority for authentication when connecting to a remote node
@@ -293,7 +1255,13 @@ class SshShell(InitializableMixin):
             "sock": sock,
         }
 
-        spur_ssh_shell = spur.SshShell(shell_type=shell_type, **spur_kwargs)
+        self._transport_pool = SshTransportPool(
+            size=self.pool_size, connect=self._connect_pool_client
+        )
+        self._transport_pool.add(paramiko_client)
+        spur_ssh_shell = _PooledSpurSshShell(
+            pool=self._transport_pool, shell_type=shell_type, **spur_kwargs
+        )
         sftp = spurplus.sftp.ReconnectingSFTP(
             sftp_opener=spur_ssh_shell._open_sftp_client
         )
@@ -310,14 +1278,18 @@ class SshShell(InitializableMixin):
             )
 
     def close(self) -> None:
+        with self._session_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._failed_sessions.clear()
         if self._inner_shell:
             self._inner_shell.close()
             # after closed, can be reconnect
             self._inner_shell = None
+        self._transport_pool = None
         self._is_initialized = False
 
-        self._close_jump_boxes()
-
     @property
     def is_connected(self) -> bool:
         is_inner_shell_ready = False
@@ -346,18 +1318,26 @@ class SshShell(InitializableMixin):
                 if self._inner_shell._spur._shell_type == spur.ssh.ShellTypes.minimal:
                     # minimal shell type doesn't support store_pid
                     store_pid = False
+                is_captured = _is_captured(stdout, stderr)
                 process: spur.ssh.SshProcess = _spawn_ssh_process(
                     self._inner_shell,
                     command=command,
                     update_env=update_env,
                     store_pid=store_pid,
                     cwd=cwd,
-                    stdout=stdout,
-                    stderr=stderr,
+                    stdout=None if is_captured else stdout,
+                    stderr=None if is_captured else stderr,
                     encoding=encoding,
                     use_pty=use_pty,
                     allow_error=allow_error,
                 )
+                if is_captured:
+                    _capture_process_output(
+                        process,
+                        [process._stdout, process._stderr],
+                        [stdout, stderr],
+                        encoding,
+                    )
                 break
             except FunctionTimedOut:
                 raise SshSpawnTimeoutException(
@@ -392,6 +1372,67 @@ class SshShell(InitializableMixin):
                     raise identifier
         return process
 
+    def spawn_in_session(
+        self,
+        command: Sequence[str],
+        update_env: Optional[Mapping[str, str]] = None,
+        cwd: Optional[str] = None,
+        stdout: Any = None,
+        stderr: Any = None,
+        encoding: str = "utf-8",
+        merge_stderr: bool = True,
+    ) -> Optional[SshSessionProcess]:
+        """
+        Run the command in the persistent session. It returns None, if the
+        command should be spawned by a new channel, because the session is
+        disabled, busy or failed. sudo commands run in the root session only,
+        because a password can't be input to a session.
+        """
+        if not self.session_mode or update_env:
+            return None
+        joined_command = " ".join(command)
+        if "nohup" in joined_command or _background_job_pattern.search(joined_command):
+            # background children outlive the command, so they run on a new
+            # channel.
+            return None
+        self.initialize()
+        assert self._inner_shell
+        if (
+            not self.is_posix
+            or self._inner_shell._spur._shell_type == spur.ssh.ShellTypes.minimal
+        ):
+            return None
+
+        is_root = False
+        if command[0] == "sudo":
+            if (
+                self.session_mode != "root"
+                or len(command) < 2
+                or command[1].startswith("-")
+            ):
+                return None
+            command = command[1:]
+            is_root = True
+
+        session = self._acquire_session(is_root)
+        if not session:
+            return None
+        try:
+            return session.spawn(
+                command=command,
+                cwd=cwd,
+                stdout=stdout,
+                stderr=stderr,
+                encoding=encoding,
+                merge_stderr=merge_stderr,
+            )
+        except spur.NoSuchCommandError:
+            raise
+        except (OSError, EOFError, paramiko.SSHException):
+            # the channel is broken, and a new session is started next time.
+            session.close()
+            return None
+
     def mkdir(
         self,
         path: PurePath,
@@ -579,9 +1620,15 @@ class SshShell(InitializableMixin):
                                      target node is a Posix one, because LISA
                                      might be ran from Windows)
         """
-        self.mkdir(node_path.parent, parents=True, exist_ok=True)
         self.initialize()
+        self.mkdir(node_path.parent, parents=True, exist_ok=True)
         assert self._inner_shell
+        if (
+            os.path.getsize(local_path) >= constants.LARGE_FILE_COPY_SIZE
+            and self.is_large_file_copy_supported
+        ):
+            self._copy_large_file(local_path, node_path, is_upload=True)
+            return
         local_path_str = self._purepath_to_str(local_path, True)
         node_path_str = self._purepath_to_str(node_path, False)
         self._inner_shell.put(
@@ -603,6 +1650,13 @@ class SshShell(InitializableMixin):
         """
         self.initialize()
         assert self._inner_shell
+        if (
+            self.is_large_file_copy_supported
+            and self.stat(node_path).st_size >= constants.LARGE_FILE_COPY_SIZE
+        ):
+            Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+            self._copy_large_file(local_path, node_path, is_upload=False)
+            return
         node_path_str = self._purepath_to_str(node_path, False)
         local_path_str = self._purepath_to_str(local_path, True)
         self._inner_shell.get(
@@ -611,6 +1665,180 @@ class SshShell(InitializableMixin):
             consistent=self.is_posix,
         )
 
+    @property
+    def is_tree_copy_supported(self) -> bool:
+        """
+        Directories can be copied by tar streams, if the node is posix, and it
+        has tar.
+        """
+        self.initialize()
+        assert self._inner_shell
+        if self._has_tar is None:
+            self._has_tar = (
+                self.is_posix
+                and self._inner_shell._spur._shell_type != spur.ssh.ShellTypes.minimal
+                and self._run_channel_command("command -v tar")[0] == 0
+            )
+        return self._has_tar
+
+    @property
+    def is_large_file_copy_supported(self) -> bool:
+        """
+        Large files can be copied by parallel ranges, if the node is posix, and
+        it has sha256sum, or sha256 of FreeBSD, to verify copied files.
+        """
+        self.initialize()
+        assert self._inner_shell
+        if self._hash_command is None:
+            self._hash_command = ""
+            if (
+                self.is_posix
+                and self._inner_shell._spur._shell_type != spur.ssh.ShellTypes.minimal
+            ):
+                exit_code, output = self._run_channel_command(
+                    "command -v sha256sum || command -v sha256"
+                )
+                if exit_code == 0 and output.strip():
+                    if output.strip().endswith("sha256sum"):
+                        self._hash_command = "sha256sum"
+                    else:
+                        self._hash_command = "sha256 -q"
+        return bool(self._hash_command)
+
+    def copy_tree(
+        self, local_path: PurePath, node_path: PurePath, compression: str = ""
+    ) -> List[str]:
+        """
+        Upload the local directory to node_path by a tar stream on one channel,
+        instead of SFTP requests for each file. Permissions and symlinks are
+        kept, and files are owned by the user on node, even if it's root. It
+        returns relative paths of copied files.
+            compression: "", "gz", "bz2" or "xz".
+        """
+        self.initialize()
+        flag = _get_tar_compression_flag(compression)
+        node_path_str = shlex.quote(str(self._purepath_to_str(node_path, False)))
+        channel = self._open_channel(
+            f"mkdir -p {node_path_str} && "
+            f"tar -x{flag}pf - --no-same-owner -C {node_path_str}"
+        )
+        names: List[str] = []
+
+        def _filter(member: tarfile.TarInfo) -> tarfile.TarInfo:
+            if not member.isdir():
+                names.append(posixpath.normpath(member.name))
+            return member
+
+        try:
+            with channel.makefile("wb") as stream:
+                with tarfile.open(
+                    fileobj=stream, mode=_TAR_WRITE_MODES[compression]
+                ) as tar:
+                    tar.add(str(local_path), arcname=".", filter=_filter)
+        except OSError:
+            # tar on node may fail and close the channel. The error is raised
+            # by the exit code below.
+            pass
+        channel.shutdown_write()
+        self._check_channel(channel, f"copy {local_path} to {node_path}")
+        return names
+
+    def copy_tree_back(
+        self, node_path: PurePath, local_path: PurePath, compression: str = ""
+    ) -> List[str]:
+        """
+        Download the directory of node to local_path by a tar stream on one
+        channel. It returns relative paths of copied files.
+            compression: "", "gz", "bz2" or "xz".
+        """
+        self.initialize()
+        flag = _get_tar_compression_flag(compression)
+        node_path_str = shlex.quote(str(self._purepath_to_str(node_path, False)))
+        channel = self._open_channel(f"tar -c{flag}f - -C {node_path_str} .")
+        names: List[str] = []
+
+        def _members(tar: tarfile.TarFile) -> Iterator[tarfile.TarInfo]:
+            for member in tar:
+                if not member.isdir():
+                    names.append(posixpath.normpath(member.name))
+                yield member
+
+        Path(local_path).mkdir(parents=True, exist_ok=True)
+        try:
+            with channel.makefile("rb") as stream:
+                with tarfile.open(
+                    fileobj=stream, mode=_TAR_READ_MODES[compression]
+                ) as tar:
+                    tar.extractall(
+                        str(local_path), members=_members(tar), **_TAR_EXTRACT_KWARGS
+                    )
+        except tarfile.ReadError:
+            # an empty stream, if tar fails on node. The error is raised by the
+            # exit code below.
+            pass
+        self._check_channel(channel, f"copy {node_path} to {local_path}")
+        return names
+
+    def _open_channel(self, command: str) -> paramiko.Channel:
+        self.initialize()
+        assert self._transport_pool
+        channel = self._transport_pool.open_session()
+        channel.exec_command(command)
+        return channel
+
+    def _run_channel_command(self, command: str) -> Tuple[int, str]:
+        channel = self._open_channel(command)
+        channel.shutdown_write()
+        output = channel.makefile("rb").read().decode(errors="replace")
+        exit_code = channel.recv_exit_status()
+        channel.close()
+        return exit_code, output
+
+    def _copy_large_file(
+        self, local_path: PurePath, node_path: PurePath, is_upload: bool
+    ) -> None:
+        assert self._transport_pool
+        assert self._hash_command
+        hash_command = self._hash_command
+        sftp = self._transport_pool.open_sftp_client()
+
+        def _open_node_files() -> Tuple[_SftpFiles, Callable[[], None]]:
+            # a new connection for each worker, so they don't share the window
+            # and the cipher thread of a transport.
+            client = self._connect_pool_client()
+            worker_sftp = client.open_sftp()
+
+            def _close() -> None:
+                worker_sftp.close()
+                client.close()
+
+            return (
+                _SftpFiles(worker_sftp, self._run_channel_command, hash_command),
+                _close,
+            )
+
+        try:
+            _ChunkedFileCopy(
+                local_path=str(self._purepath_to_str(local_path, True)),
+                node_path=str(self._purepath_to_str(node_path, False)),
+                is_upload=is_upload,
+                node_files=_SftpFiles(sftp, self._run_channel_command, hash_command),
+                open_node_files=_open_node_files,
+                chunk_size=constants.LARGE_FILE_CHUNK_SIZE,
+                parallel=constants.LARGE_FILE_COPY_PARALLEL,
+            ).run()
+        finally:
+            sftp.close()
+
+    def _check_channel(self, channel: paramiko.Channel, operation: str) -> None:
+        exit_code = channel.recv_exit_status()
+        stderr = channel.makefile_stderr("rb").read().decode(errors="replace")
+        channel.close()
+        if exit_code != 0:
+            raise LisaException(
+                f"failed to {operation}, exit code: {exit_code}, stderr: {stderr}"
+            )
+
     def _purepath_to_str(
         self, path: Union[Path, PurePath, str], is_local: bool = False
     ) -> Union[Path, PurePath, str]:
@@ -626,82 +1854,54 @@ class SshShell(InitializableMixin):
                 path = str(PureWindowsPath(path))
         return path
 
-    def _establish_jump_boxes(self, address: str, port: int) -> Any:
-        jump_boxes_runbook = development.get_jump_boxes()
-        sock: Any = None
-        is_trace_enabled = development.is_trace_enabled()
-        if is_trace_enabled:
-            jb_logger = _get_jump_box_logger()
-            jb_logger.debug(f"proxy sock: {sock}")
-
-        for index, runbook in enumerate(jump_boxes_runbook):
-            if is_trace_enabled:
-                jb_logger.debug(f"creating connection from source: {runbook} ")
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
-            client.connect(
-                hostname=runbook.address,
-                port=runbook.port,
-                username=runbook.username,
-                password=runbook.password,
-                key_filename=runbook.private_key_file,
-                banner_timeout=10,
-                sock=sock,
-            )
-
-            if index < len(jump_boxes_runbook) - 1:
-                next_hop = jump_boxes_runbook[index + 1]
-                dest_address = (
-                    next_hop.private_address
-                    if next_hop.private_address
-                    else next_hop.address
-                )
-                dest_port = (
-                    next_hop.private_port if next_hop.private_port else next_hop.port
-                )
-            else:
-                dest_address = address
-                dest_port = port
-
-            if is_trace_enabled:
-                jb_logger.debug(f"next hop: {dest_address}:{dest_port}")
-            sock = self._open_jump_box_channel(
-                client,
-                src_address=runbook.address,
-                src_port=runbook.port,
-                dest_address=dest_address,
-                dest_port=dest_port,
-            )
-            self._jump_boxes.append(client)
-
-        return sock
+    def _acquire_session(self, is_root: bool) -> Optional[SshSession]:
+        with self._session_lock:
+            session = self._sessions.get(is_root)
+            if not session or not session.is_alive:
+                if is_root in self._failed_sessions:
+                    return None
+                assert self._transport_pool
+                session = SshSession(kill=self._run_kill, is_root=is_root)
+                if not session.start(self._transport_pool.open_session()):
+                    # like sudo needs a password, so don't try again.
+                    session.close()
+                    self._failed_sessions.add(is_root)
+                    return None
+                self._sessions[is_root] = session
+        return session if session.try_acquire() else None
+
+    def _run_kill(self, command: List[str]) -> None:
+        assert self._inner_shell
+        self._inner_shell.run(command=command, allow_error=True)
 
-    def _open_jump_box_channel(
-        self,
-        client: paramiko.SSHClient,
-        src_address: str,
-        src_port: int,
-        dest_address: str,
-        dest_port: int,
-    ) -> Any:
-        transport = client.get_transport()
-        assert transport
-
-        sock = transport.open_channel(
-            kind="direct-tcpip",
-            src_addr=(src_address, src_port),
-            dest_addr=(dest_address, dest_port),
+    def _open_tunnel(self) -> Any:
+        """
+        Return a direct-tcpip channel to the node on shared jump boxes, or None
+        if there is no jump box.
+        """
+        jump_boxes = development.get_jump_boxes()
+        if not jump_boxes:
+            return None
+        return _jump_box_pool.open_channel(
+            jump_boxes,
+            dest_address=self.connection_info.address,
+            dest_port=self.connection_info.port,
         )
 
-        return sock
-
-    def _close_jump_boxes(self) -> None:
-        for index in reversed(range(len(self._jump_boxes))):
-            self._jump_boxes[index].close()
-            self._jump_boxes[index] = None
-
-        self._jump_boxes.clear()
-        self._jump_box_sock = None
+    def _connect_pool_client(self) -> paramiko.SSHClient:
+        sock = self._open_tunnel()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.MissingHostKeyPolicy())
+        client.connect(
+            hostname=self.connection_info.address,
+            port=self.connection_info.port,
+            username=self.connection_info.username,
+            password=self.connection_info.password,
+            key_filename=self.connection_info.private_key_file,
+            banner_timeout=10,
+            sock=sock,
+        )
+        return client
 
 
 class LocalShell(InitializableMixin):
@@ -736,17 +1936,27 @@ class LocalShell(InitializableMixin):
         use_pty: bool = False,
         allow_error: bool = False,
     ) -> spur.local.LocalProcess:
-        return self._inner_shell.spawn(
+        # with pty, spur reads output at once, so it's not replaced.
+        is_captured = not use_pty and _is_captured(stdout, stderr)
+        process = self._inner_shell.spawn(
             command=command,
             update_env=update_env,
             store_pid=store_pid,
             cwd=cwd,
-            stdout=stdout,
-            stderr=stderr,
+            stdout=None if is_captured else stdout,
+            stderr=None if is_captured else stderr,
             encoding=encoding,
             use_pty=use_pty,
             allow_error=allow_error,
         )
+        if is_captured:
+            _capture_process_output(
+                process,
+                [process._subprocess.stdout, process._subprocess.stderr],
+                [stdout, stderr],
+                encoding,
+            )
+        return process
 
     def mkdir(
         self,
@@ -869,6 +2079,37 @@ class LocalShell(InitializableMixin):
         """
         self.copy(local_path=node_path, node_path=local_path)
 
+    @property
+    def is_tree_copy_supported(self) -> bool:
+        return True
+
+    def copy_tree(
+        self, local_path: PurePath, node_path: PurePath, compression: str = ""
+    ) -> List[str]:
+        """
+        Copy the directory with permissions and symlinks. compression is
+        ignored on local.
+        """
+        shutil.copytree(local_path, node_path, symlinks=True, dirs_exist_ok=True)
+        names: List[str] = []
+        for root, dirs, files in os.walk(local_path):
+            relative_root = Path(root).relative_to(local_path)
+            names.extend((relative_root / x).as_posix() for x in files)
+            # symlinks to directories are copied as symlinks.
+            names.extend(
+                (relative_root / x).as_posix()
+                for x in dirs
+                if os.path.islink(os.path.join(root, x))
+            )
+        return names
+
+    def copy_tree_back(
+        self, node_path: PurePath, local_path: PurePath, compression: str = ""
+    ) -> List[str]:
+        return self.copy_tree(
+            local_path=node_path, node_path=local_path, compression=compression
+        )
+
 
 class WslShell(InitializableMixin):
     def __init__(self, parent: "Shell", distro_name: str) -> None:
@@ -917,6 +2158,11 @@ class WslShell(InitializableMixin):
 
         self._parent.remove(host_temp_file)
 
+    @property
+    def is_tree_copy_supported(self) -> bool:
+        # files are copied through the temp folder of Windows one by one.
+        return False
+
     def _initialize(self, *args: Any, **kwargs: Any) -> None:
         return self._parent._initialize(*args, **kwargs)
 
@@ -157,9 +157,10 @@ class KvmUnitTests(Tool):
         git.clone(self.repo, self.get_tool_path(use_global=True))
 
         # install dependency packages
-        for package in list(self.deps):
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        with posix_os.package_transaction():
+            for package in list(self.deps):
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
 
     def _install(self) -> bool:
         self._log.debug("Building kvm-unit-tests")
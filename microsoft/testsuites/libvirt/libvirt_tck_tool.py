@@ -119,9 +119,10 @@ class LibvirtTck(Tool):
         git.clone(self.repo, self.get_tool_path(use_global=True), fail_on_exists=False)
 
         # install dependency packages
-        for package in list(self.deps):
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        with posix_os.package_transaction():
+            for package in list(self.deps):
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
 
     def _install(self) -> bool:
         self._install_dep()
@@ -27,6 +27,7 @@ from lisa.tools import (
     Rm,
     Swap,
     Sysctl,
+    ToolArtifact,
 )
 from lisa.util import LisaException, find_patterns_in_lines
 
@@ -326,6 +327,13 @@ class Ltp(Tool):
         sysctl.write("vm.dirty_background_ratio", "5")
         sysctl.run("-p")
 
+        # the build is cached by the tag, so later nodes of the same distro
+        # don't build again.
+        self.node.tools[ToolArtifact].install(self.name, self._git_tag, self._build)
+
+        return self._check_exists()
+
+    def _build(self, destdir: PurePath) -> None:
         # find partition to install ltp
         build_dir = self.node.find_partition_with_freespace(
             self.BUILD_REQUIRED_DISK_SIZE_IN_GB
@@ -359,9 +367,7 @@ class Ltp(Tool):
 
         # Specify SKIP_IDCHECK=1 since we don't want to modify /etc/{group,passwd}
         # on the remote system's sysroot
-        make.make_install(ltp_path, "SKIP_IDCHECK=1", sudo=True)
-
-        return self._check_exists()
+        make.make_install(ltp_path, "SKIP_IDCHECK=1", sudo=True, destdir=destdir)
 
     def _parse_results(
         self,
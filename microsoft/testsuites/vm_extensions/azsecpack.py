@@ -177,7 +177,9 @@ class AzSecPack(TestSuite):
         # After Azure Monitor Linux Agent extension is installed, the package
         # azuremonitoragent should be installed.
         posix_os: Posix = cast(Posix, node.os)
-        assert_that(posix_os.package_exists("azuremonitoragent")).described_as(
+        # it's installed by the extension, so query it again.
+        is_installed = posix_os.package_exists("azuremonitoragent", use_cached=False)
+        assert_that(is_installed).described_as(
             "Expected the azuremonitoragent package to be installed"
         ).is_equal_to(True)
 
@@ -210,7 +212,7 @@ class AzSecPack(TestSuite):
         while loop_count < 10:
             result = True
             for package in azsec_packages:
-                result = posix_os.package_exists(package) and result
+                result = posix_os.package_exists(package, use_cached=False) and result
                 if result is False:
                     log.info(f"{package} is not installed successfully")
                     break
@@ -206,13 +206,14 @@ class Xfstests(Tool):
 
         # if install the packages in one command, the remain available packages can't
         # be installed if one of packages is not available in that distro,
-        # so here install it one by one
-        for package in list(package_list):
-            # to make code simple, put all packages needed by one distro in one list.
-            # the package name may be different for the different sku of the
-            #  same distro. so, install it when the package exists in the repo.
-            if posix_os.is_package_in_repo(package):
-                posix_os.install_packages(package)
+        # so here check them one by one, and install available ones together.
+        with posix_os.package_transaction():
+            for package in list(package_list):
+                # to make code simple, put all packages needed by one distro in one
+                # list. the package name may be different for the different sku of
+                # the same distro. so, install it when the package exists in the repo.
+                if posix_os.is_package_in_repo(package):
+                    posix_os.install_packages(package)
         # fix compile issue on RHEL/CentOS 7.x
         if (
             isinstance(self.node.os, Redhat)
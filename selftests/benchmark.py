@@ -0,0 +1,17 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+Benchmarks take minutes, so they are skipped, unless the LISA_BENCHMARK
+environment variable is set. Results are logged by the benchmark logger.
+"""
+
+import os
+from unittest import skipUnless
+
+from lisa.util.logger import get_logger
+
+benchmark = skipUnless(
+    os.environ.get("LISA_BENCHMARK"), "set LISA_BENCHMARK to run benchmarks."
+)
+benchmark_log = get_logger("benchmark")
@@ -0,0 +1,404 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+"""
+A minimal SSH server on paramiko for selftests. It runs exec requests by the
+local sh, and serves SFTP on the local file system, so SshShell can be tested
+without a sshd on the test machine.
+"""
+
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import paramiko
+
+USER_NAME = "lisa_test"
+PASSWORD = "lisa_test_password"
+_CLOSE_DELAY = 1
+
+_host_key: Optional[paramiko.RSAKey] = None
+_host_key_lock = threading.Lock()
+
+
+def _get_host_key() -> paramiko.RSAKey:
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: "SshServer") -> None:
+        self._server = server
+        self._is_handshake_counted = False
+        # the destinations of direct-tcpip channels by channel id.
+        self.forwarding_destinations: Dict[int, Tuple[str, int]] = {}
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        # the key exchange is counted here, because the server thread may not
+        # be scheduled after start_server, before the client runs commands.
+        self._count_handshake()
+        if username == USER_NAME and password == PASSWORD:
+            with self._server.lock:
+                self._server.auth_count += 1
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def _count_handshake(self) -> None:
+        with self._server.lock:
+            if not self._is_handshake_counted:
+                self._is_handshake_counted = True
+                self._server.handshake_count += 1
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(
+        self, chanid: int, origin: Tuple[str, int], destination: Tuple[str, int]
+    ) -> int:
+        # forwarded channels are connected in the accept loop of the server.
+        with self._server.lock:
+            self.forwarding_destinations[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, *args: Any) -> bool:
+        return True
+
+    def check_channel_exec_request(
+        self, channel: paramiko.Channel, command: bytes
+    ) -> bool:
+        with self._server.lock:
+            self._server.exec_count += 1
+        threading.Thread(
+            target=_run_command, args=(channel, command.decode()), daemon=True
+        ).start()
+        return True
+
+
+class _SftpHandle(paramiko.SFTPHandle):
+    def stat(self) -> Any:
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+
+    def chattr(self, attr: paramiko.SFTPAttributes) -> int:
+        try:
+            paramiko.SFTPServer.set_file_attr(self.filename, attr)
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+        return paramiko.SFTP_OK
+
+
+class _SftpServerInterface(paramiko.SFTPServerInterface):
+    """
+    Serves the local file system, like the SFTP of a sshd.
+    """
+
+    def list_folder(self, path: str) -> Any:
+        try:
+            return [
+                self._get_attributes(os.path.join(path, name), name)
+                for name in os.listdir(path)
+            ]
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+
+    def stat(self, path: str) -> Any:
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+
+    def lstat(self, path: str) -> Any:
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+
+    def open(self, path: str, flags: int, attr: paramiko.SFTPAttributes) -> Any:
+        try:
+            binary_flags = flags | getattr(os, "O_BINARY", 0)
+            fd = os.open(path, binary_flags, attr.st_mode or 0o666)
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _SftpHandle(flags)
+        handle.filename = path
+        file = os.fdopen(fd, mode)
+        handle.readfile = file
+        handle.writefile = file
+        return handle
+
+    def remove(self, path: str) -> int:
+        return self._call(os.remove, path)
+
+    def rename(self, oldpath: str, newpath: str) -> int:
+        return self._call(os.rename, oldpath, newpath)
+
+    def posix_rename(self, oldpath: str, newpath: str) -> int:
+        return self._call(os.replace, oldpath, newpath)
+
+    def mkdir(self, path: str, attr: paramiko.SFTPAttributes) -> int:
+        return self._call(os.mkdir, path, attr.st_mode or 0o777)
+
+    def rmdir(self, path: str) -> int:
+        return self._call(os.rmdir, path)
+
+    def chattr(self, path: str, attr: paramiko.SFTPAttributes) -> int:
+        return self._call(paramiko.SFTPServer.set_file_attr, path, attr)
+
+    def symlink(self, target_path: str, path: str) -> int:
+        return self._call(os.symlink, target_path, path)
+
+    def readlink(self, path: str) -> Any:
+        try:
+            return os.readlink(path)
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+
+    def _get_attributes(self, path: str, name: str) -> paramiko.SFTPAttributes:
+        attributes = paramiko.SFTPAttributes.from_stat(os.lstat(path))
+        attributes.filename = name
+        return attributes
+
+    def _call(self, function: Any, *args: Any) -> int:
+        try:
+            function(*args)
+        except OSError as identifier:
+            return paramiko.SFTPServer.convert_errno(identifier.errno)
+        return paramiko.SFTP_OK
+
+
+def _pump(source: Any, send: Any) -> None:
+    while True:
+        data = source.read1(32768)
+        if not data:
+            break
+        send(data)
+
+
+def _run_command(channel: paramiko.Channel, command: str) -> None:
+    process = subprocess.Popen(
+        ["sh", "-c", command],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    def _write_stdin() -> None:
+        assert process.stdin
+        try:
+            while True:
+                data = channel.recv(32768)
+                if not data:
+                    break
+                process.stdin.write(data)
+                process.stdin.flush()
+        except (OSError, EOFError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    threading.Thread(target=_write_stdin, daemon=True).start()
+    stderr_thread = threading.Thread(
+        target=_pump, args=(process.stderr, channel.sendall_stderr), daemon=True
+    )
+    stderr_thread.start()
+    try:
+        _pump(process.stdout, channel.sendall)
+        stderr_thread.join()
+        channel.send_exit_status(process.wait())
+        channel.shutdown_write()
+    except (OSError, EOFError):
+        process.kill()
+    finally:
+        # The reply of exec request is sent after the server interface returns,
+        # so a fast command may end before it. The client fails on a closed
+        # channel before the reply, so close the channel a little later. The
+        # EOF and exit status are sent already, so the client isn't delayed.
+        timer = threading.Timer(_CLOSE_DELAY, channel.close)
+        timer.daemon = True
+        timer.start()
+
+
+def _forward(channel: paramiko.Channel, destination: Tuple[str, int]) -> None:
+    try:
+        target = socket.create_connection(destination, timeout=10)
+    except OSError:
+        channel.close()
+        return
+    target.settimeout(None)
+
+    def _send_back() -> None:
+        _pump(target.makefile("rb"), channel.sendall)
+        channel.close()
+
+    threading.Thread(target=_send_back, daemon=True).start()
+    try:
+        while True:
+            data = channel.recv(32768)
+            if not data:
+                break
+            target.sendall(data)
+    except (OSError, EOFError):
+        pass
+    finally:
+        try:
+            target.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def _delay_bytes(
+    source: socket.socket, destination: socket.socket, latency: float
+) -> None:
+    packets: "queue.Queue[Tuple[float, bytes]]" = queue.Queue()
+
+    def _send() -> None:
+        while True:
+            due_time, data = packets.get()
+            time.sleep(max(0, due_time - time.monotonic()))
+            try:
+                if not data:
+                    destination.shutdown(socket.SHUT_WR)
+                    break
+                destination.sendall(data)
+            except OSError:
+                break
+
+    threading.Thread(target=_send, daemon=True).start()
+    while True:
+        try:
+            data = source.recv(65536)
+        except OSError:
+            data = b""
+        packets.put((time.monotonic() + latency, data))
+        if not data:
+            break
+
+
+class SshServer:
+    """
+    Listens on a random local port. handshake_count counts completed key
+    exchanges, auth_count counts successful authentications, and exec_count
+    counts commands, which are round trips. latency is the round trip time
+    in seconds, which is added to connections. direct-tcpip channels are
+    forwarded, so the server can be a jump box.
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self.lock = threading.Lock()
+        self._latency = latency
+        self.handshake_count = 0
+        self.auth_count = 0
+        self.exec_count = 0
+        self._transports: List[paramiko.Transport] = []
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(100)
+        self.address, self.port = self._socket.getsockname()
+        self._is_closed = False
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+
+    def __enter__(self) -> "SshServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._is_closed = True
+        self._socket.close()
+        with self.lock:
+            transports = list(self._transports)
+        for transport in transports:
+            transport.close()
+
+    def close_connections(self) -> None:
+        """
+        Drop all connections, like a reboot of the server.
+        """
+        with self.lock:
+            transports = list(self._transports)
+            self._transports.clear()
+        for transport in transports:
+            transport.close()
+
+    def _add_latency(self, client: socket.socket) -> socket.socket:
+        # bytes are delayed in both directions, like a link with long round
+        # trips. The bandwidth isn't limited.
+        server_side, link_side = socket.socketpair()
+        for source, destination in [(client, link_side), (link_side, client)]:
+            threading.Thread(
+                target=_delay_bytes,
+                args=(source, destination, self._latency / 2),
+                daemon=True,
+            ).start()
+        return server_side
+
+    def _accept(self) -> None:
+        while not self._is_closed:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        # sshd sets TCP_NODELAY on sessions, so small writes aren't delayed.
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self._latency:
+            client = self._add_latency(client)
+        transport = paramiko.Transport(client)
+        transport.add_server_key(_get_host_key())
+        transport.set_subsystem_handler(
+            "sftp", paramiko.SFTPServer, _SftpServerInterface
+        )
+        server_interface = _ServerInterface(self)
+        try:
+            transport.start_server(server=server_interface)
+        except (paramiko.SSHException, EOFError, OSError):
+            # TCP probes close the socket without SSH handshakes.
+            transport.close()
+            return
+        with self.lock:
+            self._transports.append(transport)
+        # keep accepting until the transport is closed. Exec requests are
+        # handled in the server interface. Accepted channels are referenced,
+        # because paramiko closes a channel when it's garbage collected.
+        channels: List[paramiko.Channel] = []
+        while transport.is_active():
+            channel = transport.accept(timeout=1)
+            if channel:
+                channels.append(channel)
+                with self.lock:
+                    destination = server_interface.forwarding_destinations.pop(
+                        channel.get_id(), None
+                    )
+                if destination:
+                    threading.Thread(
+                        target=_forward, args=(channel, destination), daemon=True
+                    ).start()
+            channels = [x for x in channels if not x.closed]
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.util import LisaException
+from lisa.util.artifact_store import ArtifactStore, get_file_hash
+
+
+class ArtifactStoreTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._temp_dir.name)
+        self._store = ArtifactStore(self._path / "store")
+        self._key = ArtifactStore.create_key(
+            "ntttcp", "Ubuntu_22.04_x86_64", "refs/heads/main"
+        )
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_create_key(self) -> None:
+        assert_that(self._key).is_equal_to("ntttcp/Ubuntu_22.04_x86_64/refs_heads_main")
+        assert_that(ArtifactStore.create_key("a b", "")).is_equal_to("a_b/_")
+
+    def test_put_get(self) -> None:
+        assert_that(self._store.get(self._key)).is_none()
+
+        source = self._create_file("source", b"built")
+        checksum = get_file_hash(source)
+        self._store.put(self._key, source, checksum)
+        assert_that(source.exists()).is_false()
+
+        artifact = self._store.get(self._key)
+        assert artifact
+        assert_that(artifact[0].read_bytes()).is_equal_to(b"built")
+        assert_that(artifact[1]).is_equal_to(checksum)
+
+    def test_broken_artifact(self) -> None:
+        # a file, which is broken on copying, is not saved.
+        source = self._create_file("source", b"broken")
+        with self.assertRaises(LisaException):
+            self._store.put(self._key, source, get_file_hash(Path(__file__)))
+        assert_that(self._store.get(self._key)).is_none()
+
+        # a broken artifact is removed, so it's built again.
+        source = self._create_file("source", b"built")
+        artifact_path = self._store.put(self._key, source, get_file_hash(source))
+        artifact_path.write_bytes(b"changed")
+        assert_that(self._store.get(self._key)).is_none()
+        assert_that(artifact_path.exists()).is_false()
+
+    def _create_file(self, name: str, content: bytes) -> Path:
+        path = self._path / name
+        path.write_bytes(content)
+        return path
@@ -0,0 +1,84 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import os
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.util.download_cache import DownloadCache
+from lisa.util.logger import get_logger
+
+
+class _FileHandler(SimpleHTTPRequestHandler):
+    # the status codes of responses.
+    statuses: List[int] = []
+
+    def send_response(self, code: int, message: Any = None) -> None:
+        self.statuses.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        ...
+
+
+class DownloadCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self._temp_dir.name)
+        self._file_path = root / "files" / "driver.tar.gz"
+        self._file_path.parent.mkdir()
+        self._file_path.write_bytes(b"driver")
+        _FileHandler.statuses = []
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            partial(_FileHandler, directory=str(self._file_path.parent)),
+        )
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._url = f"http://127.0.0.1:{self._server.server_port}/driver.tar.gz"
+        self._cache = DownloadCache(root / "cache", 1024)
+        self._log = get_logger("download_cache_test")
+
+    def tearDown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._temp_dir.cleanup()
+
+    def test_validated_download(self) -> None:
+        for _ in range(2):
+            path = self._cache.get(self._url, self._log)
+            assert path
+            assert_that(path.read_bytes()).is_equal_to(b"driver")
+        # the cached file is validated by Last-Modified.
+        assert_that(_FileHandler.statuses).is_equal_to([200, 304])
+
+        # a changed file is downloaded again.
+        self._file_path.write_bytes(b"driver 2")
+        modified_time = self._file_path.stat().st_mtime + 10
+        os.utime(self._file_path, (modified_time, modified_time))
+        path = self._cache.get(self._url, self._log)
+        assert path
+        assert_that(path.read_bytes()).is_equal_to(b"driver 2")
+        assert_that(self._cache.metrics["size"]).is_equal_to(8)
+
+    def test_unreachable_url(self) -> None:
+        missing_url = self._url.replace("driver", "missing")
+        assert_that(self._cache.get(missing_url, self._log)).is_none()
+
+        self._cache.get(self._url, self._log)
+        self._server.shutdown()
+        self._server.server_close()
+        # the cached file is used, if the url is unreachable.
+        path = self._cache.get(self._url, self._log)
+        assert path
+        assert_that(path.read_bytes()).is_equal_to(b"driver")
+
+    def test_size_limit(self) -> None:
+        self._file_path.write_bytes(b"d" * 2048)
+        assert_that(self._cache.get(self._url, self._log)).is_none()
@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+from time import sleep
+from typing import List
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.util.facts import EVENT_DIRTY, EVENT_NIC, EVENT_PACKAGE, EVENT_REBOOT, Facts
+
+
+class FactsTestCase(TestCase):
+    def test_get(self) -> None:
+        facts = Facts()
+        calls = []
+
+        def _factory() -> int:
+            calls.append(1)
+            return len(calls)
+
+        assert_that(facts.get("key", _factory)).is_equal_to(1)
+        assert_that(facts.get("key", _factory)).is_equal_to(1)
+        assert_that(facts.get("key", _factory, force=True)).is_equal_to(2)
+        assert_that(facts.metrics).is_equal_to(
+            {"hit": 1, "miss": 2, "eviction": 0, "size": 1}
+        )
+
+    def test_ttl(self) -> None:
+        facts = Facts()
+        facts.set("short", 1, ttl=0.1)
+        facts.set("long", 2)
+        sleep(0.2)
+
+        assert_that(facts.peek("short")).is_none()
+        assert_that(facts.peek("long")).is_equal_to(2)
+        assert_that(facts).is_length(1)
+
+    def test_limit(self) -> None:
+        facts = Facts(limit=2)
+        facts.set("a", 1)
+        facts.set("b", 2)
+        # "a" is used recently, so "b" is evicted.
+        facts.peek("a")
+        facts.set("c", 3)
+
+        assert_that(facts.peek("b")).is_none()
+        assert_that([facts.peek("a"), facts.peek("c")]).is_equal_to([1, 3])
+        assert_that(facts.eviction_count).is_equal_to(1)
+
+    def test_events(self) -> None:
+        facts = Facts()
+        facts.set("os.information", "ubuntu")
+        facts.set("os.package.curl", "7.0", events=[EVENT_PACKAGE])
+
+        facts.notify(EVENT_PACKAGE)
+        assert_that(facts.peek("os.package.curl")).is_none()
+        assert_that(facts.peek("os.information")).is_equal_to("ubuntu")
+
+        for event in [EVENT_REBOOT, EVENT_DIRTY]:
+            facts.set("os.information", "ubuntu")
+            facts.notify(event)
+            assert_that(facts).is_length(0)
+
+    def test_listener(self) -> None:
+        facts = Facts()
+        events: List[str] = []
+        facts.add_listener(events.append)
+        facts.set("os.information", "ubuntu")
+
+        facts.notify(EVENT_NIC)
+        assert_that(facts.peek("os.information")).is_equal_to("ubuntu")
+        facts.notify(EVENT_REBOOT)
+        assert_that(events).is_equal_to([EVENT_NIC, EVENT_REBOOT])
+
+    def test_invalidate(self) -> None:
+        facts = Facts()
+        facts.set("tool.lscpu.a", 1)
+        facts.set("tool.lscpu.b", 2)
+        facts.set("tool.lsblk.a", 3)
+
+        facts.invalidate("tool.lscpu.")
+        assert_that(facts).is_length(1)
+        facts.invalidate()
+        assert_that(facts).is_length(0)
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import logging
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.util.logger import QueuedFileHandler, get_logger
+
+
+class QueuedFileLogTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._path = Path(self._temp_dir.name)
+
+    def tearDown(self) -> None:
+        self._temp_dir.cleanup()
+
+    def test_routing_and_order(self) -> None:
+        first_log = get_logger("queued", "first")
+        second_log = get_logger("queued", "second")
+        first_handler = self._add_handler(first_log, "first.log")
+        second_handler = self._add_handler(second_log, "second.log")
+
+        for index in range(2000):
+            first_log.debug("first %s", index)
+            second_log.debug(f"second {index}")
+
+        self._remove_handler(first_handler, first_log)
+        self._remove_handler(second_handler, second_log)
+
+        first_lines = (self._path / "first.log").read_text().splitlines()
+        second_lines = (self._path / "second.log").read_text().splitlines()
+        assert_that(first_lines).is_equal_to([f"first {x}" for x in range(2000)])
+        assert_that(second_lines).is_equal_to([f"second {x}" for x in range(2000)])
+
+    def test_args_merged_on_logging_thread(self) -> None:
+        log = get_logger("queued", "args")
+        handler = self._add_handler(log, "args.log")
+        values = ["before"]
+        log.debug("value: %s", values)
+        values[0] = "after"
+        self._remove_handler(handler, log)
+
+        content = (self._path / "args.log").read_text()
+        assert_that(content).is_equal_to("value: ['before']\n")
+
+    def _add_handler(self, log: logging.Logger, name: str) -> QueuedFileHandler:
+        handler = QueuedFileHandler(self._path / name)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        return handler
+
+    def _remove_handler(self, handler: QueuedFileHandler, log: logging.Logger) -> None:
+        # remove_handler is skipped in unittest, and closing flushes the queue.
+        log.removeHandler(handler)
+        handler.close()
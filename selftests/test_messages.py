@@ -0,0 +1,86 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import copy
+import json
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.messages import (
+    DiskPerformanceMessage,
+    DiskSetupType,
+    TestResultMessage,
+    TestStatus,
+    message_to_json,
+)
+
+# the same fields as TestResultMessage, but without slots.
+_DictTestResultMessage = make_dataclass(
+    "_DictTestResultMessage",
+    [
+        (x.name, x.type, field(default=x.default, default_factory=x.default_factory))
+        for x in fields(TestResultMessage)
+    ],
+)
+
+
+def _measure_memory(factory: Callable[[int], Any], count: int = 10000) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        holder: List[Any] = [factory(index) for index in range(count)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert_that(holder).is_length(count)
+    return after - before
+
+
+class MessagesTestCase(TestCase):
+    def test_no_instance_dict(self) -> None:
+        message = TestResultMessage(id_="1", name="case")
+        assert_that(hasattr(message, "__dict__")).is_false()
+        assert_that(message.type).is_equal_to("TestResult")
+        with self.assertRaises(AttributeError):
+            message.not_a_field = 1  # type: ignore
+
+    def test_deepcopy(self) -> None:
+        message = TestResultMessage(
+            id_="1", status=TestStatus.PASSED, information={"key": "value"}
+        )
+        copied = copy.deepcopy(message)
+        assert_that(copied).is_equal_to(message)
+        assert_that(copied.information).is_not_same_as(message.information)
+        assert_that(copied.is_completed).is_true()
+
+    def test_json_encoder(self) -> None:
+        message = DiskPerformanceMessage(
+            read_iops=Decimal("1.5"), disk_setup_type=DiskSetupType.raid0
+        )
+        encoded = json.loads(message_to_json(message))
+        assert_that(encoded["type"]).is_equal_to("Performance")
+        assert_that(encoded["read_iops"]).is_equal_to(1.5)
+        assert_that(encoded["disk_setup_type"]).is_equal_to("raid0")
+        assert_that(encoded["ip_version"]).is_equal_to("IPv4")
+        assert_that(encoded["time"]).is_equal_to(datetime.min.isoformat())
+
+        # values, which are not supported, are converted to strings.
+        information: Dict[str, Any] = {"tags": {"network"}}
+        result_message = TestResultMessage(information=information)
+        encoded = json.loads(message_to_json(result_message))
+        assert_that(encoded["information"]["tags"]).is_equal_to("{'network'}")
+
+    def test_memory_per_10k_messages(self) -> None:
+        slotted_size = _measure_memory(
+            lambda index: TestResultMessage(id_=str(index), name="case")
+        )
+        dict_size = _measure_memory(
+            lambda index: _DictTestResultMessage(id_=str(index), name="case")
+        )
+        assert_that(slotted_size).is_less_than(dict_size)
@@ -0,0 +1,505 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Any, List, Optional, Tuple, cast
+from unittest import TestCase, skipIf
+
+from assertpy import assert_that
+
+from lisa import schema
+from lisa.base_tools import Wget
+from lisa.node import Node, local_node_connect, quick_connect
+from lisa.operating_system import Linux, OperatingSystem, Posix
+from lisa.tools import Curl, Date, Echo, Reboot, RemoteCopy, ToolArtifact, UploadCache
+from lisa.util import LisaException, constants
+from lisa.util.facts import BOOT_ID_FACT_KEY
+from lisa.util.parallel import run_in_parallel
+from lisa.util.perf_timer import create_timer
+from lisa.util.shell import SshSessionProcess
+from selftests.benchmark import benchmark, benchmark_log
+from selftests.ssh_server import PASSWORD, USER_NAME, SshServer
+
+
+@skipIf(sys.platform == "win32", "the test server runs commands by sh.")
+class RemoteNodeTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._original_log_path = constants.RUN_LOCAL_LOG_PATH
+        self._original_logic_path = constants.RUN_LOGIC_PATH
+        self._original_home = os.environ.get("HOME")
+        constants.RUN_LOCAL_LOG_PATH = Path(self._temp_dir.name)
+        constants.RUN_LOGIC_PATH = PurePath("20240101", "20240101-000000-000")
+        # the test server runs commands locally, so keep the working path of
+        # node in the temp folder.
+        os.environ["HOME"] = self._temp_dir.name
+        self._server = SshServer()
+        self._server.__enter__()
+        self._node = self._connect()
+        self._session_node: Optional[Node] = None
+
+    def tearDown(self) -> None:
+        self._node.close()
+        if self._session_node:
+            self._session_node.close()
+        self._server.close()
+        constants.RUN_LOCAL_LOG_PATH = self._original_log_path
+        constants.RUN_LOGIC_PATH = self._original_logic_path
+        if self._original_home is None:
+            del os.environ["HOME"]
+        else:
+            os.environ["HOME"] = self._original_home
+        self._temp_dir.cleanup()
+
+    def test_execute_batch(self) -> None:
+        exec_count = self._server.exec_count
+        results = self._node.execute_batch(
+            ["echo out; echo err >&2", "exit 3", "printf partial", "sleep 0.2"]
+        )
+
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+        assert_that([x.stdout for x in results]).is_equal_to(["out", "", "partial", ""])
+        assert_that([x.stderr for x in results]).is_equal_to(["err", "", "", ""])
+        assert_that([x.exit_code for x in results]).is_equal_to([0, 3, 0, 0])
+        assert_that(results[3].elapsed).is_between(0.1, 5)
+
+    def test_execute_async_io(self) -> None:
+        async def _run() -> List[Any]:
+            results = await asyncio.gather(
+                self._node.execute_async_io("echo out; echo err >&2", shell=True),
+                self._node.execute_async_io("exit 3", shell=True),
+                self._node.execute_async_io("sleep 10", timeout=1),
+                self._node.tools[Echo].run_aio("hello"),
+                self._node.execute_async_io("exit 1", shell=True, expected_exit_code=0),
+                return_exceptions=True,
+            )
+            return list(results)
+
+        results = asyncio.run(_run())
+
+        assert_that([x.stdout for x in results[:4]]).is_equal_to(
+            ["out", "", "", "hello"]
+        )
+        assert_that(results[0].stderr).is_equal_to("err")
+        assert_that([x.exit_code for x in results[:2]]).is_equal_to([0, 3])
+        assert_that(results[2].is_timeout).is_true()
+        assert_that(results[4]).is_instance_of(AssertionError)
+
+    def test_command_existence_probe(self) -> None:
+        node = self._connect()
+        try:
+            # warm up checks of bash prompt and sudo.
+            node.execute("true")
+            assert_that(node.support_sudo).is_false()
+            # tools, which are used on the node.
+            node.tools[Echo]
+            node.tools[Date]
+
+            node.mark_dirty()
+            exec_count = self._server.exec_count
+            existences = [
+                node.tools.command_exists(x) for x in ["echo", "date", "no_such"]
+            ]
+            # commands of used tools are probed together, and the unknown one
+            # is probed alone.
+            assert_that(self._server.exec_count - exec_count).is_equal_to(2)
+            assert_that(existences).is_equal_to(
+                [(True, False), (True, False), (False, False)]
+            )
+
+            node.mark_dirty()
+            node.tools.command_exists("date")
+            node.tools.command_exists("echo")
+            assert_that(self._server.exec_count - exec_count).is_equal_to(3)
+        finally:
+            node.close()
+
+    def test_tool_results_in_facts(self) -> None:
+        echo = self._node.tools[Echo]
+        echo.run("hello")
+        exec_count = self._server.exec_count
+        assert_that(echo.run("hello").stdout).is_equal_to("hello")
+        assert_that(self._server.exec_count - exec_count).is_equal_to(0)
+
+        # results may be changed on the dirty node.
+        self._node.mark_dirty()
+        echo.run("hello")
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+        assert_that(self._node.facts.hit_count).is_greater_than(0)
+
+    def test_os_detection_cache(self) -> None:
+        self._node.initialize()
+        exec_count = self._server.exec_count
+        # the boot id is known in the detection, so nothing runs.
+        detected_os = OperatingSystem.create(self._node)
+        assert_that(self._server.exec_count - exec_count).is_equal_to(0)
+        assert_that(detected_os.name).is_equal_to(self._node.os.name)
+
+        # only the boot id is read on reconnecting.
+        self._node.facts.invalidate()
+        OperatingSystem.create(self._node)
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+
+        # detect again, if the node is rebooted.
+        self._node.facts.set(BOOT_ID_FACT_KEY, "rebooted")
+        detected_os = OperatingSystem.create(self._node)
+        assert_that(self._server.exec_count - exec_count).is_equal_to(2)
+        assert_that(detected_os.name).is_equal_to(self._node.os.name)
+        assert_that(self._node.facts.peek(BOOT_ID_FACT_KEY)).is_not_equal_to("rebooted")
+
+    @skipIf(not shutil.which("dpkg-query"), "the package inventory is of dpkg.")
+    def test_package_inventory(self) -> None:
+        posix_os = cast(Posix, self._node.os)
+        exec_count = self._server.exec_count
+        packages = ["dpkg", "no-such-package", "dpkg=1.0"]
+        assert_that(posix_os.packages_exist(packages[:2])).is_equal_to([True, False])
+        assert_that(posix_os.package_exists("dpkg")).is_true()
+        # the inventory is loaded once.
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+
+        # update in place, and missing packages are queried again, because
+        # dependencies may be installed.
+        inventory = posix_os.get_package_inventory()
+        inventory.add(packages[1:])
+        assert_that(inventory.packages).contains_key("no-such-package")
+        inventory.remove(["no-such-package"])
+        assert_that(posix_os.packages_exist(packages[:2])).is_equal_to([True, False])
+        assert_that(self._server.exec_count - exec_count).is_equal_to(2)
+
+    def test_package_transaction(self) -> None:
+        posix_os = Linux(self._node)
+        installed: List[List[str]] = []
+
+        def _install_packages(packages: List[str], *args: Any) -> None:
+            installed.append(packages)
+            if "bad" in packages:
+                raise LisaException(f"failed to install {packages}")
+
+        setattr(posix_os, "_install_packages", _install_packages)
+        with posix_os.package_transaction():
+            posix_os.install_packages("a")
+            with posix_os.package_transaction():
+                posix_os.install_packages(["b", "a"])
+            assert_that(installed).is_empty()
+        assert_that(installed).is_equal_to([["a", "b"]])
+
+        # fall back to install packages one by one.
+        installed.clear()
+        with self.assertRaises(LisaException):
+            with posix_os.package_transaction():
+                posix_os.install_packages(["a", "bad", "b"])
+        assert_that(installed).is_equal_to([["a", "bad", "b"], ["a"], ["bad"], ["b"]])
+
+        # installs in other threads are not deferred into the transaction.
+        installed.clear()
+        with posix_os.package_transaction():
+            thread = threading.Thread(target=posix_os.install_packages, args=["c"])
+            thread.start()
+            thread.join()
+            assert_that(installed).is_equal_to([["c"]])
+            posix_os.install_packages("a")
+        assert_that(installed).is_equal_to([["c"], ["a"]])
+
+    def test_persistent_session(self) -> None:
+        node = self._connect_session_node()
+        exec_count = self._server.exec_count
+        results = [
+            node.execute("echo out; echo err >&2", shell=True),
+            node.execute("exit 3", shell=True),
+            node.execute("pwd", cwd=PurePosixPath("/")),
+            node.execute("no_such_command"),
+        ]
+
+        assert_that(self._server.exec_count - exec_count).is_equal_to(0)
+        # stderr is merged into stdout, like commands with pty.
+        assert_that([x.stdout for x in results[:3]]).is_equal_to(["out\nerr", "", "/"])
+        assert_that([x.exit_code for x in results]).is_equal_to([0, 3, 0, 1])
+
+    def test_persistent_session_fallback(self) -> None:
+        node = self._connect_session_node()
+        exec_count = self._server.exec_count
+        process = node.execute_async("sleep 10", nohup=True)
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+        process.kill()
+        process.wait_result(timeout=10)
+
+        process = node.execute_async("sleep 10")
+        # the result of a timeout doesn't wait the killed command, so wait it
+        # here. The session is released before the command exits.
+        session_process = process._process
+        assert_that(session_process).is_instance_of(SshSessionProcess)
+        result = process.wait_result(timeout=1)
+        assert_that(result.is_timeout).is_true()
+        assert_that(cast(SshSessionProcess, session_process).wait(10)).is_true()
+        exec_count = self._server.exec_count
+        result = node.execute("echo hello")
+        assert_that(result.stdout).is_equal_to("hello")
+        assert_that(self._server.exec_count - exec_count).is_equal_to(0)
+
+    def test_persistent_session_background_child(self) -> None:
+        node = self._connect_session_node()
+        child_file = Path(self._temp_dir.name) / "child.txt"
+        exec_count = self._server.exec_count
+        result = node.execute(
+            f"(sleep 1; echo background > {child_file}) & echo first", shell=True
+        )
+        assert_that(result.stdout).is_equal_to("first")
+        # the command with a background job runs on a new channel.
+        assert_that(self._server.exec_count - exec_count).is_equal_to(1)
+
+        # the background child isn't killed, and it doesn't write into the
+        # output of the next command.
+        result = node.execute(f"sleep 2; cat {child_file}", shell=True)
+        assert_that(result.stdout).is_equal_to("background")
+
+    @benchmark
+    def test_persistent_session_latency(self) -> None:
+        node = self._connect_session_node()
+        exec_elapsed = self._run_sequential_commands(self._node)
+        session_elapsed = self._run_sequential_commands(node)
+        benchmark_log.info(
+            f"per command latency, exec: {exec_elapsed * 1000:.3f}ms, "
+            f"persistent session: {session_elapsed * 1000:.3f}ms"
+        )
+
+    def test_remote_copy_tree(self) -> None:
+        source = Path(self._temp_dir.name) / "source"
+        for index in range(100):
+            path = source / str(index // 10) / str(index)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(str(index))
+        remote_copy = self._node.tools[RemoteCopy]
+
+        bulk_files = remote_copy.copy_to_remote(
+            source, Path(self._temp_dir.name) / "bulk", recurse=True
+        )
+        sftp_files = remote_copy.copy_to_remote(
+            source, Path(self._temp_dir.name) / "sftp", recurse=True, bulk=False
+        )
+
+        assert_that(bulk_files).is_length(100)
+        bulk_names = sorted(x.relative_to(x.parents[2]) for x in bulk_files)
+        sftp_names = sorted(x.relative_to(x.parents[2]) for x in sftp_files)
+        assert_that(bulk_names).is_equal_to(sftp_names)
+        copied = Path(self._temp_dir.name) / "bulk" / "source" / "9" / "99"
+        assert_that(copied.read_text()).is_equal_to("99")
+
+    def test_upload_cache(self) -> None:
+        source = Path(self._temp_dir.name) / "source"
+        source.mkdir()
+        (source / "run.sh").write_text("echo run")
+        (source / "copy.sh").write_text("echo run")
+        (source / "data.txt").write_text("data")
+        destination = Path(self._temp_dir.name) / "node" / "script"
+        files: List[Tuple[PurePath, PurePath]] = [
+            (source / x, destination / x) for x in ["run.sh", "copy.sh"]
+        ]
+        files.append((source / "data.txt", destination / "data" / "data.txt"))
+        upload_cache = self._node.tools[UploadCache]
+
+        uploaded = upload_cache.upload(files, mode=0o755)
+        # the same content is uploaded once.
+        assert_that(uploaded).is_equal_to([source / "run.sh", source / "data.txt"])
+        assert_that((destination / "copy.sh").read_text()).is_equal_to("echo run")
+        assert_that((destination / "run.sh").stat().st_mode & 0o777).is_equal_to(0o755)
+
+        exec_count = self._server.exec_count
+        assert_that(upload_cache.upload(files)).is_empty()
+        # check the cache and place files.
+        assert_that(self._server.exec_count - exec_count).is_equal_to(2)
+
+        # changes of placed files don't change blobs.
+        (destination / "data" / "data.txt").write_text("changed")
+        (destination / "run.sh").chmod(0o700)
+        assert_that(upload_cache.upload(files)).is_empty()
+        assert_that((destination / "data" / "data.txt").read_text()).is_equal_to("data")
+
+    def test_download_cache(self) -> None:
+        root = Path(self._temp_dir.name)
+        (root / "files").mkdir()
+        (root / "files" / "driver.run").write_text("echo installed $1")
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            partial(SimpleHTTPRequestHandler, directory=str(root / "files")),
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/driver.run"
+        original_cache_path = getattr(constants, "CACHE_PATH", None)
+        constants.CACHE_PATH = root / "cache"
+        constants.DOWNLOAD_CACHE_SIZE = 1024 * 1024
+        try:
+            path = self._node.tools[Wget].get(
+                url, file_path=str(root / "node"), executable=True
+            )
+            output = root / "node" / "curl" / "driver.run"
+            self._node.tools[Curl].fetch(url, f"-o {output}", "")
+            result = self._node.tools[Curl].fetch(url, "-sSf", "-s -- -y", shell=True)
+        finally:
+            constants.DOWNLOAD_CACHE_SIZE = 0
+            if original_cache_path:
+                constants.CACHE_PATH = original_cache_path
+            server.shutdown()
+            server.server_close()
+
+        assert_that(path).is_equal_to(str(root / "node" / "driver.run"))
+        assert_that(os.access(path, os.X_OK)).is_true()
+        assert_that(output.read_text()).is_equal_to("echo installed $1")
+        assert_that(result.stdout).is_equal_to("installed -y")
+
+    def test_tool_artifact(self) -> None:
+        root = Path(self._temp_dir.name)
+        installed = root / "installed" / "hello"
+        builds: List[PurePath] = []
+
+        def _build(staging_path: PurePath) -> None:
+            builds.append(staging_path)
+            self._node.execute(
+                f"mkdir -p {staging_path}{installed.parent} && "
+                f"echo hello > {staging_path}{installed}",
+                shell=True,
+                expected_exit_code=0,
+            )
+
+        original_cache_path = getattr(constants, "CACHE_PATH", None)
+        constants.CACHE_PATH = root / "cache"
+        try:
+            self._node.tools[ToolArtifact].install_from_cache("hello", "1.0", _build)
+            assert_that(builds).is_length(1)
+            assert_that(installed.read_text()).is_equal_to("hello\n")
+
+            # the next node restores the cached artifact, instead of building.
+            installed.unlink()
+            node = self._connect()
+            try:
+                node.tools[ToolArtifact].install_from_cache("hello", "1.0", _build)
+            finally:
+                node.close()
+        finally:
+            if original_cache_path:
+                constants.CACHE_PATH = original_cache_path
+
+        assert_that(builds).is_length(1)
+        assert_that(installed.read_text()).is_equal_to("hello\n")
+
+    def test_reboot_by_boot_id(self) -> None:
+        reboot = self._node.tools[Reboot]
+        # the node doesn't reboot, so the boot id is changed by the test.
+        boot_ids = iter(["before", "before", "before", "after"])
+        setattr(reboot, "_start_reboot", lambda: None)
+        setattr(reboot, "_read_boot_id", lambda: next(boot_ids))
+        # a stale boot id in facts is not used.
+        self._node.facts.set(BOOT_ID_FACT_KEY, "after")
+        self._node.facts.set("test.fact", "value")
+
+        reboot.reboot(time_out=30)
+        assert_that(self._node.facts.peek(BOOT_ID_FACT_KEY)).is_equal_to("after")
+        assert_that(self._node.facts.peek("test.fact")).is_none()
+        assert_that(reboot.metrics["count"]).is_equal_to(1)
+        assert_that(reboot.metrics["last_latency"]).is_less_than(5)
+
+        setattr(reboot, "_read_boot_id", lambda: "after")
+        with self.assertRaises(LisaException):
+            reboot.reboot(time_out=1)
+
+    def _run_sequential_commands(self, node: Node) -> float:
+        count = 200
+        timer = create_timer()
+        for index in range(count):
+            result = node.execute(f"echo {index}", no_info_log=True)
+            assert_that(result.stdout).is_equal_to(str(index))
+        return timer.elapsed() / count
+
+    def _connect_session_node(self) -> Node:
+        self._session_node = self._connect(persistent_session="user")
+        return self._session_node
+
+    def _connect(self, persistent_session: str = "") -> Node:
+        runbook = schema.RemoteNode(
+            name="remote",
+            address=self._server.address,
+            port=self._server.port,
+            public_address=self._server.address,
+            public_port=self._server.port,
+            username=USER_NAME,
+            password=PASSWORD,
+            persistent_session=persistent_session,
+        )
+        return quick_connect(runbook, "remote")
+
+
+@skipIf(sys.platform == "win32", "the commands run on posix only.")
+class NodeFanOutTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._original_log_path = constants.RUN_LOCAL_LOG_PATH
+        self._original_logic_path = constants.RUN_LOGIC_PATH
+        constants.RUN_LOCAL_LOG_PATH = Path(self._temp_dir.name)
+        constants.RUN_LOGIC_PATH = PurePath("20240101", "20240101-000000-000")
+
+    def tearDown(self) -> None:
+        constants.RUN_LOCAL_LOG_PATH = self._original_log_path
+        constants.RUN_LOGIC_PATH = self._original_logic_path
+        self._temp_dir.cleanup()
+
+    def test_fan_out_threads(self) -> None:
+        # nodes are local, so the test doesn't depend on a SSH server, which
+        # runs threads in the same process.
+        count = 50
+        nodes: List[Node] = run_in_parallel(
+            [
+                partial(local_node_connect, index=index, name=f"node-{index}")
+                for index in range(count)
+            ]
+        )
+
+        with _ThreadCounter() as thread_counter:
+            results = run_in_parallel(
+                [partial(x.execute, "sleep 0.5", shell=True) for x in nodes]
+            )
+        assert_that([x.exit_code for x in results]).is_equal_to([0] * count)
+
+        async def _run() -> List[Any]:
+            return await asyncio.gather(
+                *[x.execute_async_io("sleep 0.5", shell=True) for x in nodes]
+            )
+
+        with _ThreadCounter() as aio_counter:
+            results = asyncio.run(_run())
+        assert_that([x.exit_code for x in results]).is_equal_to([0] * count)
+
+        # commands are awaited without a waiting thread for each of them.
+        assert_that(aio_counter.peak_count).is_less_than(thread_counter.peak_count)
+
+
+class _ThreadCounter:
+    """
+    Samples the count of threads, which are started in the block.
+    """
+
+    def __init__(self) -> None:
+        self.peak_count = 0
+        self._stopped = threading.Event()
+
+    def __enter__(self) -> "_ThreadCounter":
+        self._base_count = threading.active_count()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(0.01):
+            # the sampling thread is excluded.
+            count = threading.active_count() - self._base_count - 1
+            self.peak_count = max(self.peak_count, count)
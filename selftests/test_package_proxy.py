@@ -0,0 +1,136 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import socket
+import tempfile
+import threading
+import urllib.request
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List
+from unittest import TestCase
+
+from assertpy import assert_that
+
+from lisa.util.package_proxy import PackageCache, PackageProxy
+
+
+class _RepositoryHandler(SimpleHTTPRequestHandler):
+    requested_paths: List[str] = []
+
+    def do_GET(self) -> None:
+        self.requested_paths.append(self.path)
+        super().do_GET()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        ...
+
+
+class PackageProxyTestCase(TestCase):
+    def setUp(self) -> None:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self._temp_dir.name)
+        # a stand-in repository, which serves a package and metadata.
+        self._repository_path = root / "repository"
+        (self._repository_path / "pool").mkdir(parents=True)
+        (self._repository_path / "pool" / "a.deb").write_bytes(b"a" * 1000)
+        (self._repository_path / "pool" / "b.rpm").write_bytes(b"b" * 1000)
+        (self._repository_path / "pool" / "copy.deb").write_bytes(b"a" * 1000)
+        (self._repository_path / "Release").write_text("release")
+        _RepositoryHandler.requested_paths = []
+        self._repository = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            partial(_RepositoryHandler, directory=str(self._repository_path)),
+        )
+        threading.Thread(target=self._repository.serve_forever, daemon=True).start()
+        self._repository_url = f"http://127.0.0.1:{self._repository.server_port}"
+
+        self._cache_path = root / "cache"
+        self._proxy = PackageProxy(
+            self._cache_path,
+            1500,
+            "127.0.0.1",
+            connect_hosts=[f"127.0.0.1:{self._repository.server_port}"],
+        )
+        self._proxy.start()
+
+    def tearDown(self) -> None:
+        self._proxy.stop()
+        self._repository.shutdown()
+        self._repository.server_close()
+        self._temp_dir.cleanup()
+
+    def test_cached_packages(self) -> None:
+        for _ in range(2):
+            assert_that(self._get("/pool/a.deb")).is_equal_to(b"a" * 1000)
+            assert_that(self._get("/Release")).is_equal_to(b"release")
+
+        # packages are cached, and metadata is passed through.
+        assert_that(_RepositoryHandler.requested_paths).is_equal_to(
+            ["/pool/a.deb", "/Release", "/Release"]
+        )
+        assert_that(self._proxy.metrics["hit"]).is_equal_to(1)
+
+        # the same content is stored once.
+        self._get("/pool/copy.deb")
+        assert_that(self._proxy.cache.size).is_equal_to(1000)
+
+        # the cache is reused after restart.
+        cache = PackageCache(self._cache_path, 1500)
+        assert_that(cache.get(f"{self._repository_url}/pool/copy.deb")).is_not_none()
+
+    def test_eviction(self) -> None:
+        self._get("/pool/a.deb")
+        self._get("/pool/b.rpm")
+        assert_that(self._proxy.metrics["eviction"]).is_equal_to(1)
+        assert_that(self._proxy.cache.size).is_equal_to(1000)
+
+        # the least recently used package is evicted.
+        self._get("/pool/a.deb")
+        assert_that(_RepositoryHandler.requested_paths).is_equal_to(
+            ["/pool/a.deb", "/pool/b.rpm", "/pool/a.deb"]
+        )
+
+    def test_connect_tunnel(self) -> None:
+        with socket.create_connection(("127.0.0.1", self._proxy.port)) as client:
+            port = self._repository.server_port
+            client.sendall(f"CONNECT 127.0.0.1:{port} HTTP/1.1\r\n\r\n".encode())
+            assert_that(client.recv(1024).startswith(b"HTTP/1.1 200")).is_true()
+            client.sendall(b"GET /Release HTTP/1.0\r\n\r\n")
+            response = b""
+            while True:
+                data = client.recv(1024)
+                if not data:
+                    break
+                response += data
+        assert_that(response.endswith(b"release")).is_true()
+
+        # only configured hosts are tunneled, and the default port is 443.
+        for target in ["127.0.0.2:443", "127.0.0.1:22"]:
+            with socket.create_connection(("127.0.0.1", self._proxy.port)) as client:
+                client.sendall(f"CONNECT {target} HTTP/1.1\r\n\r\n".encode())
+                assert_that(client.recv(1024).startswith(b"HTTP/1.1 403")).is_true()
+
+    def test_disallowed_client(self) -> None:
+        proxy = PackageProxy(
+            self._cache_path / "other", 1500, allowed_clients=["10.0.0.0/8"]
+        )
+        proxy.start()
+        try:
+            with socket.create_connection(("127.0.0.1", proxy.port)) as client:
+                client.sendall(b"GET http://127.0.0.1/Release HTTP/1.1\r\n\r\n")
+                # the connection is closed without a response.
+                assert_that(client.recv(1024)).is_empty()
+        finally:
+            proxy.stop()
+
+    def _get(self, path: str) -> bytes:
+        opener = urllib.request.build_opener(
+            urllib.request.ProxyHandler(
+                {"http": f"http://127.0.0.1:{self._proxy.port}"}
+            )
+        )
+        with opener.open(f"{self._repository_url}{path}", timeout=10) as response:
+            content: bytes = response.read()
+        return content
@@ -0,0 +1,197 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import gc
+import logging
+import pickle
+import re
+import sys
+from dataclasses import asdict, replace
+from typing import List
+from unittest import TestCase, skipIf
+
+from assertpy import assert_that
+
+from lisa.util.logger import get_logger
+from lisa.util.perf_timer import create_timer
+from lisa.util.process import BatchCommand, ExecutableResult, OutputBuffer, Process
+from lisa.util.shell import LocalShell
+from selftests.benchmark import benchmark, benchmark_log
+
+
+@skipIf(sys.platform == "win32", "the commands run on posix only.")
+class ProcessTestCase(TestCase):
+    def setUp(self) -> None:
+        self._shell = LocalShell()
+        self._shell.initialize()
+        self._log = get_logger("process_test")
+
+    def test_output(self) -> None:
+        process = self._start("echo hello")
+        result = process.wait_result(timeout=10)
+        assert_that(result.exit_code).is_equal_to(0)
+        assert_that(result.stdout).is_equal_to("hello")
+
+    def test_wait_output(self) -> None:
+        process = self._start("echo started; sleep 0.2; echo done")
+        process.wait_output("started", timeout=10)
+        process.wait_result(timeout=10)
+
+    def test_wait_output_patterns(self) -> None:
+        process = self._start("printf 'rate: 12'; sleep 0.2; echo ' Mbps'; sleep 10")
+        timer = create_timer()
+        matched = process.wait_output(
+            ["not printed", re.compile(r"rate: \d+ \w+")], timeout=10
+        )
+        elapsed = timer.elapsed()
+        process.kill()
+
+        # the match is split by writes.
+        assert_that(matched).is_equal_to("rate: 12 Mbps")
+        assert_that(elapsed).is_less_than(5)
+
+    def test_iter_lines(self) -> None:
+        process = self._start("echo 1; echo 2 >&2; sleep 1; printf 3")
+        on_lines: List[str] = []
+        process.on_line(on_lines.append)
+        timer = create_timer()
+        first = next(process.iter_lines(timeout=10))
+        # the first line arrives before the process exits.
+        assert_that(timer.elapsed()).is_less_than(1)
+        assert_that(first).is_equal_to("1")
+
+        assert_that(list(process.iter_lines(timeout=10))).is_equal_to(["1", "3"])
+        assert_that(list(process.iter_lines(stderr=True))).is_equal_to(["2"])
+        assert_that(on_lines).is_equal_to(["1", "3"])
+        assert_that(process.wait_result().stdout).is_equal_to("1\n3")
+
+    @benchmark
+    def test_sequential_latency(self) -> None:
+        timer = create_timer()
+        for index in range(10000):
+            result = self._start("true", str(index), no_info_log=True).wait_result(
+                timeout=10
+            )
+            assert_that(result.exit_code).is_equal_to(0)
+        elapsed = timer.elapsed()
+        benchmark_log.info(
+            f"10000 sequential commands: {elapsed:.3f}s, "
+            f"{elapsed / 10000 * 1000:.3f}ms per command"
+        )
+
+    def test_timeout(self) -> None:
+        timer = create_timer()
+        result = self._start("sleep 10").wait_result(timeout=1)
+        assert_that(result.is_timeout).is_true()
+        assert_that(timer.elapsed()).is_less_than(5)
+
+    def test_logger_count_is_flat(self) -> None:
+        # warm up, so loggers of first use are registered.
+        self._start("true").wait_result(timeout=10)
+        gc.collect()
+        logger_count = len(logging.Logger.manager.loggerDict)
+
+        for index in range(200):
+            self._start("true", str(index)).wait_result(timeout=10)
+        gc.collect()
+
+        assert_that(logging.Logger.manager.loggerDict).is_length(logger_count)
+
+    def test_spilled_output(self) -> None:
+        process = self._start("seq 1 20000", no_info_log=True, output_memory_limit=1024)
+        result = process.wait_result(timeout=30)
+
+        assert_that(result.is_stdout_loaded).is_false()
+        lines = list(result.iter_stdout_lines())
+        assert_that(lines).is_length(20000)
+        assert_that(lines[-1]).is_equal_to("20000")
+        assert_that(result.stdout.splitlines()).is_equal_to(lines)
+        assert_that(result.is_stdout_loaded).is_true()
+
+    def test_spilled_result_fields(self) -> None:
+        buffer = OutputBuffer(memory_limit=1)
+        buffer.write(" spilled \n")
+        result = ExecutableResult(
+            stdout="", stderr="", exit_code=0, cmd="", elapsed=0, _stdout_buffer=buffer
+        )
+        result.filter_stdout(str.upper)
+
+        assert_that(asdict(result)["stdout"]).is_equal_to("SPILLED")
+        copied = replace(result, exit_code=1)
+        assert_that(copied.stdout).is_equal_to("SPILLED")
+        assert_that(copied.exit_code).is_equal_to(1)
+
+        buffer = OutputBuffer(memory_limit=1)
+        buffer.write("spilled")
+        result = ExecutableResult(
+            stdout="", stderr="", exit_code=0, cmd="", elapsed=0, _stdout_buffer=buffer
+        )
+        # the buffer isn't pickled, stdout is loaded instead.
+        assert_that(pickle.loads(pickle.dumps(result)).stdout).is_equal_to("spilled")
+        assert_that(repr(result)).contains("stdout='spilled'")
+        result.stdout = "changed"
+        assert_that(result.stdout).is_equal_to("changed")
+
+    def test_output_buffer(self) -> None:
+        buffer = OutputBuffer(memory_limit=10)
+        buffer.write("line 1\nline")
+        assert_that(buffer.is_spilled).is_true()
+        buffer.write(" 2\r\n")
+        spilled_path = buffer.spilled_path
+        assert spilled_path
+        assert_that(buffer.getvalue()).is_equal_to("line 1\nline 2\r\n")
+        assert_that(list(buffer.iter_lines())).is_equal_to(["line 1", "line 2"])
+        assert_that(buffer).is_length(15)
+
+        del buffer
+        gc.collect()
+        assert_that(spilled_path.exists()).is_false()
+
+    def test_batch_command(self) -> None:
+        batch = BatchCommand(["echo 1; echo 2 >&2", "exit 5", "cd /; pwd"])
+        result = self._start(batch.script).wait_result(timeout=10)
+        results = batch.split_result(result)
+
+        assert_that([x.stdout for x in results]).is_equal_to(["1", "", "/"])
+        assert_that([x.stderr for x in results]).is_equal_to(["2", "", ""])
+        assert_that([x.exit_code for x in results]).is_equal_to([0, 5, 0])
+
+    def test_batch_command_with_pty(self) -> None:
+        # with pty, stderr is merged into stdout, and lines end with "\r\n".
+        batch = BatchCommand(["echo 1", "sleep 10"])
+        delimiter = batch._delimiter
+        stdout = "\r\n".join(
+            [
+                f"{delimiter} o 0 begin 100.5",
+                f"{delimiter} e 0 begin",
+                "1",
+                f"{delimiter} o 0 end 0 101.75",
+                f"{delimiter} e 0 end",
+                f"{delimiter} o 1 begin 102",
+                "partial",
+            ]
+        )
+        results = batch.split_result(
+            ExecutableResult(stdout, "", 1, "", 10, is_timeout=True)
+        )
+
+        assert_that([x.stdout for x in results]).is_equal_to(["1", "partial"])
+        assert_that([x.exit_code for x in results]).is_equal_to([0, None])
+        assert_that([x.is_timeout for x in results]).is_equal_to([False, True])
+        assert_that(results[0].elapsed).is_equal_to(1.25)
+
+    def _start(
+        self,
+        command: str,
+        id_: str = "test",
+        no_info_log: bool = False,
+        output_memory_limit: int = -1,
+    ) -> Process:
+        process = Process(
+            id_,
+            self._shell,
+            parent_logger=self._log,
+            output_memory_limit=output_memory_limit,
+        )
+        process.start(command, shell=True, no_info_log=no_info_log)
+        return process
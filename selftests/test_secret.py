@@ -2,10 +2,40 @@
 # Licensed under the MIT license.
 
 import re
+from typing import List, Tuple
 from unittest.case import TestCase
 
 from lisa.secret import PATTERN_GUID, add_secret, mask, reset
 from lisa.util.logger import get_logger
+from lisa.util.perf_timer import create_timer
+from selftests.benchmark import benchmark, benchmark_log
+
+
+def _create_secrets(count: int) -> List[Tuple[str, str]]:
+    secrets: List[Tuple[str, str]] = []
+    for index in range(count):
+        secret = f"https://account{index}.blob.core.windows.net/?sig=s{index}"
+        add_secret(secret, sub=f"<{index}>")
+        secrets.append((secret, f"<{index}>"))
+    # the order of masking one by one.
+    secrets.sort(reverse=True, key=lambda x: len(x[0]))
+    return secrets
+
+
+def _create_lines(secrets: List[Tuple[str, str]], count: int) -> List[str]:
+    return [
+        f"{index}: copying disk from {secrets[index % len(secrets)][0]} to node"
+        if index % 10 == 0
+        else f"{index}: [    1.234567] kernel: some regular output line"
+        for index in range(count)
+    ]
+
+
+def _mask_one_by_one(secrets: List[Tuple[str, str]], line: str) -> str:
+    for secret, sub in secrets:
+        if secret in line:
+            line = line.replace(secret, sub)
+    return line
 
 
 class SecretTestCase(TestCase):
@@ -82,3 +112,62 @@ class SecretTestCase(TestCase):
         with self.assertLogs("lisa") as cm:
             log.info("with args t2: %s", "t1")
         self.assertListEqual(["INFO:lisa.:with args ******: ******"], cm.output)
+
+    def test_overlapped_longer_first(self) -> None:
+        add_secret("ab", sub="*")
+        add_secret("bcd", sub="**")
+        result = mask("abcd ab bcd")
+        self.assertEqual(result, "a** * **")
+        add_secret("cdef", sub="***")
+        result = mask("abcdef bcde")
+        self.assertEqual(result, "**** **e")
+
+    def test_long_secret(self) -> None:
+        secret = "k" * 5000
+        add_secret(secret, sub="*")
+        add_secret("k1", sub="**")
+        result = mask(f"{secret}k1 k1 {secret}")
+        self.assertEqual(result, "*** ** *")
+
+    def test_add_after_mask(self) -> None:
+        add_secret("t1", sub="*")
+        self.assertEqual(mask("t1 t2 t1t2"), "* t2 *t2")
+        add_secret("t2", sub="**")
+        add_secret("t1t2", sub="***")
+        self.assertEqual(mask("t1 t2 t1t2"), "* ** ***")
+
+    def test_update_sub(self) -> None:
+        add_secret("t1", sub="*")
+        add_secret("t1", sub="**")
+        self.assertEqual(mask("t1 t1"), "** **")
+
+    def test_many_secrets(self) -> None:
+        secrets = _create_secrets(200)
+        lines = _create_lines(secrets, 1000)
+
+        masked = [mask(line) for line in lines]
+
+        # the same as searching each secret separately.
+        expected = [_mask_one_by_one(secrets, line) for line in lines]
+        self.assertListEqual(expected, masked)
+
+    @benchmark
+    def test_mask_10k_lines(self) -> None:
+        for secret_count in [10, 200]:
+            reset()
+            secrets = _create_secrets(secret_count)
+            lines = _create_lines(secrets, 10000)
+            mask(lines[0])
+
+            timer = create_timer()
+            masked = [mask(line) for line in lines]
+            elapsed = timer.elapsed()
+            timer = create_timer()
+            expected = [_mask_one_by_one(secrets, line) for line in lines]
+            one_by_one_elapsed = timer.elapsed()
+
+            self.assertListEqual(expected, masked)
+            benchmark_log.info(
+                f"10000 lines with {secret_count} secrets: {elapsed:.3f}s, "
+                f"one by one: {one_by_one_elapsed:.3f}s"
+            )
@@ -0,0 +1,354 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+
+import hashlib
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from threading import Event, Thread
+from time import sleep
+from typing import Iterator, List
+from unittest import TestCase, skipIf
+
+import paramiko
+from assertpy import assert_that
+
+from lisa import development, schema
+from lisa.util import LisaException, constants
+from lisa.util.parallel import run_in_parallel
+from lisa.util.perf_timer import create_timer
+from lisa.util.shell import SshShell, SshTransportPool, _jump_box_pool
+from selftests.benchmark import benchmark, benchmark_log
+from selftests.ssh_server import PASSWORD, USER_NAME, SshServer
+
+
+def create_connection_info(server: SshServer) -> schema.ConnectionInfo:
+    return schema.ConnectionInfo(
+        address=server.address,
+        port=server.port,
+        username=USER_NAME,
+        password=PASSWORD,
+    )
+
+
+@skipIf(sys.platform == "win32", "the test server runs commands by sh.")
+class SshShellTestCase(TestCase):
+    def setUp(self) -> None:
+        self._server = SshServer()
+        self._server.__enter__()
+        self._shell = SshShell(create_connection_info(self._server))
+
+    def tearDown(self) -> None:
+        self._shell.close()
+        self._server.close()
+
+    def test_single_handshake(self) -> None:
+        self._shell.initialize()
+        result = self._shell.spawn(command=["echo", "hello"]).wait_for_result()
+
+        assert_that(self._shell.is_posix).is_true()
+        assert_that(result.output.strip()).is_equal_to("hello")
+        assert_that(self._server.handshake_count).is_equal_to(1)
+        assert_that(self._server.auth_count).is_equal_to(1)
+
+    def test_reconnect(self) -> None:
+        self._shell.initialize()
+        self._shell.close()
+        self._shell.initialize()
+        result = self._shell.spawn(command=["echo", "hello"]).wait_for_result()
+
+        assert_that(result.output.strip()).is_equal_to("hello")
+        assert_that(self._server.handshake_count).is_equal_to(2)
+
+    def test_transport_pool(self) -> None:
+        self._run_echo_commands(pool_size=4, count=100)
+
+    @benchmark
+    def test_transport_pool_throughput(self) -> None:
+        single_elapsed = self._run_echo_commands(pool_size=1, count=1000)
+        pooled_elapsed = self._run_echo_commands(pool_size=4, count=1000)
+        benchmark_log.info(
+            f"1000 echo commands, 1 transport: {single_elapsed:.3f}s, "
+            f"4 transports: {pooled_elapsed:.3f}s"
+        )
+
+    def test_transport_pool_connects_out_of_lock(self) -> None:
+        connect_event = Event()
+
+        def _connect() -> paramiko.SSHClient:
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(
+                self._server.address,
+                self._server.port,
+                username=USER_NAME,
+                password=PASSWORD,
+                look_for_keys=False,
+                allow_agent=False,
+            )
+            return client
+
+        def _slow_connect() -> paramiko.SSHClient:
+            connect_event.wait(10)
+            return _connect()
+
+        pool = SshTransportPool(2, _slow_connect)
+        pool.add(_connect())
+        try:
+            channel = pool.open_session()
+            # the transport is busy, so a new transport is connecting.
+            thread = Thread(target=lambda: pool.open_session().close())
+            thread.start()
+            sleep(0.5)
+            channel.close()
+
+            # the idle transport is used, while the other one is connecting.
+            timer = create_timer()
+            pool.open_session().close()
+            assert_that(timer.elapsed()).is_less_than(5)
+
+            connect_event.set()
+            thread.join()
+            assert_that(pool.transport_count).is_equal_to(2)
+        finally:
+            connect_event.set()
+            pool.close()
+
+    def test_transport_pool_replaces_dead_transport(self) -> None:
+        self._shell.initialize()
+        self._server.close_connections()
+        # wait the client to see the disconnection, like a rebooted node.
+        sleep(0.5)
+        result = self._shell.spawn(command=["echo", "hello"]).wait_for_result()
+
+        assert_that(result.output.strip()).is_equal_to("hello")
+        assert_that(self._server.handshake_count).is_equal_to(2)
+
+    def test_shared_jump_box(self) -> None:
+        with SshServer() as jump_box:
+            development.load_development_settings(
+                schema.Development(
+                    jump_boxes=[
+                        schema.ProxyConnectionInfo(
+                            address=jump_box.address,
+                            port=jump_box.port,
+                            username=USER_NAME,
+                            password=PASSWORD,
+                        )
+                    ]
+                )
+            )
+            shells = [self._shell, SshShell(create_connection_info(self._server))]
+            try:
+                for index, shell in enumerate(shells):
+                    assert_that(self._echo(shell, str(index))).is_equal_to(str(index))
+                # nodes share the transport of the jump box.
+                assert_that(jump_box.handshake_count).is_equal_to(1)
+                assert_that(self._server.handshake_count).is_equal_to(2)
+
+                # a rebooted jump box is connected again.
+                jump_box.close_connections()
+                sleep(0.5)
+                shells.append(SshShell(create_connection_info(self._server)))
+                assert_that(self._echo(shells[-1], "2")).is_equal_to("2")
+                assert_that(jump_box.handshake_count).is_equal_to(2)
+            finally:
+                for shell in shells[1:]:
+                    shell.close()
+                _jump_box_pool.close()
+                development._development_settings = None
+
+    def test_shared_jump_box_in_parallel(self) -> None:
+        with SshServer() as jump_box:
+            development.load_development_settings(
+                schema.Development(
+                    jump_boxes=[
+                        schema.ProxyConnectionInfo(
+                            address=jump_box.address,
+                            port=jump_box.port,
+                            username=USER_NAME,
+                            password=PASSWORD,
+                        )
+                    ]
+                )
+            )
+            shells = [SshShell(create_connection_info(self._server)) for _ in range(4)]
+            try:
+                outputs = run_in_parallel(
+                    [partial(self._echo, x, str(i)) for i, x in enumerate(shells)]
+                )
+                assert_that(outputs).is_equal_to(["0", "1", "2", "3"])
+                # the jump box is connected once by concurrent nodes.
+                assert_that(jump_box.handshake_count).is_equal_to(1)
+            finally:
+                for shell in shells:
+                    shell.close()
+                _jump_box_pool.close()
+                development._development_settings = None
+
+    def test_copy_tree(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "source"
+            (source / "sub").mkdir(parents=True)
+            (source / "run.sh").write_text("echo hello")
+            (source / "run.sh").chmod(0o750)
+            (source / "sub" / "data").write_text("data")
+            (source / "link").symlink_to("run.sh")
+            node_path = Path(temp_dir) / "node"
+            local_path = Path(temp_dir) / "local"
+
+            exec_count = self._server.exec_count
+            uploaded = self._shell.copy_tree(source, node_path, compression="gz")
+            downloaded = self._shell.copy_tree_back(node_path, local_path)
+
+            # detection of tar, upload and download.
+            assert_that(self._server.exec_count - exec_count).is_equal_to(3)
+            for names in [uploaded, downloaded]:
+                assert_that(sorted(names)).is_equal_to(["link", "run.sh", "sub/data"])
+            assert_that((local_path / "sub" / "data").read_text()).is_equal_to("data")
+            assert_that(os.readlink(local_path / "link")).is_equal_to("run.sh")
+            for path in [node_path, local_path]:
+                assert_that((path / "run.sh").stat().st_mode & 0o777).is_equal_to(0o750)
+
+    def test_copy_tree_failure(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(LisaException):
+                self._shell.copy_tree_back(
+                    Path(temp_dir) / "not_exists", Path(temp_dir) / "local"
+                )
+
+    def test_copy_large_file(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir, self._small_chunks():
+            source = Path(temp_dir) / "source.img"
+            source.write_bytes(os.urandom(4 * 1024 * 1024 + 1))
+            node_path = Path(temp_dir) / "node" / "disk.img"
+            local_path = Path(temp_dir) / "local" / "disk.img"
+            node_path.parent.mkdir()
+            node_path.write_bytes(b"old")
+            node_path.chmod(0o640)
+
+            self._shell.copy(source, node_path)
+            self._shell.copy_back(node_path, local_path)
+
+            assert_that(local_path.read_bytes()).is_equal_to(source.read_bytes())
+            assert_that(sorted(os.listdir(local_path.parent))).is_equal_to(["disk.img"])
+            # the mode of the replaced file is kept.
+            assert_that(node_path.stat().st_mode & 0o777).is_equal_to(0o640)
+            # workers connect their own transports.
+            assert_that(self._server.handshake_count).is_greater_than(1)
+
+    def test_copy_large_file_without_hash_command(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir, self._small_chunks():
+            source = Path(temp_dir) / "source.img"
+            source.write_bytes(os.urandom(1024 * 1024 + 1))
+            node_path = Path(temp_dir) / "node" / "disk.img"
+            self._shell.initialize()
+            # like a node without sha256sum and sha256.
+            self._shell._hash_command = ""
+
+            self._shell.copy(source, node_path)
+
+            assert_that(node_path.read_bytes()).is_equal_to(source.read_bytes())
+            # it's copied by the SFTP stream of the shell.
+            assert_that(self._server.handshake_count).is_equal_to(1)
+
+    @benchmark
+    def test_copy_large_file_throughput(self) -> None:
+        # on a link with 200ms round trips, a SFTP stream is bound by its window.
+        with tempfile.TemporaryDirectory() as temp_dir, SshServer(
+            latency=0.2
+        ) as server:
+            source = Path(temp_dir) / "source.img"
+            source.write_bytes(os.urandom(32 * 1024 * 1024))
+            shell = SshShell(create_connection_info(server))
+            shell.initialize()
+
+            original_size = constants.LARGE_FILE_COPY_SIZE
+            constants.LARGE_FILE_COPY_SIZE = 1024 * 1024 * 1024
+            try:
+                timer = create_timer()
+                shell.copy(source, Path(temp_dir) / "single.img")
+                single_elapsed = timer.elapsed()
+            finally:
+                constants.LARGE_FILE_COPY_SIZE = original_size
+            timer = create_timer()
+            shell.copy(source, Path(temp_dir) / "parallel.img")
+            parallel_elapsed = timer.elapsed()
+            shell.close()
+            benchmark_log.info(
+                f"copy 32MB file, single sftp stream: {single_elapsed:.3f}s, "
+                f"parallel chunks: {parallel_elapsed:.3f}s"
+            )
+
+    def test_copy_large_file_resume(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir, self._small_chunks():
+            source = Path(temp_dir) / "source.img"
+            content = os.urandom(1024 * 1024 + 1)
+            source.write_bytes(content)
+            node_path = Path(temp_dir) / "disk.img"
+            partial_path = Path(f"{node_path}.lisa_partial")
+            journal_path = Path(f"{partial_path}.journal")
+            source_hash = hashlib.sha256(content).hexdigest()
+            chunk_size = constants.LARGE_FILE_CHUNK_SIZE
+
+            # the first chunk is finished, and the rest isn't copied.
+            partial_path.write_bytes(
+                content[:chunk_size] + bytes(len(content) - chunk_size)
+            )
+            journal_path.write_text(f"{len(content)} {chunk_size} {source_hash}\n0\n")
+            self._shell.copy(source, node_path)
+            assert_that(node_path.read_bytes()).is_equal_to(content)
+            assert_that(journal_path.exists()).is_false()
+
+            # a broken finished chunk is found by sha256.
+            broken_path = node_path.parent / "broken.img"
+            Path(f"{broken_path}.lisa_partial").write_bytes(bytes(len(content)))
+            journal_path = Path(f"{broken_path}.lisa_partial.journal")
+            journal_path.write_text(f"{len(content)} {chunk_size} {source_hash}\n0\n")
+            with self.assertRaises(LisaException):
+                self._shell.copy(source, broken_path)
+            # the journal is removed, so it starts over next time.
+            assert_that(journal_path.exists()).is_false()
+            self._shell.copy(source, broken_path)
+            assert_that(broken_path.read_bytes()).is_equal_to(content)
+
+    @contextmanager
+    def _small_chunks(self) -> Iterator[None]:
+        original_values = (
+            constants.LARGE_FILE_COPY_SIZE,
+            constants.LARGE_FILE_CHUNK_SIZE,
+        )
+        constants.LARGE_FILE_COPY_SIZE = 1024 * 1024
+        constants.LARGE_FILE_CHUNK_SIZE = 256 * 1024
+        try:
+            yield
+        finally:
+            (
+                constants.LARGE_FILE_COPY_SIZE,
+                constants.LARGE_FILE_CHUNK_SIZE,
+            ) = original_values
+
+    def _run_echo_commands(self, pool_size: int, count: int) -> float:
+        with SshServer() as server:
+            shell = SshShell(create_connection_info(server), pool_size=pool_size)
+            shell.initialize()
+            timer = create_timer()
+            outputs: List[str] = run_in_parallel(
+                [partial(self._echo, shell, str(index)) for index in range(count)]
+            )
+            elapsed = timer.elapsed()
+            shell.close()
+
+            # transports are added only when existing ones are busy.
+            assert_that(server.handshake_count).is_between(1, pool_size)
+        assert_that(sorted(outputs, key=int)).is_equal_to(
+            [str(index) for index in range(count)]
+        )
+        return elapsed
+
+    def _echo(self, shell: SshShell, value: str) -> str:
+        result = shell.spawn(command=["echo", value]).wait_for_result()
+        return str(result.output.strip())